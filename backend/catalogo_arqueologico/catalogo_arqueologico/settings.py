@@ -178,6 +178,27 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Maximum number of catalog listing responses cached by each process
+CATALOG_RESPONSE_CACHE_SIZE = env.int("CATALOG_RESPONSE_CACHE_SIZE", default=512)
+
+# Maximum number of artifacts a client can request per catalog page
+CATALOG_MAX_PAGE_SIZE = env.int("CATALOG_MAX_PAGE_SIZE", default=100)
+
+# Maximum number of artifact details cached by each process
+ARTIFACT_DETAIL_CACHE_SIZE = env.int("ARTIFACT_DETAIL_CACHE_SIZE", default=1024)
+
+# Maximum number of artifacts a client can request in one batch of details
+ARTIFACT_BATCH_MAX_IDS = env.int("ARTIFACT_BATCH_MAX_IDS", default=500)
+
+# Number of catalog versions whose changed artifacts are kept, so the processes
+# that fall behind by fewer versions update their bitmap index instead of
+# rebuilding it
+CATALOG_CHANGE_LOG_SIZE = env.int("CATALOG_CHANGE_LOG_SIZE", default=1000)
+
+# Seconds between checks for catalog changes made by other processes in the
+# autocomplete index
+AUTOCOMPLETE_CHECK_INTERVAL = env.float("AUTOCOMPLETE_CHECK_INTERVAL", default=5.0)
+
 # Paths of the different types of files to be imported
 DATA_ROOT = "../../data/"
 CULTURE_CSV_PATH = os.path.join(DATA_ROOT, "coleccion-cultura.csv")
@@ -194,12 +215,37 @@ INSTITUTIONS_CSV_PATH = os.path.join(DATA_ROOT, "institutions.csv")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/app/media/"
 
+# Absolute URL of the host serving MEDIA_ROOT (nginx, a static host or a CDN origin).
+# When empty, file URLs are built from the host of each request and MEDIA_URL.
+MEDIA_BASE_URL = env.str("MEDIA_BASE_URL", default="")
+
 # Folders for the different types of uploaded files
 MATERIALS_URL = "materials/"
 OBJECTS_URL = "objects/"
 THUMBNAILS_URL = "thumbnails/"
 IMAGES_URL = "images/"
 
+# Widths of the resized copies of every uploaded thumbnail and image, in WebP and
+# JPEG, and their encoding quality (see piezas.renditions)
+RENDITION_WIDTHS = env.list("RENDITION_WIDTHS", cast=int, default=[160, 320, 640, 1280])
+RENDITION_QUALITY = env.int("RENDITION_QUALITY", default=80)
+
+# Fractions of the triangles of every 3D model kept by its simplified meshes, and
+# the fewest triangles a simplified mesh may have (see piezas.meshes)
+MODEL_LOD_RATIOS = env.list("MODEL_LOD_RATIOS", cast=float, default=[0.25, 0.05])
+MODEL_LOD_MIN_TRIANGLES = env.int("MODEL_LOD_MIN_TRIANGLES", default=500)
+
+# Longest sides of the downscaled variants of every 3D model texture, and their JPEG
+# quality (see piezas.textures)
+TEXTURE_SIZES = env.list("TEXTURE_SIZES", cast=int, default=[1024, 2048])
+TEXTURE_QUALITY = env.int("TEXTURE_QUALITY", default=85)
+
+# Folder of the descriptor index shared by the processes of the server through
+# memory-mapped files (see piezas.descriptor_index). Not served to clients.
+DESCRIPTOR_INDEX_DIR = env.str(
+    "DESCRIPTOR_INDEX_DIR", default=str(BASE_DIR / "descriptor_index")
+)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -6,6 +6,7 @@ configuration options for the 'piezas' application.
 """
 
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PiezasConfig(AppConfig):
@@ -24,3 +25,15 @@ class PiezasConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "piezas"
+
+    def ready(self):
+        """
+        Connects the signal receivers of the application and the creation of the
+        search and filter indexes after migrating.
+        """
+        from . import signals  # noqa: F401
+        from .catalog import create_catalog_indexes
+        from .search import create_search_indexes
+
+        post_migrate.connect(create_search_indexes, sender=self)
+        post_migrate.connect(create_catalog_indexes, sender=self)
@@ -0,0 +1,306 @@
+"""
+This module implements the in-process index behind the autocomplete of the catalog.
+
+Tags, cultures, shapes, institutions and the keywords of the artifact descriptions are
+stored in a prefix trie keyed on their accent and case folded words, so a suggestion
+lookup walks a few nodes in memory and never queries the database.
+
+The vocabulary is updated term by term by the receivers in piezas.signals, and the
+keywords by the catalog refreshes (see piezas.catalog), in the same way as the bitmap
+index. Writes made by other processes are detected by checking the catalog version at
+most every AUTOCOMPLETE_CHECK_INTERVAL seconds, and trigger a rebuild.
+
+Classes:
+- PrefixTrie: Trie mapping word prefixes to the items containing those words.
+- AutocompleteIndex: Suggestions of tags, cultures, shapes, institutions and keywords.
+
+Functions:
+- fold: Removes the accents of a text and folds its case.
+"""
+
+import re
+import threading
+import unicodedata
+from .models import CatalogEntry, Culture, Institution, Shape, Tag
+
+KINDS = ("tag", "culture", "shape", "institution", "keyword")
+VOCABULARY = {"tag": Tag, "culture": Culture, "shape": Shape, "institution": Institution}
+
+WORD_PATTERN = re.compile(r"\w+")
+MIN_KEYWORD_LENGTH = 3
+STOPWORDS = frozenset(
+    """
+    con las los del por para una uno unos unas que sus este esta estos estas ese esa
+    sin sobre entre desde hasta como mas pero son fue ser hay muy tiene tambien cual
+    """.split()
+)
+
+
+def fold(text):
+    """
+    Removes the accents of a text and folds its case.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The folded text, so 'Ánfora' and 'anfora' compare equal.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def keywords(description):
+    """
+    Extracts the folded keywords of a description.
+
+    Args:
+        description (str): The description of an artifact.
+
+    Returns:
+        dict: The folded keywords mapped to the lowercase word they were found as.
+    """
+    found = {}
+    for word in WORD_PATTERN.findall(description or ""):
+        key = fold(word)
+        if len(key) >= MIN_KEYWORD_LENGTH and key not in STOPWORDS and not key.isdigit():
+            found.setdefault(key, word.lower())
+    return found
+
+
+class PrefixTrie:
+    """
+    Trie mapping words to items, queried by prefix.
+
+    Every node is a dictionary from characters to child nodes, and the items of the
+    words ending at a node are kept under the ITEMS key.
+    """
+
+    ITEMS = None
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, word, item):
+        """
+        Adds an item under a word.
+        """
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        node.setdefault(self.ITEMS, set()).add(item)
+
+    def remove(self, word, item):
+        """
+        Removes an item from a word, pruning the nodes left empty.
+        """
+        path = [self.root]
+        for char in word:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        items = path[-1].get(self.ITEMS)
+        if not items or item not in items:
+            return
+        items.discard(item)
+        if not items:
+            del path[-1][self.ITEMS]
+        for depth in range(len(word), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][word[depth - 1]]
+
+    def search(self, prefix, limit, accept=None):
+        """
+        Lists the items of the words starting with a prefix.
+
+        Shorter words come first, then words are visited in alphabetical order,
+        and the walk stops as soon as enough items were found.
+
+        Args:
+            prefix (str): The folded prefix.
+            limit (int): Maximum number of items.
+            accept (callable): Predicate the items must satisfy, None to accept all.
+
+        Returns:
+            list: The items found, without duplicates.
+        """
+        node = self.root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        found = []
+        seen = set()
+        level = [node]
+        while level and len(found) < limit:
+            next_level = []
+            for node in level:
+                for item in sorted(node.get(self.ITEMS, ()), key=lambda item: item[2]):
+                    if item not in seen and (accept is None or accept(item)):
+                        seen.add(item)
+                        found.append(item)
+                        if len(found) == limit:
+                            return found
+                next_level.extend(
+                    node[char] for char in sorted(node, key=str) if char is not self.ITEMS
+                )
+            level = next_level
+        return found
+
+
+class AutocompleteIndex:
+    """
+    Suggestions of tags, cultures, shapes, institutions and description keywords.
+
+    Items are (kind, id, label) tuples, where the id of a keyword is None. Every
+    method is safe to call from several threads.
+
+    Attributes:
+        version (int): The catalog version the keywords reflect, None if never built.
+        checked_at (float): Monotonic time of the last check of the catalog version.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.checked_at = None
+        self.trie = PrefixTrie()
+        self.terms = {}
+        self.keyword_counts = {}
+        self.keyword_labels = {}
+        self.artifact_keywords = {}
+
+    def rebuild(self, version):
+        """
+        Rebuilds the index from the vocabulary tables and every catalog entry.
+
+        Args:
+            version (int): The catalog version the rebuilt index reflects.
+        """
+        vocabulary = [
+            (kind, term_id, name)
+            for kind, model in VOCABULARY.items()
+            for term_id, name in model.objects.values_list("id", "name")
+        ]
+        descriptions = CatalogEntry.objects.values_list("artifact_id", "description")
+        with self.lock:
+            self.trie = PrefixTrie()
+            self.terms = {}
+            self.keyword_counts = {}
+            self.keyword_labels = {}
+            self.artifact_keywords = {}
+            for kind, term_id, name in vocabulary:
+                self.put(kind, term_id, name)
+            for artifact_id, description in descriptions.iterator():
+                self._add_keywords(artifact_id, description)
+            self.version = version
+
+    def apply(self, previous_version, version, artifact_ids, entries):
+        """
+        Applies a change of the catalog entries of some artifacts to the keywords.
+
+        The change is only applied if the index reflected the catalog version the
+        change was made on, otherwise the index is left stale so it is rebuilt.
+
+        Args:
+            previous_version (int): The catalog version before the change.
+            version (int): The catalog version after the change.
+            artifact_ids (iterable): Ids of the artifacts whose entries changed.
+            entries (list): The new catalog entries of those artifacts.
+        """
+        with self.lock:
+            if self.version != previous_version:
+                return
+            for artifact_id in artifact_ids:
+                self._remove_keywords(artifact_id)
+            for entry in entries:
+                self._add_keywords(entry.artifact_id, entry.description)
+            self.version = version
+
+    def put(self, kind, term_id, name):
+        """
+        Adds a vocabulary term, or renames it if it was already indexed.
+
+        Args:
+            kind (str): The kind of the term ('tag', 'culture', 'shape' or 'institution').
+            term_id (int): The id of the term.
+            name (str): The name of the term.
+        """
+        with self.lock:
+            self.discard(kind, term_id)
+            item = (kind, term_id, name)
+            self.terms[(kind, term_id)] = item
+            for word in self._words(name):
+                self.trie.add(word, item)
+
+    def discard(self, kind, term_id):
+        """
+        Removes a vocabulary term if it is indexed.
+
+        Args:
+            kind (str): The kind of the term.
+            term_id (int): The id of the term.
+        """
+        with self.lock:
+            item = self.terms.pop((kind, term_id), None)
+            if item is None:
+                return
+            for word in self._words(item[2]):
+                self.trie.remove(word, item)
+
+    def suggest(self, text, limit=10, kinds=None):
+        """
+        Suggests the items starting with a text.
+
+        A multi-word label matches when any of its words starts with the text, and
+        the whole label is also matched, so 'vasija zoo' finds 'Vasija zoomorfa'.
+
+        Args:
+            text (str): The text typed by the user.
+            limit (int): Maximum number of suggestions.
+            kinds (set): The kinds of items to suggest, None for every kind.
+
+        Returns:
+            list: The suggested (kind, id, label) items.
+        """
+        prefix = " ".join(fold(text).split())
+        if not prefix:
+            return []
+        accept = None if kinds is None else (lambda item: item[0] in kinds)
+        with self.lock:
+            return self.trie.search(prefix, limit, accept)
+
+    def _words(self, label):
+        """
+        Returns the keys a label is indexed under: the whole folded label and the
+        folded label starting at each of its words.
+        """
+        words = fold(label).split()
+        return {" ".join(words[start:]) for start in range(len(words))}
+
+    def _add_keywords(self, artifact_id, description):
+        """
+        Adds the keywords of the description of an artifact.
+        """
+        found = keywords(description)
+        self.artifact_keywords[artifact_id] = set(found)
+        for key, label in found.items():
+            count = self.keyword_counts.get(key, 0)
+            self.keyword_counts[key] = count + 1
+            if not count:
+                self.keyword_labels[key] = label
+                self.trie.add(key, ("keyword", None, label))
+
+    def _remove_keywords(self, artifact_id):
+        """
+        Removes the keywords of the description of an artifact.
+        """
+        for key in self.artifact_keywords.pop(artifact_id, ()):
+            count = self.keyword_counts[key] - 1
+            if count:
+                self.keyword_counts[key] = count
+            else:
+                del self.keyword_counts[key]
+                self.trie.remove(key, ("keyword", None, self.keyword_labels.pop(key)))
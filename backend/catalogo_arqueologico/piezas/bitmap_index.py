@@ -0,0 +1,260 @@
+"""
+This module implements an in-process inverted index of the catalog.
+
+Every culture, shape and tag is mapped to its posting list: the sorted int64 array
+of the ids of the artifacts that have it. The posting lists replace the bitmaps of
+one bit per artifact id of the whole catalog the index was first asked for: their
+size follows the number of artifacts holding each value instead of the highest id.
+AND and OR combinations of filters are intersections and unions of sorted arrays
+computed by numpy, and the facets are counted with one binary search per value and
+built as the database counts them (see piezas.facets). CatalogBitmapIndex keeps the
+name of the bitmap index it replaces.
+
+The index is built from the CatalogEntry table and kept up to date with the catalog
+version (see piezas.indexes.get_catalog_index): the changes of the entries of some
+artifacts, made by this process or read from the change log, are merged into the
+posting lists of the values they touch.
+
+Classes:
+- CatalogBitmapIndex: Inverted index from culture, shape and tag names to artifact ids.
+"""
+
+import threading
+import numpy as np
+from .facets import build_facets, fold_name
+from .models import CatalogEntry
+
+FIELDS = ("culture", "shape", "tag")
+
+
+def id_array(ids):
+    """
+    Builds the sorted array of a collection of artifact ids.
+
+    Args:
+        ids (iterable): The artifact ids, possibly repeated.
+
+    Returns:
+        numpy.ndarray: The sorted int64 array of the distinct ids.
+    """
+    return np.unique(np.fromiter(ids, dtype=np.int64))
+
+
+def intersect(ids, other):
+    """
+    Computes the artifacts of two sorted id arrays.
+
+    Args:
+        ids (numpy.ndarray): A sorted array of distinct ids.
+        other (numpy.ndarray): Another sorted array of distinct ids.
+
+    Returns:
+        numpy.ndarray: The sorted array of the ids in both.
+    """
+    return np.intersect1d(ids, other, assume_unique=True)
+
+
+def count_in(ids, other):
+    """
+    Counts the artifacts of a sorted id array that are in another one.
+
+    Args:
+        ids (numpy.ndarray): A sorted array of distinct ids.
+        other (numpy.ndarray): Another sorted array of distinct ids.
+
+    Returns:
+        int: The number of ids in both.
+    """
+    if len(ids) == 0 or len(other) == 0:
+        return 0
+    # Se busca el arreglo más corto en el más largo
+    if len(ids) > len(other):
+        ids, other = other, ids
+    positions = np.searchsorted(other, ids)
+    positions[positions == len(other)] = len(other) - 1
+    return int(np.count_nonzero(other[positions] == ids))
+
+
+class CatalogBitmapIndex:
+    """
+    Inverted index from culture, shape and tag names to posting lists of artifact ids.
+
+    Every name as stored has its posting list, and names are matched case
+    insensitively through the names sharing their folded key. The posting lists are replaced, never
+    modified, so the ones returned by match stay valid while the index changes.
+    Every method is safe to call from several threads.
+
+    Attributes:
+        version (int): The catalog version the index reflects, None if never built.
+        updated_at (datetime): The date of that version, None if not known.
+        all (numpy.ndarray): Sorted ids of every artifact in the catalog.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.updated_at = None
+        self.all = id_array([])
+        self.postings = {field: {} for field in FIELDS}
+        self.variants = {field: {} for field in FIELDS}
+        self.entries = {}
+
+    def rebuild(self, version, updated_at=None):
+        """
+        Rebuilds the index from every catalog entry.
+
+        Args:
+            version (int): The catalog version the rebuilt index reflects.
+            updated_at (datetime): The date of that version.
+        """
+        rows = CatalogEntry.objects.values_list(
+            "artifact_id", "culture_name", "shape_name", "tag_names"
+        )
+        postings = {field: {} for field in FIELDS}
+        entries = {}
+        for artifact_id, culture_name, shape_name, tag_names in rows.iterator():
+            names = self._names(culture_name, shape_name, tag_names)
+            for field, field_names in names.items():
+                for name in field_names:
+                    postings[field].setdefault(name, []).append(artifact_id)
+            entries[artifact_id] = names
+        with self.lock:
+            self.postings = {
+                field: {name: id_array(ids) for name, ids in field_postings.items()}
+                for field, field_postings in postings.items()
+            }
+            self.variants = {field: {} for field in FIELDS}
+            for field, field_postings in postings.items():
+                for name in field_postings:
+                    self.variants[field].setdefault(fold_name(name), set()).add(name)
+            self.entries = entries
+            self.all = id_array(entries)
+            self.version = version
+            self.updated_at = updated_at
+
+    def apply(self, previous_version, version, artifact_ids, entries, updated_at=None):
+        """
+        Applies a change of the catalog entries of some artifacts to the index.
+
+        The change is only applied if the index reflected the catalog version the
+        change was made on, otherwise the index is left stale so it is rebuilt.
+        The array of every value the change touches is merged once.
+
+        Args:
+            previous_version (int): The catalog version before the change.
+            version (int): The catalog version after the change.
+            artifact_ids (iterable): Ids of the artifacts whose entries changed.
+            entries (list): The new catalog entries of those artifacts.
+            updated_at (datetime): The date of the version after the change.
+        """
+        with self.lock:
+            if self.version != previous_version:
+                return
+            removed = id_array(artifact_ids)
+            touched = {field: set() for field in FIELDS}
+            for artifact_id in removed.tolist():
+                for field, field_names in self.entries.pop(artifact_id, {}).items():
+                    touched[field].update(field_names)
+            added = {field: {} for field in FIELDS}
+            for entry in entries:
+                names = self._names(entry.culture_name, entry.shape_name, entry.tag_names)
+                for field, field_names in names.items():
+                    for name in field_names:
+                        added[field].setdefault(name, []).append(entry.artifact_id)
+                        touched[field].add(name)
+                self.entries[entry.artifact_id] = names
+
+            for field in FIELDS:
+                postings = self.postings[field]
+                variants = self.variants[field]
+                for name in touched[field]:
+                    ids = postings.get(name, self.all[:0])
+                    ids = ids[~np.isin(ids, removed, assume_unique=True)]
+                    ids = np.union1d(ids, id_array(added[field].get(name, [])))
+                    key = fold_name(name)
+                    if len(ids):
+                        postings[name] = ids
+                        variants.setdefault(key, set()).add(name)
+                    else:
+                        postings.pop(name, None)
+                        variants.get(key, set()).discard(name)
+                        if not variants.get(key, True):
+                            del variants[key]
+            self.all = np.union1d(
+                self.all[~np.isin(self.all, removed, assume_unique=True)],
+                id_array(entry.artifact_id for entry in entries),
+            )
+            self.version = version
+            self.updated_at = updated_at
+
+    def match(self, culture=None, shape=None, tag_groups=None):
+        """
+        Computes the artifacts matching a filter combination.
+
+        Names are matched ignoring surrounding spaces.
+
+        Args:
+            culture (str): Name of the culture, None to not filter by culture.
+            shape (str): Name of the shape, None to not filter by shape.
+            tag_groups (list): Groups of tag names. An artifact matches when it has
+                at least one tag of every group. None to not filter by tags.
+
+        Returns:
+            numpy.ndarray: The sorted ids of the matching artifacts.
+        """
+        with self.lock:
+            ids = self.all
+            if culture is not None:
+                ids = intersect(ids, self._postings("culture", [culture.strip()]))
+            if shape is not None:
+                ids = intersect(ids, self._postings("shape", [shape.strip()]))
+            for group in tag_groups or []:
+                ids = intersect(ids, self._postings("tag", group))
+            return ids
+
+    def facets(self, ids):
+        """
+        Counts the cultures, shapes and tags of some artifacts.
+
+        Args:
+            ids (numpy.ndarray): The sorted ids of the artifacts, as returned by match.
+
+        Returns:
+            dict: The facets, as built by piezas.facets.build_facets.
+        """
+        counts = {}
+        with self.lock:
+            every = len(ids) == len(self.all)
+            for field in FIELDS:
+                counts[field + "s"] = {
+                    name: len(field_ids) if every else count_in(ids, field_ids)
+                    for name, field_ids in self.postings[field].items()
+                }
+        return build_facets(counts)
+
+    def _postings(self, field, names):
+        """
+        Returns the sorted ids of the artifacts with any of some names, matched
+        case insensitively. Called with the lock held.
+        """
+        postings = [
+            self.postings[field][variant]
+            for name in names
+            for variant in self.variants[field].get(fold_name(name), ())
+        ]
+        if not postings:
+            return self.all[:0]
+        if len(postings) == 1:
+            return postings[0]
+        return np.unique(np.concatenate(postings))
+
+    @staticmethod
+    def _names(culture_name, shape_name, tag_names):
+        """
+        Returns the culture, shape and tag names of an artifact.
+        """
+        return {
+            "culture": [culture_name] if culture_name is not None else [],
+            "shape": [shape_name] if shape_name is not None else [],
+            "tag": list(tag_names),
+        }
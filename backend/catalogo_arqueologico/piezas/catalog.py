@@ -0,0 +1,547 @@
+"""
+This module maintains the denormalized catalog read model used by the catalog listing.
+
+Every artifact has a CatalogEntry row holding the names of its shape, culture and tags
+and the storage name of its thumbnail, so listing the catalog does not need to join
+Artifact with its related tables, and the version of the artifact, which keys its
+cached detail. The receivers in piezas.signals call these functions whenever a write
+may change what the catalog or a detail shows. The module also holds the filters and
+sort orders of the catalog queries.
+
+Classes:
+- CatalogWrite: The changes a transaction makes to the catalog, bumping each version once.
+
+Functions:
+- build_catalog_entry: Builds the (unsaved) CatalogEntry of an artifact.
+- refresh_catalog_entries: Synchronizes the CatalogEntry rows of the given artifacts.
+- rebuild_catalog: Rebuilds the CatalogEntry rows of every artifact.
+- parse_tag_groups: Parses the tags parameter of a catalog request into groups of names.
+- filter_by_tags: Filters a CatalogEntry queryset by groups of tag names.
+- parse_catalog_ordering: Parses the ordering parameter of a catalog request.
+- catalog_order_by: Returns the order_by arguments of a sort order of the catalog.
+- catalog_seek: Selects the catalog entries that follow a position in a sort order.
+- catalog_write: Returns the changes the current transaction makes to the catalog.
+- touch_catalog: Increments the version of the catalog after a write outside its entries.
+- touch_artifacts: Increments the version of some artifacts after a write to their details.
+- touch_descriptors: Increments the descriptor version after a write to the photo
+  descriptors of some artifacts.
+- compute_facets: Counts the cultures, shapes and tags of a CatalogEntry queryset.
+- create_catalog_indexes: Creates the indexes of the catalog filters that models cannot declare.
+- estimate_count: Estimates the number of rows of a queryset without counting them.
+"""
+
+import json
+import logging
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from .facets import build_facets, fold_name
+from .indexes import apply_to_indexes, descriptor_index
+from .models import Artifact, CatalogEntry, Tag
+from .search import update_search_vectors
+from .serializers import CatalogSerializer
+from .versions import bump_catalog_version, bump_descriptor_version, record_catalog_change
+
+logger = logging.getLogger(__name__)
+
+# Sort keys accepted by the catalog and the CatalogEntry column each one sorts by.
+# Ties are broken by artifact_id, and every column has a (column, artifact_id)
+# index, so a sorted page is an index range scan.
+CATALOG_ORDERINGS = {
+    "id": "artifact_id",
+    "culture": "culture_name",
+    "shape": "shape_name",
+    "description": "description",
+    "updated": "updated_at",
+}
+
+
+def catalog_artifacts():
+    """
+    Returns the Artifact queryset with every relation the catalog entry needs.
+
+    Returns:
+        QuerySet: Artifacts with their shape, culture, thumbnail and tags loaded.
+    """
+    return CatalogSerializer.setup_eager_loading(Artifact.objects.all())
+
+
+def build_catalog_entry(artifact):
+    """
+    Builds the catalog entry of an artifact.
+
+    Args:
+        artifact (Artifact): The artifact, ideally loaded through catalog_artifacts.
+
+    Returns:
+        CatalogEntry: The unsaved catalog entry of the artifact.
+    """
+    tags = list(artifact.id_tags.all())
+    shape = artifact.id_shape
+    culture = artifact.id_culture
+    thumbnail = artifact.id_thumbnail
+    return CatalogEntry(
+        artifact_id=artifact.id,
+        description=artifact.description,
+        shape_id=shape.id if shape else None,
+        shape_name=shape.name if shape else None,
+        culture_id=culture.id if culture else None,
+        culture_name=culture.name if culture else None,
+        tag_ids=[tag.id for tag in tags],
+        tag_names=[tag.name for tag in tags],
+        thumbnail=thumbnail.path.name if thumbnail else "",
+        thumbnail_renditions=thumbnail.renditions if thumbnail else [],
+    )
+
+
+def refresh_catalog_entries(artifact_ids):
+    """
+    Synchronizes the catalog entries of the given artifacts with their current state.
+
+    Entries of artifacts that no longer exist are removed, and the version of the
+    others is incremented.
+
+    Args:
+        artifact_ids (iterable): Ids of the artifacts to refresh.
+    """
+    artifact_ids = set(artifact_ids)
+    if not artifact_ids:
+        return
+    entries = [
+        build_catalog_entry(artifact)
+        for artifact in catalog_artifacts().filter(id__in=artifact_ids)
+    ]
+    with transaction.atomic():
+        entries_qs = CatalogEntry.objects.filter(artifact_id__in=artifact_ids)
+        versions = dict(entries_qs.select_for_update().values_list("artifact_id", "version"))
+        for entry in entries:
+            entry.version = versions.get(entry.artifact_id, 0) + 1
+        entries_qs.delete()
+        CatalogEntry.objects.bulk_create(entries)
+        update_search_vectors(CatalogEntry.objects.filter(artifact_id__in=artifact_ids))
+        catalog_write().catalog_changed(artifact_ids)
+
+
+def rebuild_catalog(chunk_size=500):
+    """
+    Rebuilds the catalog entries of every artifact.
+
+    Args:
+        chunk_size (int): Number of artifacts loaded per batch.
+
+    Returns:
+        int: Number of catalog entries written.
+    """
+    artifact_ids = list(Artifact.objects.order_by("id").values_list("id", flat=True))
+    with transaction.atomic():
+        # Un rebuild no es una modificación de las piezas: se conservan sus fechas y versiones
+        previous = {
+            artifact_id: (updated_at, version)
+            for artifact_id, updated_at, version in CatalogEntry.objects.values_list(
+                "artifact_id", "updated_at", "version"
+            )
+        }
+        CatalogEntry.objects.all().delete()
+        for start in range(0, len(artifact_ids), chunk_size):
+            chunk = artifact_ids[start : start + chunk_size]
+            entries = [
+                build_catalog_entry(artifact)
+                for artifact in catalog_artifacts().filter(id__in=chunk)
+            ]
+            for entry in entries:
+                if entry.artifact_id in previous:
+                    entry.updated_at, entry.version = previous[entry.artifact_id]
+            CatalogEntry.objects.bulk_create(entries)
+        update_search_vectors(CatalogEntry.objects.all())
+        catalog_write().catalog_changed(None)
+    logger.info(f"Catalog rebuilt with {len(artifact_ids)} entries")
+    return len(artifact_ids)
+
+
+def parse_tag_groups(tags):
+    """
+    Parses the tags parameter of a catalog request.
+
+    Groups are separated by commas and combined with AND. Names inside a group are
+    separated by '|' and combined with OR, so 'a|b,c' means (a OR b) AND c.
+
+    Args:
+        tags (str): The tags parameter.
+
+    Returns:
+        list: The groups of tag names.
+    """
+    groups = []
+    for group in tags.split(","):
+        names = [name.strip() for name in group.split("|") if name.strip()]
+        if names:
+            groups.append(names)
+    return groups
+
+
+def filter_by_tags(queryset, tag_groups):
+    """
+    Filters a CatalogEntry queryset keeping the entries that have at least one tag
+    of every group.
+
+    Tag names are matched case insensitively. On databases that support JSON
+    containment the filter is answered by the entry itself, otherwise it falls back
+    to a subquery over the artifact-tag relation table.
+
+    Args:
+        queryset (QuerySet): The CatalogEntry queryset to filter.
+        tag_groups (list): Groups of tag names, as returned by parse_tag_groups.
+
+    Returns:
+        QuerySet: The filtered queryset.
+    """
+    if not tag_groups:
+        return queryset
+    names = Q()
+    for group in tag_groups:
+        for tag in group:
+            names |= Q(name__iexact=tag)
+    ids_by_name = {}
+    for tag_id, name in Tag.objects.filter(names).values_list("id", "name"):
+        ids_by_name.setdefault(fold_name(name), []).append(tag_id)
+
+    through = Artifact.id_tags.through
+    for group in tag_groups:
+        tag_ids = [
+            tag_id for tag in group for tag_id in ids_by_name.get(fold_name(tag), [])
+        ]
+        if not tag_ids:
+            return queryset.none()
+        if connection.features.supports_json_field_contains:
+            contains = Q()
+            for tag_id in tag_ids:
+                contains |= Q(tag_ids__contains=[tag_id])
+            queryset = queryset.filter(contains)
+        else:
+            queryset = queryset.filter(
+                artifact_id__in=through.objects.filter(tag_id__in=tag_ids).values(
+                    "artifact_id"
+                )
+            )
+    return queryset
+
+
+def parse_catalog_ordering(ordering):
+    """
+    Parses the ordering parameter of a catalog request.
+
+    The parameter is one of the keys of CATALOG_ORDERINGS, prefixed with '-' for
+    descending order.
+
+    Args:
+        ordering (str): The ordering parameter, None for the default order.
+
+    Returns:
+        tuple: The sort key, the column to sort by and whether the order is
+            descending, None if the sort key is unknown.
+    """
+    if ordering is None:
+        return ("id", "artifact_id", False)
+    ordering = ordering.strip()
+    key = ordering.lstrip("-")
+    if key not in CATALOG_ORDERINGS:
+        return None
+    return (key, CATALOG_ORDERINGS[key], ordering.startswith("-"))
+
+
+def catalog_order_by(column, descending):
+    """
+    Returns the order_by arguments of a sort order of the catalog.
+
+    Entries without a value go last in ascending order and first in descending
+    order on every database, the default of PostgreSQL, so the descending order
+    is exactly the reverse of the ascending one and both are served by the same
+    index.
+
+    Args:
+        column (str): The column to sort by, a value of CATALOG_ORDERINGS.
+        descending (bool): Whether the order is descending.
+
+    Returns:
+        list: The arguments for QuerySet.order_by.
+    """
+    if column == "artifact_id":
+        return ["-artifact_id" if descending else "artifact_id"]
+    if descending:
+        return [F(column).desc(nulls_first=True), "-artifact_id"]
+    return [F(column).asc(nulls_last=True), "artifact_id"]
+
+
+def catalog_seek(column, descending, value, artifact_id):
+    """
+    Selects the catalog entries that follow an entry in a sort order of the catalog.
+
+    The position is the pair (value, artifact_id), which is unique, so the keyset
+    never skips nor repeats entries that share a value. The value is also used as
+    a bound on its own, so the (column, artifact_id) index is scanned from the
+    position instead of from the start.
+
+    Args:
+        column (str): The column to sort by, a value of CATALOG_ORDERINGS.
+        descending (bool): Whether the order is descending.
+        value: The value of the column at the position, None for no value.
+        artifact_id (int): The artifact id at the position.
+
+    Returns:
+        Q: The condition of the entries after the position, as ordered by
+            catalog_order_by.
+    """
+    after = "lt" if descending else "gt"
+    next_id = Q(**{f"artifact_id__{after}": artifact_id})
+    if column == "artifact_id":
+        return next_id
+    no_value = Q(**{f"{column}__isnull": True})
+    if value is None:
+        # Las entradas sin valor van al final en orden ascendente y al inicio en descendente
+        if descending:
+            return ~no_value | (no_value & next_id)
+        return no_value & next_id
+    seek = Q(**{f"{column}__{after}e": value}) & (
+        Q(**{f"{column}__{after}": value}) | next_id
+    )
+    return seek if descending else seek | no_value
+
+
+class CatalogWrite:
+    """
+    The changes a transaction makes to the catalog.
+
+    The first write of a transaction bumps the catalog or descriptor version, and
+    the later ones reuse it, so a transaction locks the catalog state row and bumps
+    each version once however many receivers its writes fire. The changes are
+    applied to the in-process indexes once the transaction commits, with the
+    catalog entries it left.
+
+    Attributes:
+        state (CatalogState): The state of the catalog after the bump of its
+            version, None if the transaction did not bump it.
+        artifact_ids (set): Ids of the artifacts whose catalog entries changed,
+            None if the change is not known.
+        descriptor_version (int): The descriptor version after its bump, None if
+            the transaction did not bump it.
+        descriptor_ids (set): Ids of the artifacts whose descriptors changed.
+    """
+
+    def __init__(self):
+        self.state = None
+        self.artifact_ids = set()
+        self.descriptor_version = None
+        self.descriptor_ids = set()
+        self.committed = False
+
+    def catalog_changed(self, artifact_ids=()):
+        """
+        Records a change of the catalog, bumping its version on the first one.
+
+        Args:
+            artifact_ids (iterable): Ids of the artifacts whose catalog entries
+                changed, None if the change is not known.
+        """
+        if artifact_ids is not None:
+            artifact_ids = set(artifact_ids)
+        if self.state is None:
+            self.artifact_ids = artifact_ids
+            self.state = bump_catalog_version(artifact_ids)
+            return
+        if self.artifact_ids is None:
+            return
+        if artifact_ids is None:
+            self.artifact_ids = None
+        elif artifact_ids <= self.artifact_ids:
+            return
+        else:
+            self.artifact_ids |= artifact_ids
+        record_catalog_change(self.state, self.artifact_ids)
+
+    def descriptors_changed(self, artifact_ids):
+        """
+        Records a change of the descriptors of some artifacts, bumping the
+        descriptor version on the first one.
+
+        Args:
+            artifact_ids (iterable): Ids of the artifacts whose descriptors changed.
+        """
+        if self.descriptor_version is None:
+            self.descriptor_version = bump_descriptor_version()
+        self.descriptor_ids.update(artifact_ids)
+
+    def commit(self):
+        """
+        Applies the changes to the in-process indexes. Called once the transaction
+        commits.
+        """
+        self.committed = True
+        if self.state is not None and self.artifact_ids is not None:
+            # Se leen las entradas confirmadas: una escritura deshecha no llega al índice
+            entries = CatalogEntry.objects.filter(artifact_id__in=self.artifact_ids).only(
+                "artifact_id", "description", "culture_name", "shape_name", "tag_names"
+            )
+            apply_to_indexes(self.state, self.artifact_ids, list(entries))
+        if self.descriptor_version is not None:
+            version = self.descriptor_version
+            descriptor_index.apply(version - 1, version, self.descriptor_ids)
+
+
+def catalog_write():
+    """
+    Returns the changes the current transaction makes to the catalog, registering
+    them to be applied once it commits. Must be called inside an atomic block.
+
+    Returns:
+        CatalogWrite: The changes of the transaction.
+    """
+    write = getattr(connection, "catalog_write", None)
+    # Tras un commit o un rollback, o si se deshizo el savepoint que la registró,
+    # la transacción es otra
+    if (
+        write is None
+        or write.committed
+        or not any(callback[1] == write.commit for callback in connection.run_on_commit)
+    ):
+        write = CatalogWrite()
+        connection.catalog_write = write
+        transaction.on_commit(write.commit)
+    return write
+
+
+def touch_catalog():
+    """
+    Increments the version of the catalog after a write that does not change any
+    catalog entry but changes what the public read endpoints return, such as the
+    images of an artifact or the list of institutions.
+
+    The bitmap index is moved to the new version without being rebuilt.
+    """
+    with transaction.atomic():
+        catalog_write().catalog_changed()
+
+
+def touch_artifacts(artifact_ids):
+    """
+    Increments the version of some artifacts after a write that does not change
+    their catalog entries but changes their details, such as their images or their
+    model, and the version of the catalog.
+
+    Args:
+        artifact_ids (iterable): Ids of the changed artifacts.
+    """
+    artifact_ids = set(artifact_ids)
+    if not artifact_ids:
+        return
+    with transaction.atomic():
+        CatalogEntry.objects.filter(artifact_id__in=artifact_ids).update(
+            version=F("version") + 1, updated_at=timezone.now()
+        )
+        catalog_write().catalog_changed()
+
+
+def touch_descriptors(artifact_ids):
+    """
+    Increments the version of the photo descriptors after a write that changes the
+    descriptors of some artifacts: a new, replaced, relinked or deleted thumbnail
+    or image. The rows of those artifacts in the descriptor index of this process
+    are reloaded once committed, and the other processes reload their index.
+
+    Args:
+        artifact_ids (iterable): Ids of the artifacts whose descriptors changed.
+    """
+    artifact_ids = set(artifact_ids)
+    if not artifact_ids:
+        return
+    with transaction.atomic():
+        catalog_write().descriptors_changed(artifact_ids)
+
+
+def compute_facets(queryset):
+    """
+    Counts the cultures, shapes and tags of the entries of a CatalogEntry queryset.
+
+    Each kind is counted by one grouped query, so the database returns one row per
+    value instead of one per entry: the cultures and shapes are grouped on the
+    entries, and the tags on the artifact-tag relation table, served by its
+    (tag_id, artifact_id) index, joined to the filtered entries.
+
+    Args:
+        queryset (QuerySet): The filtered CatalogEntry queryset.
+
+    Returns:
+        dict: The facets, as built by piezas.facets.build_facets.
+    """
+    queryset = queryset.order_by()
+
+    def grouped(rows, column):
+        return dict(
+            rows.exclude(**{column + "__isnull": True})
+            .values_list(column)
+            .annotate(count=Count("*"))
+            .order_by()
+        )
+
+    cultures = grouped(queryset, "culture_name")
+    shapes = grouped(queryset, "shape_name")
+    tag_links = Artifact.id_tags.through.objects.filter(
+        artifact_id__in=queryset.values("artifact_id")
+    )
+    tags = grouped(tag_links, "tag__name")
+    return build_facets({"cultures": cultures, "shapes": shapes, "tags": tags})
+
+
+def create_catalog_indexes(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Creates the indexes used by the catalog filters that cannot be declared in the
+    models.
+
+    - A composite (tag_id, artifact_id) index on the artifact-tag relation table,
+      which Django creates for the artifact side only, for the tag filter of
+      databases without JSON containment.
+    - On PostgreSQL, a GIN index on CatalogEntry.tag_ids serving the containment
+      filter of filter_by_tags.
+
+    Connected to post_migrate.
+
+    Args:
+        sender: The application config that was migrated.
+        using (str): The alias of the migrated database.
+    """
+    db = connections[using]
+    through = Artifact.id_tags.through._meta.db_table
+    with db.cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS piezas_artifact_tags_tag_artifact "
+            f"ON {db.ops.quote_name(through)} (tag_id, artifact_id)"
+        )
+        if db.vendor == "postgresql":
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS piezas_catalogentry_tag_ids_gin "
+                "ON piezas_catalogentry USING gin (tag_ids jsonb_path_ops)"
+            )
+    logger.info("Catalog filter indexes are up to date")
+
+
+def estimate_count(queryset):
+    """
+    Estimates the number of rows of a queryset without counting them.
+
+    On PostgreSQL the estimate is the row count the planner expects for the query,
+    which costs as much as planning it. Other databases fall back to an exact count.
+
+    Args:
+        queryset (QuerySet): The queryset to estimate.
+
+    Returns:
+        int: The estimated number of rows.
+    """
+    if connection.vendor != "postgresql":
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
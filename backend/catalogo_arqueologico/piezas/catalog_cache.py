@@ -0,0 +1,223 @@
+"""
+This module caches the responses of the public read endpoints.
+
+Everything is keyed on the catalog version (see piezas.versions), so a write
+invalidates it at once: the conditional request validators (ETag and Last-Modified),
+the facets of every filter combination, shared through the Django cache, and the
+catalog pages and artifact details, kept in process.
+
+Functions:
+- catalog_state_for_request: Returns the state of the catalog, loaded once per request.
+- catalog_etag: Computes the ETag of a response of a public read endpoint.
+- catalog_last_modified: Computes the Last-Modified date of a response of a public read endpoint.
+- normalize_catalog_params: Normalizes the filter parameters of a catalog request.
+- get_facets: Returns the facets of a filter combination, cached per catalog version.
+- catalog_response_key: Computes the response cache key of a catalog request.
+- get_artifact_detail: Returns the detail of an artifact, cached per artifact version.
+"""
+
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from .catalog import parse_tag_groups
+from .media import media_base_url
+from .models import CatalogEntry
+from .response_cache import LRUResponseCache
+from .versions import get_catalog_state
+
+FACETS_CACHE_TIMEOUT = 60 * 60
+
+catalog_responses = LRUResponseCache(settings.CATALOG_RESPONSE_CACHE_SIZE)
+artifact_details = LRUResponseCache(settings.ARTIFACT_DETAIL_CACHE_SIZE)
+# Última versión conocida de cada pieza y versión del catálogo en que se comprobó
+artifact_versions = LRUResponseCache(settings.ARTIFACT_DETAIL_CACHE_SIZE)
+
+
+def catalog_state_for_request(request):
+    """
+    Returns the state of the catalog, loaded once per request.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        CatalogState: The state of the catalog.
+    """
+    if not hasattr(request, "_catalog_state"):
+        request._catalog_state = get_catalog_state()
+    return request._catalog_state
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Computes the strong ETag of a response of a public read endpoint.
+
+    Every write the endpoints depend on bumps the catalog version, so the version
+    identifies the representation of any of their URLs. Meant to be used as the
+    etag_func of django.views.decorators.http.condition.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        str: The ETag.
+    """
+    return '"catalog-{}"'.format(catalog_state_for_request(request).version)
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    """
+    Computes the Last-Modified date of a response of a public read endpoint.
+
+    Meant to be used as the last_modified_func of
+    django.views.decorators.http.condition.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        datetime: The date of the last change to the catalog.
+    """
+    return catalog_state_for_request(request).updated_at
+
+
+def normalize_catalog_params(query_params):
+    """
+    Normalizes the filter parameters of a catalog request.
+
+    Filters are matched case insensitively and tag groups are sets, so two
+    requests that only differ in case, surrounding spaces or tag order select the
+    same artifacts and get the same normalized parameters.
+
+    Args:
+        query_params (QueryDict): The query parameters of the request.
+
+    Returns:
+        tuple: The normalized query, culture, shape and tags.
+    """
+    def normalize(value):
+        return value.strip().lower() if value is not None else None
+
+    tags = query_params.get("tags", None)
+    if tags is not None:
+        groups = {
+            tuple(sorted({normalize(tag) for tag in group}))
+            for group in parse_tag_groups(tags)
+        }
+        tags = tuple(sorted(groups))
+    return (
+        normalize(query_params.get("query", None)),
+        normalize(query_params.get("culture", None)),
+        normalize(query_params.get("shape", None)),
+        tags,
+    )
+
+
+def get_facets(query_params, version, compute):
+    """
+    Returns the facets of a filter combination.
+
+    Facets are cached per catalog version and normalized filter combination, so
+    every page of the same filtered catalog shares them. The version is the one
+    the data compute reads was read at, not the current one, so facets computed
+    from data older than a concurrent write are never cached under the version
+    of the write.
+
+    Args:
+        query_params (QueryDict): The query parameters of the request.
+        version (int): The catalog version of the data compute reads, read
+            before it.
+        compute (callable): Function without arguments that computes the facets
+            on a cache miss.
+
+    Returns:
+        dict: The facets, as returned by compute_facets.
+    """
+    params = repr(normalize_catalog_params(query_params)).encode("utf-8")
+    key = "catalog:facets:{}:{}".format(version, hashlib.md5(params).hexdigest())
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute()
+        cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+def catalog_response_key(request):
+    """
+    Computes the response cache key of a catalog request.
+
+    The key holds the catalog version and its date, so bumping it invalidates every
+    cached response even if a database restore brings back an older version, and
+    the normalized filters, so equivalent requests share a response. The other
+    parameters that change the response (page, cursor, count, page size,
+    fields and ordering) are part of the key as given. The URLs of the photos
+    depend on the media base URL, which is the host of the request when
+    MEDIA_BASE_URL is not set, and the links of the cursor pages on the host of
+    the request, so they are part of the key too.
+
+    Args:
+        request: The HTTP request object.
+
+    Returns:
+        tuple: The cache key.
+    """
+    query_params = request.query_params
+    state = catalog_state_for_request(request)
+    return (
+        state.version,
+        state.updated_at,
+        normalize_catalog_params(query_params),
+        query_params.get("page", "1").strip(),
+        query_params.get("cursor", None),
+        query_params.get("count", None),
+        query_params.get("page_size", None),
+        query_params.get("fields", None),
+        query_params.get("ordering", None),
+        media_base_url(request),
+        request.build_absolute_uri("/") if "cursor" in query_params else None,
+    )
+
+
+def get_artifact_detail(request, artifact_id, compute):
+    """
+    Returns the detail of an artifact.
+
+    Details are cached in process per artifact version and media base URL. The
+    version of a cached artifact is only read again from the database when the
+    catalog version changed since it was last read, so reading a hot artifact
+    costs no query beyond the catalog state, and a write to an artifact only
+    invalidates its own detail. As in catalog_response_key, the dates of the
+    versions are part of the key in case a database restore brings back an older
+    version.
+
+    Args:
+        request: The HTTP request object.
+        artifact_id (int): The id of the artifact.
+        compute (callable): Function without arguments that computes the detail on
+            a cache miss.
+
+    Returns:
+        dict: The detail, as returned by compute.
+    """
+    state = catalog_state_for_request(request)
+    catalog_version = (state.version, state.updated_at)
+    known = artifact_versions.get(artifact_id)
+    if known is not None and known[0] == catalog_version:
+        version = known[1]
+    else:
+        version = (
+            CatalogEntry.objects.filter(artifact_id=artifact_id)
+            .values_list("version", "updated_at")
+            .first()
+        )
+        if version is None:
+            # La pieza no existe o aún no tiene entrada en el catálogo
+            return compute()
+        artifact_versions.set(artifact_id, (catalog_version, version))
+
+    key = (artifact_id, version, media_base_url(request))
+    data = artifact_details.get(key)
+    if data is None:
+        data = compute()
+        artifact_details.set(key, data)
+    return data
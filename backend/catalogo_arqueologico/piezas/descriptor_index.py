@@ -0,0 +1,334 @@
+"""
+This module implements the in-process index of the photo descriptors used by the bulk
+loading to detect artifacts that are already in the catalog.
+
+The descriptors of the thumbnails and images of every artifact are held in a float32
+matrix, one row per photo, with an aligned array of the ids of their artifacts, so a
+duplicate check is a single distance computation against the matrix instead of a
+reload of every descriptor.
+
+The index is built on first use and kept up to date with the descriptor version (see
+piezas.versions), in the same way as the bitmap index is with the catalog version
+(see piezas.indexes.get_descriptor_index): the writes of this process that change
+the photos of some artifacts mark them, and their rows are reloaded with one query
+the next time the index is read. The same writes made by other processes trigger a
+rebuild, while the other writes to the catalog leave the index untouched.
+
+The matrix can also be persisted in a folder shared by the processes of the server:
+two .npy files named after the descriptor version and a pointer file, index.json,
+that is replaced atomically once they are written. A process whose index is stale
+maps the files read-only when the pointer matches the descriptor version and date,
+which the writes to the catalog that leave the descriptors alone do not change, so every
+process shares the same pages of the operating system cache and starts without
+querying the descriptors; otherwise it rebuilds the index from the database and
+persists it for the others. The rows reloaded by the writes of a process make it a
+private copy until the next rebuild.
+
+Classes:
+- DescriptorIndex: Matrix of the descriptors of the photos of every artifact.
+
+Functions:
+- load_descriptors: Loads the stored descriptors of the photos of some artifacts.
+- save_descriptor_index: Persists a descriptor matrix for a descriptor version.
+- open_descriptor_index: Maps the persisted descriptor matrix of a descriptor version.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import numpy as np
+from .descriptors import DESCRIPTOR_SIZE, unpack_descriptors
+from .models import Artifact, Image
+
+logger = logging.getLogger(__name__)
+
+INDEX_POINTER = "index.json"
+
+
+def load_descriptors(artifact_ids=None):
+    """
+    Loads the stored descriptors of the thumbnails and images of some artifacts.
+
+    Thumbnails and images are fetched with a single query and decoded with one
+    np.frombuffer. Photos without a binary descriptor are skipped.
+
+    Args:
+        artifact_ids (iterable): Ids of the artifacts, None for every artifact.
+
+    Returns:
+        tuple: A float32 matrix with one descriptor per row and an int64 array with
+            the id of the artifact of every row.
+    """
+    images = Image.objects.filter(id_artifact__isnull=False, descriptor_bytes__isnull=False)
+    thumbnails = Artifact.objects.filter(id_thumbnail__descriptor_bytes__isnull=False)
+    if artifact_ids is not None:
+        artifact_ids = list(artifact_ids)
+        images = images.filter(id_artifact__in=artifact_ids)
+        thumbnails = thumbnails.filter(id__in=artifact_ids)
+    rows = list(
+        images.values_list("id_artifact_id", "descriptor_bytes").union(
+            thumbnails.values_list("id", "id_thumbnail__descriptor_bytes"), all=True
+        )
+    )
+    ids = np.array([artifact_id for artifact_id, _ in rows], dtype=np.int64)
+    return unpack_descriptors([descriptor for _, descriptor in rows]), ids
+
+
+def _state_stamp(state):
+    """
+    Returns what identifies the descriptors of a catalog state in the pointer file.
+    The date tells apart the same version brought back by a database restore.
+    """
+    return {
+        "version": state.descriptor_version,
+        "updated_at": state.descriptors_updated_at.isoformat(),
+    }
+
+
+def _read_pointer(directory):
+    """
+    Reads the pointer file of a descriptor index folder.
+
+    Returns:
+        dict: The contents of the pointer, None if it is missing or malformed.
+    """
+    try:
+        with open(os.path.join(directory, INDEX_POINTER), encoding="utf-8") as file:
+            pointer = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return pointer if isinstance(pointer, dict) else None
+
+
+def _write_array(directory, prefix, array):
+    """
+    Writes an array to a new .npy file of the folder and returns its name.
+    """
+    descriptor, path = tempfile.mkstemp(prefix=prefix, suffix=".npy", dir=directory)
+    try:
+        # mkstemp solo deja leer al dueño, y el índice lo leen todos los procesos
+        os.chmod(path, 0o644)
+        with os.fdopen(descriptor, "wb") as file:
+            np.save(file, array)
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        os.unlink(path)
+        raise
+    return os.path.basename(path)
+
+
+def save_descriptor_index(directory, state, descriptors, artifact_ids):
+    """
+    Persists a descriptor matrix for a descriptor version.
+
+    The arrays are written to new files and then the pointer file is replaced
+    atomically, so the processes that read the folder at the same time see either
+    the previous index or the new one. Nothing is written if the folder already
+    holds a newer version, and the files of older versions are removed: the
+    processes that mapped them keep them open until they rebuild.
+
+    Args:
+        directory (str): The folder of the index, created if needed.
+        state (CatalogState): The catalog state the matrix reflects, read before it.
+        descriptors (numpy.ndarray): The float32 matrix of descriptors.
+        artifact_ids (numpy.ndarray): The aligned int64 array of artifact ids.
+
+    Returns:
+        bool: Whether the index was written.
+
+    Raises:
+        OSError: If the files cannot be written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    pointer = _read_pointer(directory)
+    version = state.descriptor_version
+    if pointer is not None and pointer.get("version", 0) > version:
+        return False
+    prefix = f"{version}-"
+    written = {
+        "descriptors": _write_array(
+            directory, "descriptors-" + prefix, np.ascontiguousarray(descriptors, dtype="<f4")
+        ),
+        "artifact_ids": _write_array(
+            directory, "artifact_ids-" + prefix, np.ascontiguousarray(artifact_ids, dtype="<i8")
+        ),
+    }
+    pointer = dict(_state_stamp(state), **written)
+    descriptor, path = tempfile.mkstemp(prefix="index-", suffix=".tmp", dir=directory)
+    try:
+        os.chmod(path, 0o644)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+            json.dump(pointer, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path, os.path.join(directory, INDEX_POINTER))
+    except BaseException:
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+
+    # Se borran los archivos de versiones anteriores; los de la misma versión pueden
+    # ser de otro proceso que todavía no reemplaza el puntero
+    for name in os.listdir(directory):
+        kind, _, rest = name.partition("-")
+        file_version = rest.split("-", 1)[0]
+        if kind in written and name.endswith(".npy") and file_version.isdigit():
+            if int(file_version) < version:
+                try:
+                    os.unlink(os.path.join(directory, name))
+                except OSError:
+                    pass
+    return True
+
+
+def open_descriptor_index(directory, state):
+    """
+    Maps read-only the persisted descriptor matrix of a descriptor version.
+
+    Args:
+        directory (str): The folder of the index.
+        state (CatalogState): The current catalog state.
+
+    Returns:
+        tuple: The memory-mapped float32 matrix of descriptors and int64 array of
+            artifact ids, None if the folder holds no index for the descriptors of
+            the catalog state.
+    """
+    pointer = _read_pointer(directory)
+    if pointer is None or any(
+        pointer.get(key) != value for key, value in _state_stamp(state).items()
+    ):
+        return None
+    try:
+        descriptors = np.load(
+            os.path.join(directory, pointer["descriptors"]), mmap_mode="r", allow_pickle=False
+        )
+        artifact_ids = np.load(
+            os.path.join(directory, pointer["artifact_ids"]), mmap_mode="r", allow_pickle=False
+        )
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Could not open the descriptor index: {e}")
+        return None
+    if (
+        descriptors.dtype != np.float32
+        or artifact_ids.dtype != np.int64
+        or descriptors.ndim != 2
+        or descriptors.shape[1:] != (DESCRIPTOR_SIZE,)
+        or artifact_ids.shape != (len(descriptors),)
+    ):
+        logger.warning("The descriptor index files are malformed")
+        return None
+    return descriptors, artifact_ids
+
+
+class DescriptorIndex:
+    """
+    Matrix of the descriptors of the thumbnails and images of every artifact.
+
+    The matrix and the ids are replaced, never modified, so the arrays returned by
+    snapshot stay valid while the index changes, including those mapped from the
+    persisted files. Every method is safe to call from several threads.
+
+    Attributes:
+        version (int): The descriptor version the index reflects, None if never built.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.pending = set()
+        self.descriptors = np.empty((0, DESCRIPTOR_SIZE), dtype=np.float32)
+        self.artifact_ids = np.empty(0, dtype=np.int64)
+
+    def rebuild(self, version):
+        """
+        Rebuilds the index from every stored descriptor.
+
+        Args:
+            version (int): The descriptor version the rebuilt index reflects.
+        """
+        descriptors, artifact_ids = load_descriptors()
+        with self.lock:
+            self.descriptors, self.artifact_ids = descriptors, artifact_ids
+            self.pending = set()
+            self.version = version
+
+    def open(self, directory, state):
+        """
+        Replaces the index with the matrix persisted for the catalog state.
+
+        Args:
+            directory (str): The folder of the persisted index.
+            state (CatalogState): The current catalog state.
+
+        Returns:
+            bool: Whether the folder held the index of the catalog state.
+        """
+        arrays = open_descriptor_index(directory, state)
+        if arrays is None:
+            return False
+        with self.lock:
+            self.descriptors, self.artifact_ids = arrays
+            self.pending = set()
+            self.version = state.descriptor_version
+        return True
+
+    def save(self, directory, state):
+        """
+        Persists the index for the other processes if it reflects the catalog state
+        and no write of this process is waiting to be reloaded.
+
+        Args:
+            directory (str): The folder of the persisted index.
+            state (CatalogState): The catalog state the index was built for.
+        """
+        with self.lock:
+            if self.version != state.descriptor_version or self.pending:
+                return
+            descriptors, artifact_ids = self.descriptors, self.artifact_ids
+        try:
+            save_descriptor_index(directory, state, descriptors, artifact_ids)
+        except OSError as e:
+            logger.error(f"Could not save the descriptor index: {e}")
+
+    def apply(self, previous_version, version, artifact_ids):
+        """
+        Marks the artifacts whose photos may have changed, so their rows are
+        reloaded the next time the index is read.
+
+        The change is only applied if the index reflected the descriptor version the
+        change was made on, otherwise the index is left stale so it is rebuilt.
+
+        Args:
+            previous_version (int): The descriptor version before the change.
+            version (int): The descriptor version after the change.
+            artifact_ids (iterable): Ids of the artifacts that changed.
+        """
+        with self.lock:
+            if self.version != previous_version:
+                return
+            self.pending.update(artifact_ids)
+            self.version = version
+
+    def snapshot(self):
+        """
+        Returns the descriptors and the ids of their artifacts, reloading the rows
+        of the artifacts marked by apply first.
+
+        Returns:
+            tuple: The read-only float32 matrix of descriptors and the aligned int64
+                array of artifact ids.
+        """
+        with self.lock:
+            if self.pending:
+                artifact_ids = list(self.pending)
+                descriptors, ids = load_descriptors(artifact_ids)
+                kept = ~np.isin(self.artifact_ids, artifact_ids)
+                self.descriptors = np.concatenate([self.descriptors[kept], descriptors])
+                self.artifact_ids = np.concatenate([self.artifact_ids[kept], ids])
+                self.descriptors.flags.writeable = False
+                self.pending = set()
+            return self.descriptors, self.artifact_ids
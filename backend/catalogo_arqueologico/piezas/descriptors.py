@@ -0,0 +1,195 @@
+"""
+This module computes the descriptors used to find duplicate photos of artifacts.
+
+A descriptor is the concatenation of the normalized grayscale histograms of the zones
+of a grid laid over the equalized photo: 4 x 4 zones of 8 bins each, 128 values in
+total. All the zones are counted in a single pass: every pixel is mapped to the
+index of its zone and bin, and the indices are counted at once, with cv2.calcHist
+when they fit in a byte and with np.bincount otherwise.
+
+Descriptors are stored as the raw bytes of their float32 values, 512 bytes each, so
+a whole set of them is loaded with a single np.frombuffer. Descriptors saved before
+were JSON text, which the convertDescriptors command turns into bytes.
+
+Functions:
+- zone_histograms: Computes the descriptor of an equalized grayscale image.
+- zone_histograms_loop: Computes the descriptor zone by zone, as it was originally.
+- compute_descriptor: Reads a photo and computes its descriptor.
+- pack_descriptor: Encodes a descriptor as bytes.
+- unpack_descriptors: Decodes a sequence of stored descriptors as a matrix.
+- parse_legacy_descriptor: Parses a descriptor stored as JSON text.
+"""
+
+import json
+from ast import literal_eval
+import cv2
+import numpy as np
+
+ZONES_X = 4
+ZONES_Y = 4
+BINS = 8
+DESCRIPTOR_SIZE = ZONES_X * ZONES_Y * BINS
+
+
+def _zone_bounds(size, zones):
+    """
+    Returns the first pixel of every zone along an axis, followed by the size.
+    """
+    return [int(size / zones * zone) for zone in range(zones + 1)]
+
+
+def zone_histograms(image, zones_x=ZONES_X, zones_y=ZONES_Y, bins=BINS, dtype=np.float32):
+    """
+    Computes the descriptor of an equalized grayscale image.
+
+    Pixels are binned as np.histogram(zone, bins, range=(0, 255)) does, so with
+    dtype=np.float64 the result is identical to zone_histograms_loop.
+
+    Args:
+        image (numpy.ndarray): The uint8 grayscale image.
+        zones_x (int): Number of zones along the width.
+        zones_y (int): Number of zones along the height.
+        bins (int): Number of bins of the histogram of every zone.
+        dtype (numpy.dtype): Type of the values of the descriptor.
+
+    Returns:
+        numpy.ndarray: The histograms of the zones, row by row, each summing 1.
+    """
+    height, width = image.shape[:2]
+    row_bounds = _zone_bounds(height, zones_y)
+    column_bounds = _zone_bounds(width, zones_x)
+    # Zona de cada fila y columna, con los mismos cortes que el recorte por zonas
+    rows = np.searchsorted(row_bounds, np.arange(height), side="right") - 1
+    columns = np.searchsorted(column_bounds, np.arange(width), side="right") - 1
+    size = zones_x * zones_y * bins
+    # Intervalo de cada nivel de gris: v cae en k si k * 255 / bins <= v, 255 en el último
+    levels = np.minimum(np.arange(256) * bins // 255, bins - 1)
+    # Primer índice de la zona de cada fila y de cada columna, sumados al del nivel
+    row_offsets = rows * zones_x * bins
+    column_offsets = columns * bins
+
+    largest_zone = max(np.diff(row_bounds)) * max(np.diff(column_bounds))
+    if size <= 256 and image.dtype == np.uint8 and largest_zone < 2**24:
+        # Con la grilla por defecto los índices caben en un byte: cv2 los calcula y
+        # cuenta sin copias de 64 bits, y los conteos en float32 siguen siendo exactos
+        indices = cv2.LUT(image, levels.astype(np.uint8))
+        indices += row_offsets.astype(np.uint8)[:, None]
+        indices += column_offsets.astype(np.uint8)[None, :]
+        counts = cv2.calcHist([indices], [0], None, [size], [0, size]).astype(np.int64)
+    else:
+        indices = levels[image] + row_offsets[:, None] + column_offsets[None, :]
+        counts = np.bincount(indices.ravel(), minlength=size)
+    counts = counts.reshape(-1, bins)
+    histograms = counts / counts.sum(axis=1, keepdims=True)
+    return histograms.ravel().astype(dtype, copy=False)
+
+
+def zone_histograms_loop(image, zones_x=ZONES_X, zones_y=ZONES_Y, bins=BINS):
+    """
+    Computes the descriptor of an equalized grayscale image zone by zone.
+
+    This is the original implementation, kept as the reference of zone_histograms
+    in the tests and in the benchmarkDescriptors command.
+
+    Args:
+        image (numpy.ndarray): The uint8 grayscale image.
+        zones_x (int): Number of zones along the width.
+        zones_y (int): Number of zones along the height.
+        bins (int): Number of bins of the histogram of every zone.
+
+    Returns:
+        list: The histograms of the zones, row by row, each summing 1.
+    """
+    descriptor = []
+    for j in range(zones_y):
+        desde_y = int(image.shape[0] / zones_y * j)
+        hasta_y = int(image.shape[0] / zones_y * (j + 1))
+        for i in range(zones_x):
+            desde_x = int(image.shape[1] / zones_x * i)
+            hasta_x = int(image.shape[1] / zones_x * (i + 1))
+            # recortar zona de la img
+            zona = image[desde_y:hasta_y, desde_x:hasta_x]
+            # histograma de los pixeles de la zona
+            histograma, limites = np.histogram(zona, bins=bins, range=(0, 255))
+            # normalizar histograma (bins suman 1)
+            histograma = histograma / np.sum(histograma)
+            # agregar descriptor de la zona al descriptor global
+            descriptor.extend(histograma)
+    return descriptor
+
+
+def compute_descriptor(path):
+    """
+    Reads a photo and computes its descriptor.
+
+    Args:
+        path (str): The path of the photo.
+
+    Returns:
+        numpy.ndarray: The float32 descriptor.
+
+    Raises:
+        ValueError: If the photo cannot be read.
+    """
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Could not read {path}")
+    return zone_histograms(cv2.equalizeHist(image))
+
+
+def pack_descriptor(descriptor):
+    """
+    Encodes a descriptor as the bytes of its float32 values.
+
+    Args:
+        descriptor (numpy.ndarray): The descriptor.
+
+    Returns:
+        bytes: The stored descriptor.
+    """
+    return np.asarray(descriptor, dtype="<f4").tobytes()
+
+
+def unpack_descriptors(stored, size=DESCRIPTOR_SIZE):
+    """
+    Decodes a sequence of stored descriptors as a matrix.
+
+    Args:
+        stored (list): The stored descriptors, as returned by pack_descriptor.
+        size (int): Number of values of every descriptor.
+
+    Returns:
+        numpy.ndarray: A read-only float32 matrix with one descriptor per row.
+
+    Raises:
+        ValueError: If a descriptor does not have the given number of values.
+    """
+    data = b"".join(bytes(descriptor) for descriptor in stored)
+    if len(data) != len(stored) * size * 4:
+        raise ValueError(f"Stored descriptors must have {size} float32 values")
+    return np.frombuffer(data, dtype="<f4").reshape(len(stored), size)
+
+
+def parse_legacy_descriptor(text):
+    """
+    Parses a descriptor stored as JSON text.
+
+    Args:
+        text (str): The stored descriptor, possibly empty.
+
+    Returns:
+        numpy.ndarray: The float32 descriptor, None if it is missing or malformed.
+    """
+    if not text:
+        return None
+    try:
+        values = json.loads(text)
+    except ValueError:
+        try:
+            values = literal_eval(text)
+        except (ValueError, SyntaxError):
+            return None
+    try:
+        return np.array(values, dtype=np.float32).ravel()
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,232 @@
+"""
+This module implements the full export of the catalog.
+
+The export is produced as a generator of text chunks, so it can be streamed to the
+client with constant memory: the catalog entries and the images are read through two
+database iterators ordered by artifact id and merged on the fly, instead of loading
+every artifact with its relations.
+
+Functions:
+- export_rows: Yields one dictionary per artifact of the catalog.
+- export_ndjson: Yields the catalog as newline delimited JSON.
+- export_csv: Yields the catalog as CSV.
+"""
+
+import csv
+import json
+from .descriptors import parse_legacy_descriptor, unpack_descriptors
+from .media import media_url
+from .models import CatalogEntry, Image
+
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_COLUMNS = [
+    "id",
+    "description",
+    "shape",
+    "culture",
+    "tags",
+    "thumbnail",
+    "model_object",
+    "model_material",
+    "model_texture",
+    "images",
+    "thumbnail_descriptor",
+    "image_descriptors",
+]
+
+
+class _Echo:
+    """
+    File-like object that returns what is written to it, used to stream CSV rows.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _images_by_artifact(rows):
+    """
+    Groups image rows ordered by artifact id.
+
+    Args:
+        rows (iterator): Tuples of artifact id, path and descriptors, ordered by
+            artifact id.
+
+    Yields:
+        tuple: The artifact id and the list of its (path, descriptor, legacy
+            descriptor) tuples.
+    """
+    current_id = None
+    images = []
+    for artifact_id, path, descriptor, legacy in rows:
+        if artifact_id != current_id:
+            if images:
+                yield current_id, images
+            current_id = artifact_id
+            images = []
+        images.append((path, descriptor, legacy))
+    if images:
+        yield current_id, images
+
+
+def _load_descriptor(descriptor, legacy):
+    """
+    Decodes a stored descriptor.
+
+    Args:
+        descriptor (bytes): The stored float32 descriptor, possibly empty.
+        legacy (str): The descriptor stored as JSON text by older versions, used
+            when there is no float32 descriptor.
+
+    Returns:
+        list: The descriptor, None if it is missing or malformed.
+    """
+    if descriptor:
+        return unpack_descriptors([descriptor])[0].tolist()
+    values = parse_legacy_descriptor(legacy)
+    return None if values is None else values.tolist()
+
+
+def export_rows(request, descriptors=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields one dictionary per artifact of the catalog, ordered by id.
+
+    Args:
+        request: The HTTP request, used to build absolute URLs.
+        descriptors (bool): Whether to include the descriptors of the thumbnail
+            and the images.
+        chunk_size (int): Number of rows fetched from the database at a time.
+
+    Yields:
+        dict: The id, attributes, thumbnail, model and images of an artifact.
+    """
+
+    columns = [
+        "artifact_id",
+        "description",
+        "shape_id",
+        "shape_name",
+        "culture_id",
+        "culture_name",
+        "tag_ids",
+        "tag_names",
+        "thumbnail",
+        "artifact__id_model__object",
+        "artifact__id_model__material",
+        "artifact__id_model__texture",
+    ]
+    if descriptors:
+        columns += [
+            "artifact__id_thumbnail__descriptor_bytes",
+            "artifact__id_thumbnail__descriptor",
+        ]
+    entries = (
+        CatalogEntry.objects.order_by("artifact_id")
+        .values(*columns)
+        .iterator(chunk_size=chunk_size)
+    )
+    images = _images_by_artifact(
+        Image.objects.filter(id_artifact__isnull=False)
+        .order_by("id_artifact_id", "id")
+        .values_list("id_artifact_id", "path", "descriptor_bytes", "descriptor")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    next_images = next(images, None)
+    for entry in entries:
+        artifact_id = entry["artifact_id"]
+        # Las imágenes vienen ordenadas por pieza: se descartan las de piezas sin entrada
+        while next_images is not None and next_images[0] < artifact_id:
+            next_images = next(images, None)
+        artifact_images = []
+        if next_images is not None and next_images[0] == artifact_id:
+            artifact_images = next_images[1]
+            next_images = next(images, None)
+
+        model = None
+        if entry["artifact__id_model__object"]:
+            model = {
+                "object": media_url(request, entry["artifact__id_model__object"]),
+                "material": media_url(request, entry["artifact__id_model__material"]),
+                "texture": media_url(request, entry["artifact__id_model__texture"]),
+            }
+        row = {
+            "id": artifact_id,
+            "attributes": {
+                "shape": {"id": entry["shape_id"], "value": entry["shape_name"]},
+                "tags": [
+                    {"id": tag_id, "value": tag_name}
+                    for tag_id, tag_name in zip(entry["tag_ids"], entry["tag_names"])
+                ],
+                "culture": {"id": entry["culture_id"], "value": entry["culture_name"]},
+                "description": entry["description"],
+            },
+            "thumbnail": media_url(request, entry["thumbnail"]),
+            "model": model,
+            "images": [media_url(request, path) for path, _, _ in artifact_images],
+        }
+        if descriptors:
+            row["descriptors"] = {
+                "thumbnail": _load_descriptor(
+                    entry["artifact__id_thumbnail__descriptor_bytes"],
+                    entry["artifact__id_thumbnail__descriptor"],
+                ),
+                "images": [
+                    _load_descriptor(descriptor, legacy)
+                    for _, descriptor, legacy in artifact_images
+                ],
+            }
+        yield row
+
+
+def export_ndjson(request, descriptors=False):
+    """
+    Yields the catalog as newline delimited JSON, one artifact per line.
+
+    Args:
+        request: The HTTP request, used to build absolute URLs.
+        descriptors (bool): Whether to include the descriptors.
+
+    Yields:
+        str: One line of the export.
+    """
+    for row in export_rows(request, descriptors):
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def export_csv(request, descriptors=False):
+    """
+    Yields the catalog as CSV, one artifact per row.
+
+    Tags and images are joined with '|' and descriptors are written as JSON.
+
+    Args:
+        request: The HTTP request, used to build absolute URLs.
+        descriptors (bool): Whether to include the descriptor columns.
+
+    Yields:
+        str: One line of the export.
+    """
+    columns = CSV_COLUMNS if descriptors else CSV_COLUMNS[:-2]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in export_rows(request, descriptors):
+        attributes = row["attributes"]
+        model = row["model"] or {}
+        values = [
+            row["id"],
+            attributes["description"],
+            attributes["shape"]["value"] or "",
+            attributes["culture"]["value"] or "",
+            "|".join(tag["value"] for tag in attributes["tags"]),
+            row["thumbnail"] or "",
+            model.get("object", ""),
+            model.get("material", ""),
+            model.get("texture", ""),
+            "|".join(row["images"]),
+        ]
+        if descriptors:
+            values.append(json.dumps(row["descriptors"]["thumbnail"]))
+            values.append(json.dumps(row["descriptors"]["images"]))
+        yield writer.writerow(values)
@@ -0,0 +1,60 @@
+"""
+This module holds what the two ways of computing the facets of the catalog share.
+
+The facets of a filter combination are counted either by the database (see
+piezas.catalog.compute_facets) or by the in-process index (see
+piezas.bitmap_index.CatalogBitmapIndex.facets). Both count every name as stored and
+build the facets with build_facets, so the same filters get the same facets, in
+the same order, whichever path serves them.
+
+Functions:
+- fold_name: Returns the key names are matched and grouped under.
+- build_facets: Builds the facets from the counts of every stored name.
+"""
+
+FACET_KINDS = ("cultures", "shapes", "tags")
+
+
+def fold_name(name):
+    """
+    Returns the key a culture, shape or tag name is matched and grouped under.
+
+    Names are folded to upper case, as the case insensitive filters of the catalog
+    do on PostgreSQL.
+
+    Args:
+        name (str): The name.
+
+    Returns:
+        str: The folded name.
+    """
+    return name.upper()
+
+
+def build_facets(counts):
+    """
+    Builds the facets of a filter combination from the counts of every stored name.
+
+    Names that only differ in case are merged under the smallest of them, and the
+    names of every kind are sorted by decreasing count and then by name.
+
+    Args:
+        counts (dict): The count of every stored name of the matching entries,
+            under the "cultures", "shapes" and "tags" keys.
+
+    Returns:
+        dict: The names of the available cultures, shapes and tags, sorted, and
+            their counts under the "counts" key.
+    """
+    facets = {"counts": {}}
+    for kind in FACET_KINDS:
+        merged = {}
+        for name, count in counts[kind].items():
+            if not count:
+                continue
+            total, shown = merged.get(fold_name(name), (0, name))
+            merged[fold_name(name)] = (total + count, min(shown, name))
+        kind_counts = {name: total for total, name in merged.values()}
+        facets[kind] = sorted(kind_counts, key=lambda name: (-kind_counts[name], name))
+        facets["counts"][kind] = kind_counts
+    return facets
@@ -0,0 +1,129 @@
+"""
+This module holds the in-process indexes of the catalog.
+
+Every process keeps a bitmap index of the catalog filters, an autocomplete index of
+the vocabulary and a matrix of the photo descriptors. The writes of the process
+apply their changes to them once committed, once per transaction (see
+piezas.catalog.CatalogWrite). The getters apply the changes
+of the catalog entries made by other processes from the change log to the bitmap
+index, and rebuild the other indexes when another process changed the catalog, or
+its descriptors for the matrix.
+
+Functions:
+- apply_to_indexes: Applies a change of the catalog to the in-process indexes.
+- get_catalog_index: Returns the in-process bitmap index, updated if the catalog changed.
+- get_autocomplete_index: Returns the in-process autocomplete index, rebuilt if the
+  catalog changed in another process.
+- get_descriptor_index: Returns the in-process descriptor index, rebuilt if the photo
+  descriptors changed.
+"""
+
+import time
+from django.conf import settings
+from .autocomplete import AutocompleteIndex
+from .bitmap_index import CatalogBitmapIndex
+from .descriptor_index import DescriptorIndex
+from .models import CatalogEntry
+from .versions import get_catalog_changes, get_catalog_state, get_catalog_version
+
+catalog_index = CatalogBitmapIndex()
+autocomplete_index = AutocompleteIndex()
+descriptor_index = DescriptorIndex()
+
+
+def apply_to_indexes(state, artifact_ids, entries):
+    """
+    Applies a change of the catalog to the in-process bitmap and autocomplete indexes.
+
+    Args:
+        state (CatalogState): The state of the catalog after the change.
+        artifact_ids (iterable): Ids of the artifacts whose entries changed.
+        entries (list): The new catalog entries of those artifacts.
+    """
+    version = state.version
+    catalog_index.apply(version - 1, version, artifact_ids, entries, state.updated_at)
+    autocomplete_index.apply(version - 1, version, artifact_ids, entries)
+
+
+def get_catalog_index(state=None):
+    """
+    Returns the in-process bitmap index of the catalog.
+
+    The index is updated incrementally by the writes of this process. The writes
+    of other processes are read from the change log (see
+    piezas.versions.get_catalog_changes) and only the entries of their artifacts
+    are loaded. The index is rebuilt from every catalog entry when the log does
+    not describe them, as after a rebuild or a restore of the catalog.
+
+    Args:
+        state (CatalogState): The current state of the catalog, read if None.
+
+    Returns:
+        CatalogBitmapIndex: The up to date index.
+    """
+    if state is None:
+        state = get_catalog_state()
+    with catalog_index.lock:
+        previous_version = catalog_index.version
+        previous_updated_at = catalog_index.updated_at
+    if previous_version == state.version and previous_updated_at == state.updated_at:
+        return catalog_index
+    artifact_ids = None
+    if previous_version is not None:
+        artifact_ids = get_catalog_changes(previous_version, previous_updated_at, state.version)
+    if artifact_ids is not None:
+        entries = CatalogEntry.objects.filter(artifact_id__in=artifact_ids).only(
+            "artifact_id", "culture_name", "shape_name", "tag_names"
+        )
+        catalog_index.apply(
+            previous_version, state.version, artifact_ids, list(entries), state.updated_at
+        )
+    # Sin registro, o si otro hilo cambió el índice entretanto, se reconstruye
+    if catalog_index.version != state.version or catalog_index.updated_at != state.updated_at:
+        catalog_index.rebuild(state.version, state.updated_at)
+    return catalog_index
+
+
+def get_autocomplete_index():
+    """
+    Returns the in-process autocomplete index.
+
+    The index is updated incrementally by the writes of this process. The catalog
+    version is checked at most every AUTOCOMPLETE_CHECK_INTERVAL seconds, and the
+    index is rebuilt when another process changed the catalog, so suggestions do
+    not query the database on every keystroke.
+
+    Returns:
+        AutocompleteIndex: The index.
+    """
+    now = time.monotonic()
+    checked_at = autocomplete_index.checked_at
+    if checked_at is None or now - checked_at >= settings.AUTOCOMPLETE_CHECK_INTERVAL:
+        autocomplete_index.checked_at = now
+        version = get_catalog_version()
+        if autocomplete_index.version != version:
+            autocomplete_index.rebuild(version)
+    return autocomplete_index
+
+
+def get_descriptor_index():
+    """
+    Returns the in-process descriptor index.
+
+    The index is built on first use, updated incrementally by the writes of this
+    process and reloaded when another process changed the photo descriptors, so
+    the other writes to the catalog do not reload it: it is mapped from the files
+    in DESCRIPTOR_INDEX_DIR if they hold the current version, and otherwise
+    rebuilt from the stored descriptors and persisted there.
+
+    Returns:
+        DescriptorIndex: The up to date index.
+    """
+    state = get_catalog_state()
+    if descriptor_index.version != state.descriptor_version:
+        directory = settings.DESCRIPTOR_INDEX_DIR
+        if not directory or not descriptor_index.open(directory, state):
+            descriptor_index.rebuild(state.descriptor_version)
+            if directory:
+                descriptor_index.save(directory, state)
+    return descriptor_index
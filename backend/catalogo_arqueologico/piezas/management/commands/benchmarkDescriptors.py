@@ -0,0 +1,72 @@
+"""
+This module contains a Django management command that compares the time taken by
+the vectorized descriptor with the original zone by zone implementation.
+"""
+
+import timeit
+import cv2
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from piezas.descriptors import zone_histograms, zone_histograms_loop
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel("INFO")
+
+
+class Command(BaseCommand):
+    """
+    This command times both implementations of the descriptor (see
+    piezas.descriptors) on the given photos, or on random images of the given sizes,
+    and checks that their results are identical.
+
+    Attributes:
+        help (str): A short description of the command that is displayed when running
+            'python manage.py help benchmarkDescriptors'.
+    """
+
+    help = "Compare the time taken by the vectorized and the original descriptor."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", help="Photos to compute the descriptor of.")
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[256, 1024, 4096],
+            help="Sides of the random square images used when no photo is given.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20, help="Times each descriptor is computed."
+        )
+
+    def handle(self, *args, **kwargs):
+        """
+        Executes the command to time the descriptors.
+        """
+        images = []
+        for path in kwargs["paths"]:
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if image is None:
+                raise CommandError(f"Could not read {path}")
+            images.append((path, cv2.equalizeHist(image)))
+        if not images:
+            rng = np.random.default_rng(0)
+            for size in kwargs["sizes"]:
+                image = rng.integers(0, 256, (size, size), dtype=np.uint8)
+                images.append((f"{size}x{size}", cv2.equalizeHist(image)))
+
+        repeat = kwargs["repeat"]
+        for name, image in images:
+            identical = np.array_equal(
+                zone_histograms(image, dtype=np.float64),
+                np.array(zone_histograms_loop(image)),
+                equal_nan=True,
+            )
+            loop = timeit.timeit(lambda: zone_histograms_loop(image), number=repeat) / repeat
+            vectorized = timeit.timeit(lambda: zone_histograms(image), number=repeat) / repeat
+            logger.info(
+                f"{name}: loop {loop * 1000:.2f} ms, vectorized {vectorized * 1000:.2f} ms "
+                f"({loop / vectorized:.1f}x), identical: {identical}"
+            )
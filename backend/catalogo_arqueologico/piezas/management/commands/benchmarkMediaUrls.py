@@ -0,0 +1,77 @@
+"""
+This module contains a Django management command that measures the cost of building
+the URLs of the uploaded files.
+"""
+
+import timeit
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from piezas.media import media_url
+
+
+class Command(BaseCommand):
+    """
+    This command compares building file URLs through the storage and the request
+    with the concatenation done by piezas.media, for a typical catalog row (a
+    thumbnail, the three model files and four images).
+
+    Attributes:
+        help (str): A short description of the command that is displayed when running
+            'python manage.py help benchmarkMediaUrls'.
+    """
+
+    help = "Measure the per-row cost of building the URLs of the uploaded files."
+
+    NAMES = [
+        "thumbnails/0001_thumbnail.jpg",
+        "objects/0001.obj",
+        "materials/0001.mtl",
+        "materials/0001.jpg",
+        "images/0001_1.jpg",
+        "images/0001_2.jpg",
+        "images/0001_3.jpg",
+        "images/0001_4.jpg",
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, default=10000, help="Number of rows built per run."
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Number of runs, the best is kept."
+        )
+
+    def handle(self, *args, **options):
+        """
+        Executes the benchmark and prints the cost per row of each method.
+        """
+        rows = options["rows"]
+        repeat = options["repeat"]
+        names = self.NAMES
+
+        def storage_urls():
+            request = RequestFactory().get("/api/catalog/artifacts/")
+            for _ in range(rows):
+                [request.build_absolute_uri(default_storage.url(name)) for name in names]
+
+        def concatenated_urls():
+            request = RequestFactory().get("/api/catalog/artifacts/")
+            for _ in range(rows):
+                [media_url(request, name) for name in names]
+
+        def best(function):
+            return min(timeit.repeat(function, number=1, repeat=repeat))
+
+        timings = [
+            ("build_absolute_uri + storage.url", best(storage_urls)),
+            ("media_url, base URL from the request", best(concatenated_urls)),
+        ]
+        with override_settings(MEDIA_BASE_URL="https://media.example.org/media/"):
+            timings.append(("media_url, MEDIA_BASE_URL set", best(concatenated_urls)))
+
+        baseline = timings[0][1]
+        for label, seconds in timings:
+            self.stdout.write(
+                f"{label:40} {seconds / rows * 1e6:8.2f} us/row  x{baseline / seconds:.1f}"
+            )
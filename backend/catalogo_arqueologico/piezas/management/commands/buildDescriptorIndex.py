@@ -0,0 +1,53 @@
+"""
+This module contains a Django management command that persists the descriptor index
+shared by the processes of the server.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from piezas.versions import get_catalog_state
+from piezas.descriptor_index import load_descriptors, save_descriptor_index
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel("INFO")
+
+
+class Command(BaseCommand):
+    """
+    This command loads the descriptors of the photos of every artifact and writes
+    them to DESCRIPTOR_INDEX_DIR for the current descriptor version (see
+    piezas.descriptor_index), so the processes of the server map them instead of
+    querying them until a write changes the descriptors. The files are replaced atomically, so it can run while the
+    server is up, for example after a bulk import.
+
+    Attributes:
+        help (str): A short description of the command that is displayed when running
+            'python manage.py help buildDescriptorIndex'.
+    """
+
+    help = "Persist the descriptor index shared by the server processes."
+
+    def handle(self, *args, **kwargs):
+        """
+        Executes the command to build the descriptor index.
+        """
+        directory = settings.DESCRIPTOR_INDEX_DIR
+        if not directory:
+            raise CommandError("DESCRIPTOR_INDEX_DIR is not set")
+        # El estado se lee antes que los descriptores: si cambian entretanto, el
+        # índice queda con una versión anterior y se reconstruye al usarlo
+        state = get_catalog_state()
+        descriptors, artifact_ids = load_descriptors()
+        try:
+            written = save_descriptor_index(directory, state, descriptors, artifact_ids)
+        except OSError as e:
+            raise CommandError(f"Could not save the descriptor index: {e}")
+        if written:
+            logger.info(
+                f"Descriptor index of version {state.descriptor_version} saved with "
+                f"{len(descriptors)} descriptors"
+            )
+        else:
+            logger.info("The descriptor index already holds a newer version")
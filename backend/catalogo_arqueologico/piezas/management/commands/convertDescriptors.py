@@ -0,0 +1,86 @@
+"""
+This module contains a Django management command that converts the descriptors
+stored as JSON text to the binary float32 column.
+"""
+
+from django.core.management.base import BaseCommand
+from piezas.descriptors import (
+    DESCRIPTOR_SIZE,
+    compute_descriptor,
+    pack_descriptor,
+    parse_legacy_descriptor,
+)
+from piezas.models import Image, Thumbnail
+from piezas.versions import bump_descriptor_version
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel("INFO")
+
+
+class Command(BaseCommand):
+    """
+    This command stores the descriptor of every thumbnail and image saved before
+    descriptors were binary (see piezas.descriptors) as float32 bytes, and clears
+    the JSON text. Descriptors that are missing or malformed are computed again
+    from the photo. The descriptor version is bumped at the end, so the running
+    processes rebuild their descriptor index.
+
+    Attributes:
+        help (str): A short description of the command that is displayed when running
+            'python manage.py help convertDescriptors'.
+    """
+
+    help = "Convert the descriptors stored as JSON text to float32 bytes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of photos updated with each query.",
+        )
+
+    def handle(self, *args, **kwargs):
+        """
+        Executes the command to convert the descriptors.
+        """
+        batch_size = kwargs["batch_size"]
+        converted = 0
+        for model in (Thumbnail, Image):
+            queryset = (
+                model.objects.filter(descriptor_bytes__isnull=True)
+                .only("id", "path", "descriptor")
+                .order_by("id")
+            )
+            batch = []
+            count = failed = 0
+            for photo in queryset.iterator(chunk_size=batch_size):
+                descriptor = parse_legacy_descriptor(photo.descriptor)
+                if descriptor is None or descriptor.size != DESCRIPTOR_SIZE:
+                    try:
+                        descriptor = compute_descriptor(photo.path.path)
+                    except ValueError as e:
+                        logger.warning(f"Could not compute the descriptor: {e}")
+                        failed += 1
+                        continue
+                photo.descriptor = None
+                photo.descriptor_bytes = pack_descriptor(descriptor)
+                batch.append(photo)
+                if len(batch) == batch_size:
+                    # bulk_update evita los receptores de señales: los descriptores no
+                    # forman parte del catálogo
+                    model.objects.bulk_update(batch, ["descriptor", "descriptor_bytes"])
+                    count += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, ["descriptor", "descriptor_bytes"])
+                count += len(batch)
+            converted += count
+            logger.info(
+                f"Converted the descriptors of {count} {model.__name__} objects, "
+                f"{failed} could not be computed"
+            )
+        if converted:
+            bump_descriptor_version()
@@ -0,0 +1,90 @@
+"""
+This module contains a Django management command that creates the levels of detail of
+the 3D models, which are not created on save, and converts the models uploaded before
+the conversion ran on save to binary meshes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+from django import db
+from django.core.management.base import BaseCommand
+from piezas.meshes import create_mesh
+from piezas.models import Model
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel("INFO")
+
+
+def convert(model):
+    """
+    Creates the meshes of a model in a worker process.
+
+    Args:
+        model (Model): The model.
+
+    Returns:
+        tuple: The model, the storage name of its full mesh and its levels of detail,
+            or the model and the error if it could not be converted.
+    """
+    try:
+        return (model, *create_mesh(model))
+    except (OSError, ValueError, MemoryError) as e:
+        return model, e, None
+
+
+class Command(BaseCommand):
+    """
+    This command creates the binary mesh and the simplified meshes of every 3D model
+    without them (see piezas.meshes), so the details advertise them. Saving a model
+    only creates its full mesh, so it runs after uploads, as an offline stage. The
+    models are converted by a pool of processes, since the conversion is bound by
+    the CPU.
+
+    Attributes:
+        help (str): A short description of the command that is displayed when running
+            'python manage.py help createMeshes'.
+    """
+
+    help = "Convert the uploaded 3D models to binary meshes and their levels of detail."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recreate the meshes of the models that already have them.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of processes converting models (default: number of CPUs).",
+        )
+
+    def handle(self, *args, **kwargs):
+        """
+        Executes the command to create the meshes.
+        """
+        queryset = Model.objects.exclude(object="").order_by("id")
+        if not kwargs["all"]:
+            queryset = queryset.filter(lods=[])
+        models = list(queryset)
+        # Los procesos hijos no deben heredar las conexiones abiertas
+        db.connections.close_all()
+
+        count = 0
+        with ProcessPoolExecutor(max_workers=max(1, kwargs["workers"])) as executor:
+            for model, result, lods in executor.map(convert, models):
+                if lods is None:
+                    logger.error(f"Could not convert {model.object.name} to a mesh: {result}")
+                    continue
+                names = {lod["name"] for lod in lods}
+                for lod in model.lods:
+                    if lod["name"] not in names:
+                        model.object.storage.delete(lod["name"])
+                # save dispara los receptores de señales, que renuevan los detalles en caché
+                model.mesh.name, model.lods = result, lods
+                model.save(update_fields=["mesh", "lods"])
+                count += 1
+        logger.info(f"Created the meshes of {count} models")
@@ -0,0 +1,63 @@
+"""
+This module contains a Django management command that creates the resized copies of
+the thumbnails and images uploaded before they were generated on save.
+"""
+
+import cv2
+from django.core.management.base import BaseCommand
+from piezas.catalog import refresh_catalog_entries
+from piezas.models import Artifact, Image, Thumbnail
+from piezas.renditions import create_renditions, delete_renditions
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel("INFO")
+
+
+class Command(BaseCommand):
+    """
+    This command creates the renditions of every thumbnail and image (see
+    piezas.renditions) and refreshes the catalog entries, so the catalog and the
+    details expose them.
+
+    Attributes:
+        help (str): A short description of the command that is displayed when running
+            'python manage.py help createRenditions'.
+    """
+
+    help = "Create the resized copies of the uploaded thumbnails and images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recreate the renditions of the photos that already have them.",
+        )
+
+    def handle(self, *args, **kwargs):
+        """
+        Executes the command to create the renditions.
+        """
+        for model in (Thumbnail, Image):
+            queryset = model.objects.only("id", "path", "renditions").order_by("id")
+            if not kwargs["all"]:
+                queryset = queryset.filter(renditions=[])
+            count = 0
+            for photo in queryset.iterator():
+                image = cv2.imread(photo.path.path)
+                if image is None:
+                    logger.warning(f"Could not read {photo.path.name}")
+                    continue
+                delete_renditions(photo.path.storage, photo.renditions)
+                # update evita los receptores de señales; el catálogo se refresca al final
+                model.objects.filter(id=photo.id).update(
+                    renditions=create_renditions(photo.path, image)
+                )
+                count += 1
+            logger.info(f"Created the renditions of {count} {model.__name__} objects")
+
+        artifact_ids = list(Artifact.objects.order_by("id").values_list("id", flat=True))
+        for start in range(0, len(artifact_ids), 500):
+            refresh_catalog_entries(artifact_ids[start : start + 500])
+        logger.info(f"Refreshed {len(artifact_ids)} catalog entries")
@@ -0,0 +1,62 @@
+"""
+This module contains a Django management command that creates the downscaled texture
+variants of the 3D models uploaded before they were generated on save.
+"""
+
+from django.core.management.base import BaseCommand
+from piezas.models import Model
+from piezas.textures import create_textures, delete_textures
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel("INFO")
+
+
+class Command(BaseCommand):
+    """
+    This command creates the texture variants of every 3D model (see
+    piezas.textures), so the details advertise them.
+
+    Attributes:
+        help (str): A short description of the command that is displayed when running
+            'python manage.py help createTextures'.
+    """
+
+    help = "Create the downscaled variants of the 3D model textures."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recreate the variants of the models that already have them.",
+        )
+
+    def handle(self, *args, **kwargs):
+        """
+        Executes the command to create the texture variants.
+        """
+        queryset = Model.objects.exclude(texture="").exclude(material="").order_by("id")
+        if not kwargs["all"]:
+            queryset = queryset.filter(textures=[])
+        count = 0
+        for model in queryset.iterator():
+            try:
+                textures = create_textures(model)
+            except OSError as e:
+                logger.error(f"Could not create the variants of {model.texture.name}: {e}")
+                continue
+            names = {(variant["texture"], variant["material"]) for variant in textures}
+            delete_textures(
+                model,
+                [
+                    variant
+                    for variant in model.textures
+                    if (variant["texture"], variant["material"]) not in names
+                ],
+            )
+            # save dispara los receptores de señales, que renuevan los detalles en caché
+            model.textures = textures
+            model.save(update_fields=["textures"])
+            count += 1
+        logger.info(f"Created the texture variants of {count} models")
@@ -0,0 +1,30 @@
+"""
+This module contains a Django management command that rebuilds the catalog read model.
+"""
+
+from django.core.management.base import BaseCommand
+from piezas.catalog import rebuild_catalog
+
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel("INFO")
+
+
+class Command(BaseCommand):
+    """
+    This command rebuilds the denormalized catalog entries of every artifact.
+
+    Attributes:
+        help (str): A short description of the command that is displayed when running
+            'python manage.py help rebuildCatalog'.
+    """
+
+    help = "Rebuild the catalog entries of every artifact. Run it after loading data that bypassed the application."
+
+    def handle(self, *args, **kwargs):
+        """
+        Executes the command to rebuild the catalog entries.
+        """
+        count = rebuild_catalog()
+        logger.info(f"Successfully rebuilt {count} catalog entries")
@@ -0,0 +1,81 @@
+"""
+This module builds the public URLs of the uploaded files.
+
+Files are served by nginx under MEDIA_URL, or by a separate static host or CDN when
+MEDIA_BASE_URL is set. The base URL is resolved once per process (or once per request
+when it depends on the request host), so the URL of a file is built by concatenating
+it with the quoted storage name, instead of asking the storage and the request for
+an absolute URL for every file.
+
+Functions:
+- media_base_url: Returns the absolute URL under which the uploaded files are served.
+- media_url: Returns the absolute URL of an uploaded file.
+"""
+
+import functools
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.encoding import filepath_to_uri
+
+
+@functools.lru_cache(maxsize=None)
+def _configured_base_url():
+    """
+    Returns the configured MEDIA_BASE_URL ending with a slash, None if not set.
+    """
+    base_url = getattr(settings, "MEDIA_BASE_URL", "")
+    if not base_url:
+        return None
+    return base_url if base_url.endswith("/") else base_url + "/"
+
+
+@receiver(setting_changed)
+def _media_setting_changed(setting, **kwargs):
+    """
+    Forgets the resolved base URL when the media settings change.
+    """
+    if setting in ("MEDIA_BASE_URL", "MEDIA_URL"):
+        _configured_base_url.cache_clear()
+
+
+def media_base_url(request=None):
+    """
+    Returns the absolute URL under which the uploaded files are served.
+
+    Without MEDIA_BASE_URL the files are served by the host of the request, so the
+    base URL is built from the request once and kept on it.
+
+    Args:
+        request: The HTTP request, None to get a relative URL when MEDIA_BASE_URL
+            is not set.
+
+    Returns:
+        str: The base URL, ending with a slash.
+    """
+    base_url = _configured_base_url()
+    if base_url is not None:
+        return base_url
+    if request is None:
+        return settings.MEDIA_URL
+    base_url = getattr(request, "_media_base_url", None)
+    if base_url is None:
+        base_url = request.build_absolute_uri(settings.MEDIA_URL)
+        request._media_base_url = base_url
+    return base_url
+
+
+def media_url(request, name):
+    """
+    Returns the absolute URL of an uploaded file.
+
+    Args:
+        request: The HTTP request, see media_base_url.
+        name (str): The storage name of the file.
+
+    Returns:
+        str: The URL of the file, None if the name is empty.
+    """
+    if not name:
+        return None
+    return media_base_url(request) + filepath_to_uri(name).lstrip("/")
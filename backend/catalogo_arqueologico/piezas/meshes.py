@@ -0,0 +1,489 @@
+"""
+This module converts the OBJ/MTL 3D models to compact binary glTF (GLB) meshes.
+
+The viewer otherwise downloads the text OBJ, often tens of MB, and parses it in the
+browser. The GLB holds the same triangles as indexed binary buffers, quantized with
+KHR_mesh_quantization: positions as 16 bit integers dequantized by the node transform,
+normals as normalized 8 bit integers and texture coordinates as normalized 16 bit
+integers when they lie in [0, 1]. The texture is not embedded but referenced by a
+relative URI, so it is downloaded once whichever mesh is shown.
+
+Each model also gets simplified meshes (levels of detail) with the fractions of its
+triangles given by MODEL_LOD_RATIOS, so the viewer can show a coarse mesh while the
+full one downloads. Simplifying takes several passes over the mesh, so it is not done
+when a model is saved but offline, by the createMeshes command. They are computed by vertex clustering: the vertices falling in
+the same cell of a grid are merged, and the grid is refined until the mesh has as
+many triangles as the level allows. Vertices with distant texture coordinates are
+not merged, so the seams of the texture are kept.
+
+Functions:
+- read_obj: Reads an OBJ file into an indexed triangle mesh.
+- read_mtl_color: Reads the diffuse color of the first material of an MTL file.
+- write_glb: Encodes an indexed triangle mesh as a GLB file.
+- cluster_vertices: Simplifies a mesh by merging the vertices of a grid cell.
+- simplify: Simplifies a mesh to at most a number of triangles.
+- create_mesh: Creates the GLB meshes of a model next to its OBJ file.
+"""
+
+import json
+import logging
+import os
+import posixpath
+import struct
+from dataclasses import dataclass
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+GLB_MAGIC = 0x46546C67
+GLB_VERSION = 2
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+# Constantes de glTF
+BYTE = 5120
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+FLOAT = 5126
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+# Mayor número de celdas por eje de la grilla de simplificación
+MAX_GRID_RESOLUTION = 1024
+
+
+@dataclass
+class Mesh:
+    """
+    Indexed triangle mesh.
+
+    Attributes:
+        positions (numpy.ndarray): Float32 (N, 3) vertex positions.
+        normals (numpy.ndarray): Float32 (N, 3) vertex normals, None if the OBJ has none.
+        uvs (numpy.ndarray): Float32 (N, 2) texture coordinates with the glTF origin
+            (top left), None if the OBJ has none.
+        indices (numpy.ndarray): Uint32 (M, 3) vertex indices of the triangles.
+    """
+
+    positions: np.ndarray
+    normals: np.ndarray
+    uvs: np.ndarray
+    indices: np.ndarray
+
+
+def _corner_index(token, position):
+    """
+    Parses the index of a face corner attribute, resolving negative indices.
+    """
+    if not token:
+        return -1
+    index = int(token)
+    return index - 1 if index > 0 else position + index
+
+
+def read_obj(file):
+    """
+    Reads an OBJ file into an indexed triangle mesh.
+
+    Polygons are split into triangle fans. Every distinct combination of position,
+    texture coordinate and normal becomes a vertex. Groups, objects and materials
+    are ignored, so the mesh has a single material.
+
+    Args:
+        file: The OBJ file, opened in binary mode.
+
+    Returns:
+        Mesh: The mesh.
+
+    Raises:
+        ValueError: If the file has no triangles or references missing vertices.
+    """
+    positions, uvs, normals, corners = [], [], [], []
+    for raw_line in file:
+        line = raw_line.decode("utf-8", "ignore").split("#", 1)[0].split()
+        if not line:
+            continue
+        kind = line[0]
+        if kind == "v":
+            positions.append(line[1:4])
+        elif kind == "vt":
+            uvs.append(line[1:3])
+        elif kind == "vn":
+            normals.append(line[1:4])
+        elif kind == "f":
+            face = []
+            for vertex in line[1:]:
+                parts = vertex.split("/") + ["", ""]
+                face.append(
+                    (
+                        _corner_index(parts[0], len(positions)),
+                        _corner_index(parts[1], len(uvs)),
+                        _corner_index(parts[2], len(normals)),
+                    )
+                )
+            for i in range(1, len(face) - 1):
+                corners.extend((face[0], face[i], face[i + 1]))
+    if not corners:
+        raise ValueError("The OBJ file has no faces")
+
+    corners = np.array(corners, dtype=np.int64)
+    positions = np.array(positions, dtype=np.float32)
+    uvs = np.array(uvs, dtype=np.float32).reshape(-1, 2)
+    normals = np.array(normals, dtype=np.float32).reshape(-1, 3)
+    # Los atributos solo se usan si todas las esquinas los tienen
+    has_uvs = len(uvs) > 0 and bool((corners[:, 1] >= 0).all())
+    has_normals = len(normals) > 0 and bool((corners[:, 2] >= 0).all())
+    if not has_uvs:
+        corners[:, 1] = 0
+    if not has_normals:
+        corners[:, 2] = 0
+    limits = (len(positions), len(uvs) if has_uvs else 1, len(normals) if has_normals else 1)
+    if (corners < 0).any() or (corners >= np.array(limits)).any():
+        raise ValueError("The OBJ file references missing vertices")
+
+    vertices, indices = np.unique(corners, axis=0, return_inverse=True)
+    mesh_uvs = None
+    if has_uvs:
+        mesh_uvs = uvs[vertices[:, 1]]
+        mesh_uvs[:, 1] = 1.0 - mesh_uvs[:, 1]
+    return Mesh(
+        positions=positions[vertices[:, 0]],
+        normals=normals[vertices[:, 2]] if has_normals else None,
+        uvs=mesh_uvs,
+        indices=indices.reshape(-1, 3).astype(np.uint32),
+    )
+
+
+def read_mtl_color(file):
+    """
+    Reads the diffuse color (Kd) of the first material of an MTL file.
+
+    Args:
+        file: The MTL file, opened in binary mode.
+
+    Returns:
+        list: The RGB color, None if the file has none.
+    """
+    for raw_line in file:
+        line = raw_line.decode("utf-8", "ignore").split()
+        if len(line) >= 4 and line[0] == "Kd":
+            try:
+                return [float(value) for value in line[1:4]]
+            except ValueError:
+                return None
+    return None
+
+
+class _GLBBuilder:
+    """
+    Accumulates the buffer views and accessors of a GLB file.
+    """
+
+    def __init__(self):
+        self.binary = bytearray()
+        self.buffer_views = []
+        self.accessors = []
+
+    def add(self, data, component_type, kind, count, target, stride=None, **extra):
+        """
+        Appends an array to the binary buffer and returns the index of its accessor.
+        """
+        self.binary.extend(b"\0" * (-len(self.binary) % 4))
+        view = {"buffer": 0, "byteOffset": len(self.binary), "byteLength": len(data), "target": target}
+        if stride is not None:
+            view["byteStride"] = stride
+        self.binary.extend(data)
+        self.buffer_views.append(view)
+        accessor = {
+            "bufferView": len(self.buffer_views) - 1,
+            "componentType": component_type,
+            "count": count,
+            "type": kind,
+            **extra,
+        }
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+
+def write_glb(mesh, texture_uri=None, color=None):
+    """
+    Encodes an indexed triangle mesh as a GLB file.
+
+    Args:
+        mesh (Mesh): The mesh.
+        texture_uri (str): URI of the base color texture, relative to the GLB file,
+            None for no texture.
+        color (list): RGB base color, used when there is no texture.
+
+    Returns:
+        bytes: The GLB file.
+    """
+    builder = _GLBBuilder()
+    count = len(mesh.positions)
+
+    # Posiciones: enteros de 16 bits en la caja del modelo; la escala y traslación
+    # del nodo las devuelven a su valor original
+    low = mesh.positions.min(axis=0)
+    extent = mesh.positions.max(axis=0) - low
+    extent[extent == 0] = 1.0
+    quantized = np.zeros((count, 4), dtype=np.uint16)
+    quantized[:, :3] = np.round((mesh.positions - low) / extent * 65535)
+    attributes = {
+        "POSITION": builder.add(
+            quantized.tobytes(),
+            UNSIGNED_SHORT,
+            "VEC3",
+            count,
+            ARRAY_BUFFER,
+            stride=8,
+            min=quantized[:, :3].min(axis=0).tolist(),
+            max=quantized[:, :3].max(axis=0).tolist(),
+        )
+    }
+    if mesh.normals is not None:
+        lengths = np.linalg.norm(mesh.normals, axis=1, keepdims=True)
+        lengths[lengths == 0] = 1.0
+        normals = np.zeros((count, 4), dtype=np.int8)
+        normals[:, :3] = np.round(mesh.normals / lengths * 127)
+        attributes["NORMAL"] = builder.add(
+            normals.tobytes(), BYTE, "VEC3", count, ARRAY_BUFFER, stride=4, normalized=True
+        )
+    if mesh.uvs is not None:
+        if mesh.uvs.min() >= 0.0 and mesh.uvs.max() <= 1.0:
+            uvs = np.round(mesh.uvs * 65535).astype(np.uint16)
+            attributes["TEXCOORD_0"] = builder.add(
+                uvs.tobytes(), UNSIGNED_SHORT, "VEC2", count, ARRAY_BUFFER, normalized=True
+            )
+        else:
+            # Coordenadas que repiten la textura: no caben en un entero normalizado
+            attributes["TEXCOORD_0"] = builder.add(
+                mesh.uvs.astype(np.float32).tobytes(), FLOAT, "VEC2", count, ARRAY_BUFFER
+            )
+    index_type, index_dtype = (
+        (UNSIGNED_SHORT, np.uint16) if count <= 65535 else (UNSIGNED_INT, np.uint32)
+    )
+    indices = builder.add(
+        mesh.indices.astype(index_dtype).tobytes(),
+        index_type,
+        "SCALAR",
+        mesh.indices.size,
+        ELEMENT_ARRAY_BUFFER,
+    )
+
+    material = {"pbrMetallicRoughness": {"metallicFactor": 0.0, "roughnessFactor": 1.0}}
+    document = {
+        "asset": {"version": "2.0", "generator": "catalogo-piezas-arqueologicas"},
+        "extensionsUsed": ["KHR_mesh_quantization"],
+        "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [
+            {
+                "mesh": 0,
+                "translation": low.astype(float).tolist(),
+                "scale": (extent / 65535).astype(float).tolist(),
+            }
+        ],
+        "meshes": [
+            {
+                "primitives": [
+                    {"attributes": attributes, "indices": indices, "material": 0}
+                ]
+            }
+        ],
+        "materials": [material],
+        "buffers": [{"byteLength": len(builder.binary)}],
+        "bufferViews": builder.buffer_views,
+        "accessors": builder.accessors,
+    }
+    if texture_uri is not None and mesh.uvs is not None:
+        material["pbrMetallicRoughness"]["baseColorTexture"] = {"index": 0}
+        document["images"] = [{"uri": texture_uri}]
+        document["samplers"] = [{}]
+        document["textures"] = [{"source": 0, "sampler": 0}]
+    elif color is not None:
+        material["pbrMetallicRoughness"]["baseColorFactor"] = list(color) + [1.0]
+
+    json_chunk = json.dumps(document, separators=(",", ":")).encode("utf-8")
+    json_chunk += b" " * (-len(json_chunk) % 4)
+    bin_chunk = bytes(builder.binary) + b"\0" * (-len(builder.binary) % 4)
+    length = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+    return b"".join(
+        [
+            struct.pack("<III", GLB_MAGIC, GLB_VERSION, length),
+            struct.pack("<II", len(json_chunk), CHUNK_JSON),
+            json_chunk,
+            struct.pack("<II", len(bin_chunk), CHUNK_BIN),
+            bin_chunk,
+        ]
+    )
+
+
+def _cluster_means(cluster, count, values):
+    """
+    Averages the rows of an array over the clusters they belong to.
+    """
+    sizes = np.bincount(cluster, minlength=count).reshape(-1, 1)
+    sums = np.stack(
+        [np.bincount(cluster, weights=column, minlength=count) for column in values.T],
+        axis=1,
+    )
+    return (sums / sizes).astype(np.float32)
+
+
+def cluster_vertices(mesh, resolution):
+    """
+    Simplifies a mesh by merging the vertices that fall in the same cell of a grid.
+
+    The grid has 'resolution' cells along the longest side of the bounding box of the
+    mesh. Merged vertices take the mean of their attributes. Triangles that collapse
+    to a line or a point, and repeated triangles, are dropped.
+
+    Args:
+        mesh (Mesh): The mesh.
+        resolution (int): Number of cells along the longest side of the mesh.
+
+    Returns:
+        Mesh: The simplified mesh.
+    """
+    low = mesh.positions.min(axis=0)
+    size = float((mesh.positions.max(axis=0) - low).max()) / resolution or 1.0
+    keys = [np.floor((mesh.positions - low) / size).astype(np.int64)]
+    if mesh.uvs is not None:
+        keys.append(np.floor(mesh.uvs * resolution).astype(np.int64))
+    _, cluster = np.unique(np.hstack(keys), axis=0, return_inverse=True)
+    cluster = cluster.ravel()
+
+    triangles = cluster[mesh.indices]
+    triangles = triangles[
+        (triangles[:, 0] != triangles[:, 1])
+        & (triangles[:, 1] != triangles[:, 2])
+        & (triangles[:, 0] != triangles[:, 2])
+    ]
+    # Triángulos repetidos con cualquier orden de sus vértices
+    _, first = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    triangles = triangles[np.sort(first)]
+
+    # Se descartan los grupos que ya no pertenecen a ningún triángulo
+    used, indices = np.unique(triangles, return_inverse=True)
+    remap = np.full(cluster.max() + 1, -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    cluster = remap[cluster]
+    kept = cluster >= 0
+    cluster, count = cluster[kept], len(used)
+
+    normals = None
+    if mesh.normals is not None:
+        normals = _cluster_means(cluster, count, mesh.normals[kept])
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        lengths[lengths == 0] = 1.0
+        normals /= lengths
+    return Mesh(
+        positions=_cluster_means(cluster, count, mesh.positions[kept]),
+        normals=normals,
+        uvs=_cluster_means(cluster, count, mesh.uvs[kept]) if mesh.uvs is not None else None,
+        indices=indices.reshape(-1, 3).astype(np.uint32),
+    )
+
+
+def simplify(mesh, triangles):
+    """
+    Simplifies a mesh to at most a number of triangles.
+
+    Searches the finest grid of cluster_vertices whose mesh has no more than the
+    given triangles.
+
+    Args:
+        mesh (Mesh): The mesh.
+        triangles (int): The largest number of triangles of the simplified mesh.
+
+    Returns:
+        Mesh: The simplified mesh, None if not even the coarsest grid reaches the
+            number of triangles.
+    """
+    best = None
+    low, high = 1, MAX_GRID_RESOLUTION
+    while low <= high:
+        resolution = (low + high) // 2
+        candidate = cluster_vertices(mesh, resolution)
+        if len(candidate.indices) <= triangles:
+            best = candidate
+            low = resolution + 1
+        else:
+            high = resolution - 1
+    return best
+
+
+def relative_uri(name, start):
+    """
+    Returns the URI of a stored file relative to another stored file.
+
+    Args:
+        name (str): The storage name of the referenced file.
+        start (str): The storage name of the referencing file.
+
+    Returns:
+        str: The relative URI.
+    """
+    return posixpath.relpath(name, posixpath.dirname(start) or ".")
+
+
+def create_mesh(model, simplified=True):
+    """
+    Creates the GLB meshes of a model next to its OBJ file.
+
+    The full mesh replaces the extension of the OBJ file with '.glb' and the
+    simplified meshes add the level before it ('objects/pieza.lod1.glb' is the
+    finest simplified mesh). Levels that are not smaller than the previous one or
+    that would have fewer than MODEL_LOD_MIN_TRIANGLES triangles are skipped.
+
+    Args:
+        model (Model): The model, with its object, material and texture saved.
+        simplified (bool): Whether to create the simplified meshes too.
+
+    Returns:
+        tuple: The storage name of the full mesh and the levels of detail, ordered
+            from the coarsest to the full mesh, each with its storage name and its
+            number of triangles. The levels are empty if simplified is False.
+
+    Raises:
+        ValueError: If the OBJ file cannot be converted.
+    """
+    with model.object.open("rb") as file:
+        mesh = read_obj(file)
+    color = None
+    if model.material:
+        with model.material.open("rb") as file:
+            color = read_mtl_color(file)
+
+    storage = model.object.storage
+    root = os.path.splitext(model.object.name)[0]
+    texture_uri = relative_uri(model.texture.name, root) if model.texture else None
+
+    def save(name, level):
+        data = write_glb(level, texture_uri, color)
+        if storage.exists(name):
+            storage.delete(name)
+        name = storage.save(name, ContentFile(data))
+        logger.info(
+            f"Mesh {name} created: {len(level.positions)} vertices, "
+            f"{len(level.indices)} triangles, {len(data)} bytes"
+        )
+        return {"name": name, "triangles": len(level.indices)}
+
+    lods = [save(root + ".glb", mesh)]
+    if not simplified:
+        return lods[0]["name"], []
+    previous = len(mesh.indices)
+    for number, ratio in enumerate(sorted(settings.MODEL_LOD_RATIOS, reverse=True), 1):
+        target = int(len(mesh.indices) * ratio)
+        if target < settings.MODEL_LOD_MIN_TRIANGLES:
+            break
+        level = simplify(mesh, min(target, previous - 1))
+        if level is None:
+            break
+        lods.insert(0, save(f"{root}.lod{number}.glb", level))
+        previous = len(level.indices)
+    return lods[-1]["name"], lods
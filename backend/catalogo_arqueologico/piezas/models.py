@@ -14,6 +14,8 @@ Models:
 - Image: Represents an image associated with an artifact with a unique path.
 - Artifact: Represents an artifact with a description and relationships to other models 
     like Thumbnail, Model, Shape, Culture, and Tags.
+- CatalogEntry: Denormalized read model of an artifact used by the catalog listing.
+- CatalogState: Single row holding the version of the catalog, bumped on every catalog write.
 - TagsIds, CultureIds, ShapeIds: Auxiliary tables to store unique relationships 
     between artifacts and tags, cultures, or shapes when importing.
 - ArtifactRequester: Represents a requester of an artifact with details like name, 
@@ -24,18 +26,91 @@ artifacts within the system.
 """
 
 import logging
-import numpy as np
 import cv2
-import json
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 from django.contrib.auth.models import Group
+from .descriptors import compute_descriptor, pack_descriptor
+from .meshes import create_mesh
+from .renditions import create_renditions, delete_renditions
+from .textures import create_textures, delete_textures
 from .validators import validateRut
 
 logger = logging.getLogger(__name__)
 
 
+def store_files(instance, *names):
+    """
+    Stores the uploaded files of some file fields of an instance, as FileField does
+    when the instance is saved, so they can be read before saving it.
+
+    Args:
+        instance (Model): The instance.
+        names (str): Names of the file fields.
+    """
+    for name in names:
+        file = getattr(instance, name)
+        if file and not file._committed:
+            file.save(file.name, file.file, save=False)
+
+
+def remember_files(instance, *names):
+    """
+    Records the stored names of some file fields of an instance, see file_changed.
+
+    Args:
+        instance (Model): The instance, just loaded or saved.
+        names (str): Names of the file fields.
+    """
+    stored = instance.__dict__.setdefault("_stored_files", {})
+    for name in names:
+        if name not in instance.get_deferred_fields():
+            stored[name] = getattr(instance, name).name
+
+
+def file_changed(instance, name, update_fields=None):
+    """
+    Returns whether saving an instance writes a new file to one of its file fields.
+
+    The file is new if the instance is, if it was uploaded and not stored yet, or
+    if its name differs from the one recorded by remember_files. A save that
+    leaves the field out of update_fields, or with the field deferred, does not
+    change it.
+
+    Args:
+        instance (Model): The instance about to be saved.
+        name (str): Name of the file field.
+        update_fields (iterable): The update_fields given to save, if any.
+
+    Returns:
+        bool: Whether the file changes.
+    """
+    if update_fields is not None and name not in update_fields:
+        return False
+    if name in instance.get_deferred_fields():
+        return False
+    file = getattr(instance, name)
+    if instance._state.adding or not file._committed:
+        return True
+    return file.name != instance.__dict__.get("_stored_files", {}).get(name)
+
+
+def with_update_fields(kwargs, *names):
+    """
+    Adds the fields computed by a save method to the update_fields it was given.
+
+    Args:
+        kwargs (dict): The keyword arguments of the save method, modified in place.
+        names (str): Names of the computed fields.
+    """
+    if kwargs.get("update_fields") is not None:
+        kwargs["update_fields"] = {*kwargs["update_fields"], *names}
+
+
 class Institution(models.Model):
     """
     Represents an institution.
@@ -152,6 +227,10 @@ class Shape(models.Model):
         name (CharField): Unique name of the shape.
     """
 
+    class Meta:
+        # Sirve los filtros name__iexact, que comparan UPPER(name)
+        indexes = [models.Index(Upper("name"), name="piezas_shape_name_upper")]
+
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=100, unique=True)
 
@@ -178,6 +257,10 @@ class Culture(models.Model):
         name (CharField): Unique name of the culture.
     """
 
+    class Meta:
+        # Sirve los filtros name__iexact, que comparan UPPER(name)
+        indexes = [models.Index(Upper("name"), name="piezas_culture_name_upper")]
+
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=100, unique=True)
 
@@ -204,6 +287,10 @@ class Tag(models.Model):
         path (ImageField): Path to the thumbnail image, must be unique.
     """
 
+    class Meta:
+        # Sirve los filtros name__iexact, que comparan UPPER(name)
+        indexes = [models.Index(Upper("name"), name="piezas_tag_name_upper")]
+
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=100, unique=True)
 
@@ -228,12 +315,18 @@ class Thumbnail(models.Model):
     Attributes:
         id (BigAutoField): Primary key.
         path (ImageField): Path to the thumbnail image, must be unique.
-        descriptor (CharField): Optional descriptor for the thumbnail.
+        descriptor (CharField): Descriptor for the thumbnail as JSON text, only kept for
+            the thumbnails saved before descriptor_bytes, see convertDescriptors.
+        descriptor_bytes (BinaryField): Optional float32 descriptor for the thumbnail,
+            see piezas.descriptors.
+        renditions (JSONField): Resized copies of the thumbnail, see piezas.renditions.
     """
 
     id = models.BigAutoField(primary_key=True)
     path = models.ImageField(upload_to=settings.THUMBNAILS_URL, unique=True)
     descriptor = models.TextField(blank=True, null=True)
+    descriptor_bytes = models.BinaryField(blank=True, null=True)
+    renditions = models.JSONField(default=list, blank=True)
 
     @property
     def histogram(self):
@@ -241,41 +334,40 @@ class Thumbnail(models.Model):
         Compute the histogram of the thumbnail and return in a value 
 
         Returns:
-            numpy.ndarray: Histogram of the thumbnail.
-        """
-        num_zonas_x = 4
-        num_zonas_y = 4
-        num_bins_por_zona = 8
-        image = cv2.imread(self.path.path, cv2.IMREAD_GRAYSCALE)
-        img_eq = cv2.equalizeHist(image)
-        descriptor = []
-        for j in range(num_zonas_y):
-            desde_y = int(img_eq.shape[0] / num_zonas_y * j)
-            hasta_y = int(img_eq.shape[0] / num_zonas_y * (j + 1))
-            for i in range(num_zonas_x):
-                desde_x = int(img_eq.shape[1] / num_zonas_x * i)
-                hasta_x = int(img_eq.shape[1] / num_zonas_x * (i + 1))
-                # recortar zona de la img
-                zona = img_eq[desde_y:hasta_y, desde_x:hasta_x]
-                # histograma de los pixeles de la zona
-                histograma, limites = np.histogram(zona, bins=num_bins_por_zona, range=(0, 255))
-                # normalizar histograma (bins suman 1)
-                histograma = histograma / np.sum(histograma)
-                # agregar descriptor de la zona al descriptor global
-                descriptor.extend(histograma)
-        return descriptor
+            numpy.ndarray: Zone histograms of the thumbnail, see piezas.descriptors.
+        """
+        return compute_descriptor(self.path.path)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Loads an instance from the database, recording the name of its file.
+        """
+        instance = super().from_db(db, field_names, values)
+        remember_files(instance, "path")
+        return instance
+
     def save(self, *args, **kwargs):
         """
         Save method for the Thumbnail model.
+
+        The file is stored and the descriptor and the renditions are computed before
+        the row is written, so the thumbnail is saved once. They are only computed
+        when the file is new or replaced, not when only other fields change.
         """
-        super().save(*args, **kwargs)  # Save first to ensure the path is established
-        
-        # Now compute and set the descriptor
-        image = cv2.imread(self.path.path)
+        changed = file_changed(self, "path", kwargs.get("update_fields"))
+        store_files(self, "path")
+        image = cv2.imread(self.path.path) if changed and self.path else None
+        # Los receptores de señales recargan el índice de descriptores si cambió
+        self._descriptor_changed = image is not None
         if image is not None:
-            self.descriptor = json.dumps(self.histogram)
-            super().save(update_fields=['descriptor'])  # Update only the descriptor field
+            self.descriptor = None
+            self.descriptor_bytes = pack_descriptor(self.histogram)
+            delete_renditions(self.path.storage, self.renditions)
+            self.renditions = create_renditions(self.path, image)
+            with_update_fields(kwargs, "descriptor", "descriptor_bytes", "renditions")
+        super().save(*args, **kwargs)
+        remember_files(self, "path")
 
 
 
@@ -290,6 +382,12 @@ class Model(models.Model):
         texture (ImageField): Path to the texture image.
         object (FileField): Path to the 3D object file.
         material (FileField): Path to the material file.
+        mesh (FileField): Path to the binary mesh converted from the 3D object file,
+            see piezas.meshes.
+        lods (JSONField): Simplified meshes of the 3D object, from the coarsest to
+            the full mesh, see piezas.meshes.
+        textures (JSONField): Downscaled variants of the texture, with their material
+            files, see piezas.textures.
     """
 
     class Meta:
@@ -303,6 +401,57 @@ class Model(models.Model):
     texture = models.ImageField(upload_to=settings.MATERIALS_URL, unique=False)
     object = models.FileField(upload_to=settings.OBJECTS_URL, unique=False)
     material = models.FileField(upload_to=settings.MATERIALS_URL, unique=False)
+    mesh = models.FileField(upload_to=settings.OBJECTS_URL, blank=True)
+    lods = models.JSONField(default=list, blank=True)
+    textures = models.JSONField(default=list, blank=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Loads an instance from the database, recording the names of its files.
+        """
+        instance = super().from_db(db, field_names, values)
+        remember_files(instance, "texture", "object", "material")
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Save method for the Model model.
+
+        Converts a new 3D object file to a binary mesh and creates the variants of a
+        new texture. The files are stored and converted before the row is written,
+        so the model is saved once. The simplified meshes are left to the
+        createMeshes command, since simplifying a large mesh would hold the request
+        for too long. A file that cannot be converted is logged and the model keeps
+        no mesh, so the viewer falls back to the OBJ file.
+        """
+        update_fields = kwargs.get("update_fields")
+        object_changed = file_changed(self, "object", update_fields)
+        texture_changed = file_changed(self, "texture", update_fields) or file_changed(
+            self, "material", update_fields
+        )
+        store_files(self, "texture", "object", "material")
+        if object_changed and self.object:
+            # Las mallas del objeto anterior ya no corresponden al nuevo
+            for name in [lod["name"] for lod in self.lods] + [self.mesh.name]:
+                if name:
+                    self.object.storage.delete(name)
+            self.mesh, self.lods = "", []
+            try:
+                self.mesh.name, _ = create_mesh(self, simplified=False)
+            except (OSError, ValueError, MemoryError) as e:
+                logger.error(f"Could not convert {self.object.name} to a mesh: {e}")
+            with_update_fields(kwargs, "mesh", "lods")
+        if texture_changed and self.texture and self.material:
+            delete_textures(self, self.textures)
+            try:
+                self.textures = create_textures(self)
+            except OSError as e:
+                logger.error(f"Could not create the variants of {self.texture.name}: {e}")
+                self.textures = []
+            with_update_fields(kwargs, "textures")
+        super().save(*args, **kwargs)
+        remember_files(self, "texture", "object", "material")
 
 
 class Image(models.Model):
@@ -315,7 +464,11 @@ class Image(models.Model):
         id (BigAutoField): Primary key.
         id_artifact (ForeignKey): Reference to the associated artifact.
         path (ImageField): Path to the image, must be unique.
-        descriptor (CharField): Optional descriptor for the image.
+        descriptor (CharField): Descriptor for the image as JSON text, only kept for
+            the images saved before descriptor_bytes, see convertDescriptors.
+        descriptor_bytes (BinaryField): Optional float32 descriptor for the image,
+            see piezas.descriptors.
+        renditions (JSONField): Resized copies of the image, see piezas.renditions.
     """
 
     id = models.BigAutoField(primary_key=True)
@@ -324,46 +477,49 @@ class Image(models.Model):
     )
     path = models.ImageField(upload_to=settings.IMAGES_URL, unique=True)
     descriptor = models.TextField(blank=True, null=True)
+    descriptor_bytes = models.BinaryField(blank=True, null=True)
+    renditions = models.JSONField(default=list, blank=True)
 
     @property
     def histogram(self):
         """
-        Compute the histogram of the thumbnail and return in a value 
+        Compute the histogram of the image and return in a value 
 
         Returns:
-            numpy.ndarray: Histogram of the thumbnail.
-        """
-        num_zonas_x = 4
-        num_zonas_y = 4
-        num_bins_por_zona = 8
-        image = cv2.imread(self.path.path, cv2.IMREAD_GRAYSCALE)
-        img_eq = cv2.equalizeHist(image)
-        descriptor = []
-        for j in range(num_zonas_y):
-            desde_y = int(img_eq.shape[0] / num_zonas_y * j)
-            hasta_y = int(img_eq.shape[0] / num_zonas_y * (j + 1))
-            for i in range(num_zonas_x):
-                desde_x = int(img_eq.shape[1] / num_zonas_x * i)
-                hasta_x = int(img_eq.shape[1] / num_zonas_x * (i + 1))
-                # recortar zona de la img
-                zona = img_eq[desde_y:hasta_y, desde_x:hasta_x]
-                # histograma de los pixeles de la zona
-                histograma, limites = np.histogram(zona, bins=num_bins_por_zona, range=(0, 255))
-                # normalizar histograma (bins suman 1)
-                histograma = histograma / np.sum(histograma)
-                # agregar descriptor de la zona al descriptor global
-                descriptor.extend(histograma)
-        return descriptor
+            numpy.ndarray: Zone histograms of the image, see piezas.descriptors.
+        """
+        return compute_descriptor(self.path.path)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Loads an instance from the database, recording the name of its file.
+        """
+        instance = super().from_db(db, field_names, values)
+        remember_files(instance, "path")
+        return instance
+
     def save(self, *args, **kwargs):
         """
         Save method for the Image model.
+
+        As for thumbnails, the descriptor and the renditions are computed before the
+        row is written, so the image is saved once, and only when the file is new or
+        replaced: linking the image to another artifact does not compute them again.
         """
-        super().save(*args, **kwargs)
-        image = cv2.imread(self.path.path)
+        changed = file_changed(self, "path", kwargs.get("update_fields"))
+        store_files(self, "path")
+        image = cv2.imread(self.path.path) if changed and self.path else None
+        # Los receptores de señales recargan el índice de descriptores si cambió
+        self._descriptor_changed = image is not None
         if image is not None:
-            self.descriptor = json.dumps(self.histogram)
-            super().save(update_fields=['descriptor'])
+            self.descriptor = None
+            self.descriptor_bytes = pack_descriptor(self.histogram)
+            delete_renditions(self.path.storage, self.renditions)
+            self.renditions = create_renditions(self.path, image)
+            with_update_fields(kwargs, "descriptor", "descriptor_bytes", "renditions")
+        super().save(*args, **kwargs)
+        remember_files(self, "path")
 
 
 class Artifact(models.Model):
@@ -399,6 +555,133 @@ class Artifact(models.Model):
     )
     id_tags = models.ManyToManyField(Tag, blank=True, related_name="artifact")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["id_culture", "id"], name="piezas_artifact_culture_id"),
+            models.Index(fields=["id_shape", "id"], name="piezas_artifact_shape_id"),
+        ]
+
+
+class CatalogEntry(models.Model):
+    """
+    Denormalized read model of an artifact for the catalog.
+
+    One row per artifact with the names of its shape, culture and tags already
+    resolved, so a catalog page is a single scan over this table. Rows are kept
+    in sync by the receivers in piezas.signals and can be rebuilt with the
+    rebuildCatalog command.
+
+    Attributes:
+        artifact (OneToOneField): Primary key, reference to the artifact.
+        description (CharField): Description of the artifact.
+        shape_id (BigIntegerField): Id of the shape of the artifact.
+        shape_name (CharField): Name of the shape of the artifact.
+        culture_id (BigIntegerField): Id of the culture of the artifact.
+        culture_name (CharField): Name of the culture of the artifact.
+        tag_ids (JSONField): Ids of the tags of the artifact.
+        tag_names (JSONField): Names of the tags of the artifact, aligned with tag_ids.
+        thumbnail (CharField): Storage name of the thumbnail image, empty if none.
+        thumbnail_renditions (JSONField): Resized copies of the thumbnail image.
+        search_vector (SearchVectorField): Spanish full text search vector of the
+            description, only maintained on PostgreSQL (see piezas.search).
+        updated_at (DateTimeField): Date of the last change to the artifact, kept
+            when the catalog is rebuilt.
+        version (BigIntegerField): Version of the artifact, incremented on every
+            change to what its detail shows and kept when the catalog is rebuilt.
+    """
+
+    artifact = models.OneToOneField(
+        Artifact,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="catalog_entry",
+    )
+    description = models.CharField(max_length=500)
+    shape_id = models.BigIntegerField(null=True)
+    shape_name = models.CharField(max_length=100, null=True)
+    culture_id = models.BigIntegerField(null=True)
+    culture_name = models.CharField(max_length=100, null=True)
+    tag_ids = models.JSONField(default=list)
+    tag_names = models.JSONField(default=list)
+    thumbnail = models.CharField(max_length=255, blank=True)
+    thumbnail_renditions = models.JSONField(default=list)
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(default=timezone.now)
+    version = models.BigIntegerField(default=1)
+
+    class Meta:
+        # Los filtros de la vista comparan UPPER(nombre) y ordenan por artifact_id,
+        # así una página filtrada es un recorrido de índice. El índice GIN de
+        # tag_ids es propio de PostgreSQL y se crea en piezas.catalog.create_catalog_indexes.
+        # Cada orden de piezas.catalog.CATALOG_ORDERINGS tiene su índice (columna, artifact_id).
+        indexes = [
+            models.Index(
+                Upper("culture_name"), "artifact_id", name="piezas_catalog_culture_upper"
+            ),
+            models.Index(
+                Upper("shape_name"), "artifact_id", name="piezas_catalog_shape_upper"
+            ),
+            models.Index(
+                fields=["culture_name", "artifact_id"], name="piezas_catalog_culture_order"
+            ),
+            models.Index(
+                fields=["shape_name", "artifact_id"], name="piezas_catalog_shape_order"
+            ),
+            models.Index(
+                fields=["description", "artifact_id"], name="piezas_catalog_description"
+            ),
+            models.Index(
+                fields=["updated_at", "artifact_id"], name="piezas_catalog_updated"
+            ),
+        ]
+
+
+class CatalogState(models.Model):
+    """
+    Single row holding the version of the catalog.
+
+    The version is bumped every time the catalog entries or any data served by
+    the public read endpoints change, so anything cached from the catalog can be
+    keyed on it and invalidated at once. The descriptor version is only bumped
+    when the photo descriptors of some artifact change, so the descriptor index
+    is not reloaded on every write to the catalog.
+
+    Attributes:
+        id (BigAutoField): Primary key, always 1.
+        version (BigIntegerField): Current version of the catalog.
+        updated_at (DateTimeField): Date of the last change to the catalog.
+        descriptor_version (BigIntegerField): Current version of the photo descriptors.
+        descriptors_updated_at (DateTimeField): Date of the last change to the photo
+            descriptors.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    version = models.BigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+    descriptor_version = models.BigIntegerField(default=1)
+    descriptors_updated_at = models.DateTimeField(default=timezone.now)
+
+
+class CatalogChange(models.Model):
+    """
+    Log of the artifacts whose catalog entries changed in each catalog version.
+
+    Written along with the version bump, so the processes that did not make a
+    change apply it to their bitmap index instead of rebuilding it. Changes that
+    are not known, such as a rebuild of the catalog, make the processes rebuild
+    their index. Only the last CATALOG_CHANGE_LOG_SIZE versions are kept.
+
+    Attributes:
+        version (BigIntegerField): Primary key, the catalog version of the change.
+        updated_at (DateTimeField): Date of the version, as in CatalogState.
+        artifact_ids (JSONField): Ids of the artifacts whose catalog entries changed,
+            null if they are not known.
+    """
+
+    version = models.BigIntegerField(primary_key=True)
+    updated_at = models.DateTimeField()
+    artifact_ids = models.JSONField(null=True)
+
 
 class TagsIds(models.Model):
     """
@@ -0,0 +1,127 @@
+"""
+This module generates the responsive renditions of the uploaded photos.
+
+When a thumbnail or an image is saved, the original is resized to every width of
+RENDITION_WIDTHS smaller than its own, and each size is encoded as WebP and as JPEG.
+Renditions are stored next to the original, named after it with the width and the
+format ('thumbnails/pieza.jpg' gives 'thumbnails/pieza.320w.webp'), and listed in the
+'renditions' field of the model, so the serializers can expose them as srcset values
+without touching the storage.
+
+Functions:
+- create_renditions: Creates the renditions of a photo and returns their description.
+- delete_renditions: Deletes the files of a list of renditions.
+- rendition_srcsets: Builds the srcset values of a list of renditions.
+"""
+
+import logging
+import os
+import cv2
+from django.conf import settings
+from django.core.files.base import ContentFile
+from .media import media_url
+
+logger = logging.getLogger(__name__)
+
+# Formatos generados, con su extensión y los parámetros de codificación de cv2
+FORMATS = {
+    "webp": (".webp", lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality]),
+    "jpeg": (
+        ".jpg",
+        lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_PROGRESSIVE, 1],
+    ),
+}
+
+
+def rendition_name(name, width, extension):
+    """
+    Returns the storage name of a rendition of a photo.
+
+    Args:
+        name (str): The storage name of the original photo.
+        width (int): The width of the rendition.
+        extension (str): The extension of the format of the rendition.
+
+    Returns:
+        str: The storage name of the rendition.
+    """
+    root, _ = os.path.splitext(name)
+    return f"{root}.{width}w{extension}"
+
+
+def create_renditions(field_file, image):
+    """
+    Creates the renditions of a photo.
+
+    Widths that are not smaller than the original are skipped, so small photos
+    get no renditions and are served as they are.
+
+    Args:
+        field_file (FieldFile): The file of the original photo.
+        image (numpy.ndarray): The decoded photo, as returned by cv2.imread.
+
+    Returns:
+        list: The renditions, each with its storage name, width and format.
+    """
+    storage = field_file.storage
+    height, width = image.shape[:2]
+    renditions = []
+    for target_width in sorted(set(settings.RENDITION_WIDTHS)):
+        if target_width >= width:
+            break
+        target_height = max(1, round(height * target_width / width))
+        resized = cv2.resize(
+            image, (target_width, target_height), interpolation=cv2.INTER_AREA
+        )
+        for format_name, (extension, params) in FORMATS.items():
+            encoded, data = cv2.imencode(
+                extension, resized, params(settings.RENDITION_QUALITY)
+            )
+            if not encoded:
+                logger.warning(f"Could not encode {format_name} rendition of {field_file.name}")
+                continue
+            name = rendition_name(field_file.name, target_width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(name, ContentFile(data.tobytes()))
+            renditions.append({"name": name, "width": target_width, "format": format_name})
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    """
+    Deletes the files of a list of renditions.
+
+    Args:
+        storage (Storage): The storage holding the renditions.
+        renditions (list): The renditions, as returned by create_renditions.
+    """
+    for rendition in renditions or []:
+        storage.delete(rendition["name"])
+
+
+def rendition_srcsets(request, renditions):
+    """
+    Builds the srcset values of a list of renditions, one per format.
+
+    Args:
+        request: The HTTP request, see piezas.media.media_base_url.
+        renditions (list): The renditions, as returned by create_renditions.
+
+    Returns:
+        dict: The srcset value of every format, such as
+            'https://host/media/thumbnails/pieza.320w.webp 320w, ...', None if
+            there are no renditions.
+    """
+    if not renditions:
+        return None
+    srcsets = {}
+    for format_name in FORMATS:
+        candidates = [
+            f"{media_url(request, rendition['name'])} {rendition['width']}w"
+            for rendition in renditions
+            if rendition["format"] == format_name
+        ]
+        if candidates:
+            srcsets[format_name] = ", ".join(candidates)
+    return srcsets
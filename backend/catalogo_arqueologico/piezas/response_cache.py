@@ -0,0 +1,97 @@
+"""
+This module implements the in-process response cache of the catalog listing.
+
+Responses are keyed on the catalog version and the normalized request parameters, so
+a write to the catalog invalidates every cached response at once by bumping the
+version (see piezas.versions.bump_catalog_version): responses of older versions are
+never looked up again and are evicted as the least recently used.
+
+Classes:
+- LRUResponseCache: Bounded least recently used cache with hit and miss counters.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUResponseCache:
+    """
+    Bounded cache that evicts the least recently used entry when full.
+
+    Every method is safe to call from several threads.
+
+    Attributes:
+        max_size (int): Maximum number of entries kept.
+        hits (int): Number of lookups that found an entry.
+        misses (int): Number of lookups that did not find an entry.
+        evictions (int): Number of entries evicted to make room for new ones.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Looks up an entry, marking it as the most recently used.
+
+        Args:
+            key: The key of the entry.
+
+        Returns:
+            The cached value, None if the key is not cached.
+        """
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Stores an entry, evicting the least recently used ones if the cache is full.
+
+        Args:
+            key: The key of the entry.
+            value: The value to cache, must not be None.
+        """
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes every entry, keeping the counters.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Returns the counters of the cache.
+
+        Returns:
+            dict: The size, maximum size, hits, misses, evictions and hit ratio.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
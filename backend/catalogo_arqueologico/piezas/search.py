@@ -0,0 +1,164 @@
+"""
+This module implements the text search of the catalog.
+
+On PostgreSQL the descriptions of the catalog entries are searched through a Spanish
+full text search vector, ranked by relevance, with a trigram word similarity fallback
+that tolerates typos when the pg_trgm extension is available. Both are served by GIN
+indexes created after migrating. Numeric queries are routed to an exact artifact id
+lookup. Other databases fall back to a case insensitive substring search.
+
+Classes:
+- TrigramWordSimilar: Lookup matching values that contain a word similar to a text.
+- TrigramWordSimilarity: Function computing the trigram word similarity of a text.
+
+Functions:
+- search_catalog: Filters and ranks a CatalogEntry queryset by a search text.
+- has_trigram_extension: Checks whether the pg_trgm extension is installed.
+- update_search_vectors: Recomputes the search vectors of a CatalogEntry queryset.
+- create_search_indexes: Creates the PostgreSQL extension and indexes used by the search.
+"""
+
+import functools
+import logging
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections, transaction
+from django.db.models import CharField, F, FloatField, Func, Q, Value
+from django.db.models.lookups import PostgresOperatorLookup
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = "spanish"
+MAX_ID_DIGITS = 18
+
+
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """
+    Lookup matching values that contain a word similar to the given text.
+
+    Compiles to the pg_trgm '%>' operator, which a gin_trgm_ops index can serve.
+    """
+
+    lookup_name = "trigram_word_similar"
+    postgres_operator = "%%>"
+
+
+CharField.register_lookup(TrigramWordSimilar)
+
+
+class TrigramWordSimilarity(Func):
+    """
+    Computes the greatest trigram similarity between a text and any word of an expression.
+    """
+
+    function = "WORD_SIMILARITY"
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, "resolve_expression"):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
+
+
+def search_catalog(queryset, text):
+    """
+    Filters a CatalogEntry queryset by a search text.
+
+    Args:
+        queryset (QuerySet): The CatalogEntry queryset to search.
+        text (str): The search text.
+
+    Returns:
+        QuerySet: The matching entries. On PostgreSQL they are ordered by full text
+            rank first and trigram similarity second.
+    """
+    text = text.strip()
+    if not text:
+        return queryset
+    if text.isdigit() and len(text) <= MAX_ID_DIGITS:
+        return queryset.filter(artifact_id=int(text))
+    if connection.vendor != "postgresql":
+        return queryset.filter(description__icontains=text)
+
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+    matches = Q(search_vector=query)
+    ranking = {"rank": SearchRank(F("search_vector"), query)}
+    if has_trigram_extension():
+        matches |= Q(description__trigram_word_similar=text)
+        ranking["similarity"] = TrigramWordSimilarity(text, "description")
+    return (
+        queryset.filter(matches)
+        .annotate(**ranking)
+        .order_by(*["-" + name for name in ranking], "artifact_id")
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def has_trigram_extension(using=DEFAULT_DB_ALIAS):
+    """
+    Checks whether the pg_trgm extension is installed in a PostgreSQL database.
+
+    The result is cached for the life of the process.
+
+    Args:
+        using (str): The alias of the database.
+
+    Returns:
+        bool: True if the extension is installed, False otherwise.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def update_search_vectors(queryset):
+    """
+    Recomputes the search vectors of the entries of a CatalogEntry queryset.
+
+    Only PostgreSQL has search vectors, so on other databases it does nothing.
+
+    Args:
+        queryset (QuerySet): The CatalogEntry queryset to update.
+    """
+    if connection.vendor != "postgresql":
+        return
+    queryset.update(search_vector=SearchVector("description", config=SEARCH_CONFIG))
+
+
+def create_search_indexes(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Creates the pg_trgm extension and the GIN indexes used by the catalog search.
+
+    If the extension cannot be created, only the full text search index is created
+    and the search works without the typo tolerant fallback.
+
+    Connected to post_migrate, since these objects are specific to PostgreSQL and
+    cannot be declared in the models without breaking other databases.
+
+    Args:
+        sender: The application config that was migrated.
+        using (str): The alias of the migrated database.
+    """
+    db = connections[using]
+    if db.vendor != "postgresql":
+        return
+    with db.cursor() as cursor:
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS piezas_catalogentry_search_gin "
+            "ON piezas_catalogentry USING gin (search_vector)"
+        )
+        try:
+            with transaction.atomic(using=using):
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError as e:
+            logger.warning(f"pg_trgm is not available, typo tolerant search is disabled: {e}")
+        else:
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS piezas_catalogentry_description_trgm "
+                "ON piezas_catalogentry USING gin (description gin_trgm_ops)"
+            )
+    has_trigram_extension.cache_clear()
+    logger.info("Catalog search indexes are up to date")
@@ -18,6 +18,8 @@ Serializers Included:
   to serialize related objects like tags, thumbnails, models, and images.
 - CatalogSerializer: Provides a simplified serializer for listing artifacts in a catalog view,
   including key attributes and thumbnails.
+- CatalogEntrySerializer: Serializes the denormalized catalog entries with the same shape as
+  CatalogSerializer, without touching the related tables.
 - UpdateArtifactSerializer: Supports updating existing Artifact instances with partial or full data.
 - InstitutionSerializer: Handles serialization for Institution model instances.
 """
@@ -26,7 +28,10 @@ import os  # unused import
 import logging
 from django.conf import settings  # unused import
 from django.core.files import File  # unused import
+from django.db.models import Prefetch
 from rest_framework import serializers
+from .media import media_url
+from .renditions import rendition_srcsets
 from .models import (
     Tag,
     Shape,
@@ -37,7 +42,8 @@ from .models import (
     Image,
     Institution,
     BulkDownloadingRequest,
-    Request
+    Request,
+    CatalogEntry,
 )
 
 logger = logging.getLogger(__name__)
@@ -122,14 +128,18 @@ class ArtifactSerializer(serializers.ModelSerializer):
     Attributes:
     - attributes: The attributes of the artifact.
     - thumbnail: The thumbnail of the artifact.
+    - thumbnail_srcset: The srcset values of the resized copies of the thumbnail.
     - model: The model of the artifact.
     - images: The images of the artifact.
+    - images_srcset: The srcset values of the resized copies of each image.
     """
 
     attributes = serializers.SerializerMethodField()
     thumbnail = serializers.SerializerMethodField()
+    thumbnail_srcset = serializers.SerializerMethodField()
     model = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()
+    images_srcset = serializers.SerializerMethodField()
 
     class Meta:
         """
@@ -145,10 +155,42 @@ class ArtifactSerializer(serializers.ModelSerializer):
             "id",
             "attributes",
             "thumbnail",
+            "thumbnail_srcset",
             "model",
             "images",
+            "images_srcset",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Method to load every relation the serializer reads along with the artifacts.
+
+        Serializing the returned queryset runs three queries (one for the artifacts
+        with their shape, culture, thumbnail and model, one for their tags and one
+        for their images) whatever the number of artifacts, tags and images. The
+        descriptors of the thumbnail and the images are not loaded.
+
+        Args:
+        - queryset: The queryset of artifacts to serialize.
+
+        Returns:
+        - The queryset with its relations selected and prefetched.
+        """
+        return (
+            queryset.select_related("id_shape", "id_culture", "id_thumbnail", "id_model")
+            .defer("id_thumbnail__descriptor", "id_thumbnail__descriptor_bytes")
+            .prefetch_related(
+                Prefetch("id_tags", queryset=Tag.objects.order_by("id")),
+                Prefetch(
+                    "images",
+                    queryset=Image.objects.only(
+                        "id", "id_artifact", "path", "renditions"
+                    ).order_by("id"),
+                ),
+            )
+        )
+
     def get_attributes(self, instance):
         """
         Method to obtain the attributes of the artifact.
@@ -182,9 +224,7 @@ class ArtifactSerializer(serializers.ModelSerializer):
         - The URL of the thumbnail of the artifact.
         """
         if instance.id_thumbnail:
-            return self.context["request"].build_absolute_uri(
-                instance.id_thumbnail.path.url
-            )
+            return media_url(self.context["request"], instance.id_thumbnail.path.name)
         else:
             return None
 
@@ -196,19 +236,31 @@ class ArtifactSerializer(serializers.ModelSerializer):
         - instance: The instance of the artifact.
 
         Returns:
-        - A dictionary with the URL of the object, material and texture of the model or an empty dictionary if the model does not exist.
+        - A dictionary with the URL of the object, material, texture and binary mesh of the model or an empty dictionary if the model does not exist. The mesh is an empty string if the object could not be converted.
+        - The dictionary also lists the levels of detail of the mesh, from the coarsest to the full mesh, each with its URL and number of triangles, so the viewer can show a coarse mesh first.
+        - The dictionary also lists the downscaled texture variants, from the smallest, each with the longest side of its texture and the URLs of its texture and material, so the viewer can pick one by device.
         """
         realModel = instance.id_model
         if not realModel or not realModel.object or not realModel.material or not realModel.texture:
-            return {"object": "", "material": "", "texture": ""}
+            return {"object": "", "material": "", "texture": "", "mesh": "", "lods": [], "textures": []}
+        request = self.context["request"]
         modelDict = {
-            "object": self.context["request"].build_absolute_uri(realModel.object.url),
-            "material": self.context["request"].build_absolute_uri(
-                realModel.material.url
-            ),
-            "texture": self.context["request"].build_absolute_uri(
-                realModel.texture.url
-            ),
+            "object": media_url(request, realModel.object.name),
+            "material": media_url(request, realModel.material.name),
+            "texture": media_url(request, realModel.texture.name),
+            "mesh": media_url(request, realModel.mesh.name) if realModel.mesh else "",
+            "lods": [
+                {"url": media_url(request, lod["name"]), "triangles": lod["triangles"]}
+                for lod in realModel.lods
+            ],
+            "textures": [
+                {
+                    "size": variant["size"],
+                    "texture": media_url(request, variant["texture"]),
+                    "material": media_url(request, variant["material"]),
+                }
+                for variant in realModel.textures
+            ],
         }
         return modelDict
 
@@ -222,12 +274,39 @@ class ArtifactSerializer(serializers.ModelSerializer):
         Returns:
         - A list with the URLs of the images of the artifact.
         """
-        everyImage = Image.objects.filter(id_artifact=instance.id)
+        everyImage = instance.images.all()
         Images = []
         for image in everyImage:
-            Images.append(self.context["request"].build_absolute_uri(image.path.url))
+            Images.append(media_url(self.context["request"], image.path.name))
         return Images
 
+    def get_thumbnail_srcset(self, instance):
+        """
+        Method to obtain the srcset values of the resized copies of the thumbnail.
+
+        Args:
+        - instance: The instance of the artifact.
+
+        Returns:
+        - A dictionary with the srcset value of each format, or None if there are no copies.
+        """
+        if not instance.id_thumbnail:
+            return None
+        return rendition_srcsets(self.context["request"], instance.id_thumbnail.renditions)
+
+    def get_images_srcset(self, instance):
+        """
+        Method to obtain the srcset values of the resized copies of the images.
+
+        Args:
+        - instance: The instance of the artifact.
+
+        Returns:
+        - A list with the srcset values of each image, aligned with the images.
+        """
+        request = self.context["request"]
+        return [rendition_srcsets(request, image.renditions) for image in instance.images.all()]
+
 
 class CatalogSerializer(serializers.ModelSerializer):
     """
@@ -238,10 +317,12 @@ class CatalogSerializer(serializers.ModelSerializer):
     Attributes:
     - attributes: The attributes of the artifact.
     - thumbnail: The thumbnail of the artifact.
+    - thumbnail_srcset: The srcset values of the resized copies of the thumbnail.
     """
 
     attributes = serializers.SerializerMethodField(read_only=True)
     thumbnail = serializers.SerializerMethodField(read_only=True)
+    thumbnail_srcset = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         """
@@ -253,31 +334,55 @@ class CatalogSerializer(serializers.ModelSerializer):
         """
 
         model = Artifact
-        fields = ["id", "attributes", "thumbnail"]
+        fields = ["id", "attributes", "thumbnail", "thumbnail_srcset"]
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Method to load every relation the serializer reads along with the artifacts.
+
+        Serializing the returned queryset runs a fixed number of queries (one for
+        the artifacts with their shape, culture and thumbnail, and one for their
+        tags) whatever the number of artifacts.
+
+        Args:
+        - queryset: The queryset of artifacts to serialize.
+
+        Returns:
+        - The queryset with its relations selected and prefetched.
+        """
+        return queryset.select_related(
+            "id_shape", "id_culture", "id_thumbnail"
+        ).prefetch_related(Prefetch("id_tags", queryset=Tag.objects.order_by("id")))
 
     def get_attributes(self, instance):
         """
         Method to obtain the attributes of the artifact.
 
+        Reads the related objects from the instance, so it does not query the
+        database when the queryset went through setup_eager_loading.
+
         Args:
         - instance: The instance of the artifact.
 
         Returns:
         - A dictionary with the attributes of the artifact.
         """
-        shapeInstance = Shape.objects.get(id=instance.id_shape.id)
-        tagsInstances = Tag.objects.filter(id__in=instance.id_tags.all())
-        cultureInstance = Culture.objects.get(id=instance.id_culture.id)
-        description = instance.description
-        tags = []
-        for tag in tagsInstances:
-            tags.append({"id": tag.id, "value": tag.name})
+        shapeInstance = instance.id_shape
+        cultureInstance = instance.id_culture
+        tags = [{"id": tag.id, "value": tag.name} for tag in instance.id_tags.all()]
 
         attributes = {
-            "shape": {"id": shapeInstance.id, "value": shapeInstance.name},
+            "shape": {
+                "id": shapeInstance.id if shapeInstance else None,
+                "value": shapeInstance.name if shapeInstance else None,
+            },
             "tags": tags,
-            "culture": {"id": cultureInstance.id, "value": cultureInstance.name},
-            "description": description,
+            "culture": {
+                "id": cultureInstance.id if cultureInstance else None,
+                "value": cultureInstance.name if cultureInstance else None,
+            },
+            "description": instance.description,
         }
         return attributes
 
@@ -292,12 +397,146 @@ class CatalogSerializer(serializers.ModelSerializer):
         - The URL of the thumbnail of the artifact.
         """
         if instance.id_thumbnail:
-            return self.context["request"].build_absolute_uri(
-                instance.id_thumbnail.path.url
-            )
+            return media_url(self.context["request"], instance.id_thumbnail.path.name)
         else:
             return None
 
+    def get_thumbnail_srcset(self, instance):
+        """
+        Method to obtain the srcset values of the resized copies of the thumbnail.
+
+        Args:
+        - instance: The instance of the artifact.
+
+        Returns:
+        - A dictionary with the srcset value of each format, or None if there are no copies.
+        """
+        if not instance.id_thumbnail:
+            return None
+        return rendition_srcsets(self.context["request"], instance.id_thumbnail.renditions)
+
+
+class CatalogEntrySerializer(serializers.ModelSerializer):
+    """
+    Serializer for the CatalogEntry model.
+
+    Produces the same JSON object as CatalogSerializer from the denormalized catalog
+    entry, so no related table is queried per artifact.
+
+    The optional 'fields' argument restricts the output to a set of names from
+    FIELDS: the id is always included, 'thumbnail' keeps the thumbnail and its
+    srcset values and the attribute names keep those attributes. Attributes and
+    the thumbnail are left out of the object when none of them is selected.
+
+    Attributes:
+    - id: The id of the artifact.
+    - attributes: The attributes of the artifact.
+    - thumbnail: The thumbnail of the artifact.
+    - thumbnail_srcset: The srcset values of the resized copies of the thumbnail.
+    """
+
+    # Columns of the catalog entry needed by each selectable field
+    FIELDS = {
+        "id": ["artifact_id"],
+        "thumbnail": ["thumbnail", "thumbnail_renditions"],
+        "shape": ["shape_id", "shape_name"],
+        "tags": ["tag_ids", "tag_names"],
+        "culture": ["culture_id", "culture_name"],
+        "description": ["description"],
+    }
+    ATTRIBUTES = ["shape", "tags", "culture", "description"]
+
+    id = serializers.IntegerField(source="artifact_id", read_only=True)
+    attributes = serializers.SerializerMethodField(read_only=True)
+    thumbnail = serializers.SerializerMethodField(read_only=True)
+    thumbnail_srcset = serializers.SerializerMethodField(read_only=True)
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.selected = set(self.FIELDS) if fields is None else set(fields) | {"id"}
+        if not self.selected.intersection(self.ATTRIBUTES):
+            self.fields.pop("attributes")
+        if "thumbnail" not in self.selected:
+            self.fields.pop("thumbnail")
+            self.fields.pop("thumbnail_srcset")
+
+    @classmethod
+    def columns(cls, fields):
+        """
+        Method to obtain the columns of the catalog entry needed by a set of fields.
+
+        Args:
+        - fields: The selected fields, None for every field.
+
+        Returns:
+        - A list with the names of the columns.
+        """
+        selected = cls.FIELDS if fields is None else set(fields) | {"id"}
+        return [column for field in selected for column in cls.FIELDS[field]]
+
+    class Meta:
+        """
+        Meta class for the CatalogEntrySerializer.
+
+        Attributes:
+        - model: The CatalogEntry model to serialize.
+        - fields: The fields to include in the serialized data.
+        """
+
+        model = CatalogEntry
+        fields = ["id", "attributes", "thumbnail", "thumbnail_srcset"]
+
+    def get_attributes(self, instance):
+        """
+        Method to obtain the attributes of the artifact.
+
+        Args:
+        - instance: The catalog entry of the artifact.
+
+        Returns:
+        - A dictionary with the attributes of the artifact.
+        """
+        attributes = {}
+        if "shape" in self.selected:
+            attributes["shape"] = {"id": instance.shape_id, "value": instance.shape_name}
+        if "tags" in self.selected:
+            attributes["tags"] = [
+                {"id": tag_id, "value": tag_name}
+                for tag_id, tag_name in zip(instance.tag_ids, instance.tag_names)
+            ]
+        if "culture" in self.selected:
+            attributes["culture"] = {
+                "id": instance.culture_id,
+                "value": instance.culture_name,
+            }
+        if "description" in self.selected:
+            attributes["description"] = instance.description
+        return attributes
+
+    def get_thumbnail(self, instance):
+        """
+        Method to obtain the thumbnail of the artifact.
+
+        Args:
+        - instance: The catalog entry of the artifact.
+
+        Returns:
+        - The URL of the thumbnail of the artifact.
+        """
+        return media_url(self.context["request"], instance.thumbnail)
+
+    def get_thumbnail_srcset(self, instance):
+        """
+        Method to obtain the srcset values of the resized copies of the thumbnail.
+
+        Args:
+        - instance: The catalog entry of the artifact.
+
+        Returns:
+        - A dictionary with the srcset value of each format, or None if there are no copies.
+        """
+        return rendition_srcsets(self.context["request"], instance.thumbnail_renditions)
+
 
 class UpdateArtifactSerializer(serializers.ModelSerializer):
     """
@@ -473,35 +712,3 @@ class BulkDownloadingRequestRequestSerializer(serializers.ModelSerializer):
         model = BulkDownloadingRequest
         fields = "__all__"
 
-
-class DescriptorArtifactSerializer(serializers.Serializer):
-    image_descriptors = serializers.SerializerMethodField()
-    thumbnail_descriptor = serializers.SerializerMethodField()
-    id_artefacto = serializers.IntegerField(source='id')
-
-    def get_image_descriptors(self, obj):
-        # Recorremos todas las imágenes relacionadas y obtenemos los descriptores e IDs
-        return [(image.descriptor, obj.id) for image in obj.images.all()]
-
-    def get_thumbnail_descriptor(self, obj):
-        # Verificamos si el thumbnail existe y retornamos su descriptor e ID
-        if obj.id_thumbnail:
-            return (obj.id_thumbnail.descriptor, obj.id)
-        return None
-
-    def to_representation(self, instance):
-        # Obtenemos los descriptores de imágenes y del thumbnail (si existe)
-        image_descriptors = self.get_image_descriptors(instance)
-        thumbnail_descriptor = self.get_thumbnail_descriptor(instance)
-
-        if thumbnail_descriptor:
-            image_descriptors.append(thumbnail_descriptor)  # Añadimos el thumbnail si existe
-
-        # Separar descriptores e IDs en dos listas
-        descriptors = [desc for desc, _ in image_descriptors]
-        ids = [artifact_id for _, artifact_id in image_descriptors]
-
-        return {
-            'descriptors': descriptors,
-            'ids': ids
-        }
@@ -0,0 +1,282 @@
+"""
+This module connects the signal receivers of the 'piezas' application.
+
+The receivers keep the catalog read model (CatalogEntry) in sync with every write that
+changes what the catalog shows: artifacts and their tags, and renames or deletions of
+shapes, cultures, tags and thumbnails. Refreshing an entry also bumps the version of
+its artifact, and writes to images and models bump the version of the artifacts that
+show them, so only their cached details are invalidated. Writes that change the
+photo descriptors of some artifacts (a new, replaced, relinked or deleted thumbnail
+or image) bump the descriptor version, and their artifacts are reloaded in the
+descriptor index once committed (see piezas.descriptor_index). Writes that only change what the other
+public read endpoints return (institutions and new shapes, cultures, tags and
+thumbnails) bump the catalog version, so their ETags change too. Changes to the
+vocabulary (tags, cultures, shapes and institutions) are also applied to the
+autocomplete index once committed. The renditions of deleted thumbnails and images
+are deleted too. However many receivers the writes of a transaction fire, each
+version is bumped once per transaction (see piezas.catalog.CatalogWrite). They are
+connected in PiezasConfig.ready.
+"""
+
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from .catalog import (
+    refresh_catalog_entries,
+    touch_artifacts,
+    touch_catalog,
+    touch_descriptors,
+)
+from .indexes import autocomplete_index
+from .models import Artifact, Culture, Image, Institution, Model, Shape, Tag, Thumbnail
+from .renditions import delete_renditions
+
+
+@receiver(pre_save, sender=Artifact)
+def artifact_saving(sender, instance, raw=False, **kwargs):
+    """
+    Collects the thumbnail of an existing artifact before it is saved, since the
+    save may replace it.
+    """
+    if raw or instance.pk is None:
+        return
+    instance._previous_thumbnail_id = (
+        Artifact.objects.filter(pk=instance.pk).values_list("id_thumbnail", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Artifact)
+def artifact_saved(sender, instance, raw=False, **kwargs):
+    """
+    Refreshes the catalog entry of a saved artifact, and its descriptors if its
+    thumbnail changed.
+    """
+    if raw:
+        return
+    refresh_catalog_entries([instance.id])
+    if instance.id_thumbnail_id != getattr(instance, "_previous_thumbnail_id", None):
+        touch_descriptors([instance.id])
+
+
+@receiver(post_delete, sender=Artifact)
+def artifact_deleted(sender, instance, **kwargs):
+    """
+    Removes the catalog entry of a deleted artifact from the catalog, and the
+    descriptor of its thumbnail. Its images are deleted along with it.
+    """
+    refresh_catalog_entries([instance.id])
+    if instance.id_thumbnail_id is not None:
+        touch_descriptors([instance.id])
+
+
+@receiver(m2m_changed, sender=Artifact.id_tags.through)
+def artifact_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Refreshes the catalog entries affected by a change in the artifact-tag relation.
+
+    When the relation is changed from the tag side, pk_set holds artifact ids. A
+    clear from the tag side has no pk_set, so the affected artifacts are collected
+    before the clear happens.
+    """
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_catalog_entries([instance.pk])
+        return
+    if action == "pre_clear":
+        instance._catalog_artifact_ids = list(
+            instance.artifact.values_list("id", flat=True)
+        )
+    elif action in ("post_add", "post_remove"):
+        refresh_catalog_entries(pk_set)
+    elif action == "post_clear":
+        refresh_catalog_entries(getattr(instance, "_catalog_artifact_ids", []))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Shape)
+@receiver(post_save, sender=Culture)
+@receiver(post_save, sender=Thumbnail)
+def related_saved(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Refreshes the catalog entries of the artifacts that reference a renamed tag,
+    shape or culture, or a replaced thumbnail file. A new one is not referenced
+    yet, but it is listed by the metadata endpoint.
+    """
+    if raw:
+        return
+    if created:
+        touch_catalog()
+        return
+    refresh_catalog_entries(instance.artifact.values_list("id", flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Shape)
+@receiver(pre_delete, sender=Culture)
+@receiver(pre_delete, sender=Thumbnail)
+def related_deleting(sender, instance, **kwargs):
+    """
+    Collects the artifacts that reference a tag, shape, culture or thumbnail
+    about to be deleted.
+    """
+    instance._catalog_artifact_ids = list(
+        instance.artifact.values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Shape)
+@receiver(post_delete, sender=Culture)
+@receiver(post_delete, sender=Thumbnail)
+def related_deleted(sender, instance, **kwargs):
+    """
+    Refreshes the catalog entries of the artifacts that referenced a deleted tag,
+    shape, culture or thumbnail.
+    """
+    refresh_catalog_entries(getattr(instance, "_catalog_artifact_ids", []))
+
+
+@receiver(post_save, sender=Thumbnail)
+def thumbnail_saved(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Reloads the descriptors of the artifacts that show a replaced thumbnail file.
+    A new thumbnail is not shown yet.
+    """
+    if raw or created or not getattr(instance, "_descriptor_changed", False):
+        return
+    touch_descriptors(instance.artifact.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Thumbnail)
+def thumbnail_deleted(sender, instance, **kwargs):
+    """
+    Reloads the descriptors of the artifacts that showed a deleted thumbnail.
+    """
+    touch_descriptors(getattr(instance, "_catalog_artifact_ids", []))
+
+
+@receiver(pre_save, sender=Image)
+def image_saving(sender, instance, raw=False, **kwargs):
+    """
+    Collects the artifact an existing image is linked to before it is saved, since
+    the save may move it to another artifact or unlink it.
+    """
+    if raw or instance.pk is None:
+        return
+    instance._previous_artifact_id = (
+        Image.objects.filter(pk=instance.pk).values_list("id_artifact", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def image_changed(sender, instance, raw=False, **kwargs):
+    """
+    Bumps the version of the artifacts whose images changed.
+    """
+    if raw:
+        return
+    artifact_ids = {instance.id_artifact_id, getattr(instance, "_previous_artifact_id", None)}
+    artifact_ids.discard(None)
+    if artifact_ids:
+        touch_artifacts(artifact_ids)
+    else:
+        touch_catalog()
+
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, raw=False, **kwargs):
+    """
+    Reloads the descriptors of the artifacts of an image whose file was replaced or
+    that was moved to another artifact.
+    """
+    if raw:
+        return
+    previous_id = getattr(instance, "_previous_artifact_id", None)
+    if getattr(instance, "_descriptor_changed", False) or previous_id != instance.id_artifact_id:
+        touch_descriptors({previous_id, instance.id_artifact_id} - {None})
+
+
+@receiver(post_delete, sender=Image)
+def image_deleted(sender, instance, **kwargs):
+    """
+    Reloads the descriptors of the artifact of a deleted image.
+    """
+    if instance.id_artifact_id is not None:
+        touch_descriptors([instance.id_artifact_id])
+
+
+@receiver(post_delete, sender=Thumbnail)
+@receiver(post_delete, sender=Image)
+def photo_deleted(sender, instance, **kwargs):
+    """
+    Deletes the renditions of a deleted thumbnail or image once the deletion is
+    committed.
+    """
+    storage, renditions = instance.path.storage, instance.renditions
+    transaction.on_commit(lambda: delete_renditions(storage, renditions))
+
+
+@receiver(post_save, sender=Model)
+def model_saved(sender, instance, created=False, raw=False, **kwargs):
+    """
+    Bumps the version of the artifacts that show a changed model. A new one is not
+    shown yet.
+    """
+    if raw:
+        return
+    if created:
+        touch_catalog()
+        return
+    touch_artifacts(instance.artifact.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Model)
+@receiver(post_save, sender=Institution)
+@receiver(post_delete, sender=Institution)
+def detail_changed(sender, instance, raw=False, **kwargs):
+    """
+    Bumps the catalog version after a write to institutions, which the catalog
+    entries do not hold but the institution endpoint returns, or the deletion of
+    a model, whose artifacts are deleted along with it.
+    """
+    if raw:
+        return
+    touch_catalog()
+
+
+VOCABULARY_KINDS = {Tag: "tag", Culture: "culture", Shape: "shape", Institution: "institution"}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Culture)
+@receiver(post_save, sender=Shape)
+@receiver(post_save, sender=Institution)
+def vocabulary_saved(sender, instance, raw=False, **kwargs):
+    """
+    Adds a new or renamed vocabulary term to the autocomplete index.
+    """
+    if raw:
+        return
+    kind = VOCABULARY_KINDS[sender]
+    term_id, name = instance.id, instance.name
+    transaction.on_commit(lambda: autocomplete_index.put(kind, term_id, name))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Culture)
+@receiver(post_delete, sender=Shape)
+@receiver(post_delete, sender=Institution)
+def vocabulary_deleted(sender, instance, **kwargs):
+    """
+    Removes a deleted vocabulary term from the autocomplete index.
+    """
+    kind = VOCABULARY_KINDS[sender]
+    term_id = instance.id
+    transaction.on_commit(lambda: autocomplete_index.discard(kind, term_id))
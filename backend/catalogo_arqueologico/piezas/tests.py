@@ -1,3 +1,2160 @@
-from django.test import TestCase
+"""
+This module contains the tests of the 'piezas' application.
+"""
 
-# Create your tests here.
+import csv
+import datetime
+import io
+import json
+import os
+import shutil
+import struct
+import tempfile
+from contextlib import contextmanager
+from unittest import mock, skipUnless
+import cv2
+import numpy as np
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date, parse_http_date
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from .autocomplete import AutocompleteIndex, PrefixTrie
+from .bitmap_index import CatalogBitmapIndex
+from .catalog import (
+    CATALOG_ORDERINGS,
+    catalog_artifacts,
+    compute_facets,
+    filter_by_tags,
+    parse_tag_groups,
+)
+from .catalog_cache import artifact_details, artifact_versions, catalog_responses
+from .descriptors import (
+    DESCRIPTOR_SIZE,
+    pack_descriptor,
+    zone_histograms,
+    zone_histograms_loop,
+)
+from .export import CSV_COLUMNS, export_rows
+from .indexes import autocomplete_index, catalog_index, descriptor_index, get_catalog_index
+from .media import media_base_url, media_url
+from .meshes import GLB_MAGIC, read_obj
+from .models import (
+    Artifact,
+    CatalogChange,
+    CatalogEntry,
+    CatalogState,
+    Culture,
+    CustomUser,
+    Image,
+    Institution,
+    Model,
+    Shape,
+    Tag,
+    Thumbnail,
+)
+from .search import has_trigram_extension, search_catalog
+from .serializers import ArtifactSerializer, CatalogSerializer
+from .versions import bump_catalog_version, bump_descriptor_version, get_catalog_version
+from .views import (
+    ArtifactBatchAPIView,
+    AutocompleteAPIView,
+    BulkLoadingAPIView,
+    CatalogAPIView,
+    CatalogCursorPagination,
+    CustomPageNumberPagination,
+)
+
+
+def create_artifacts(count, shape, culture, tags):
+    """
+    Creates artifacts with the given shape, culture and tags.
+
+    Args:
+        count (int): Number of artifacts to create.
+        shape (Shape): Shape of the artifacts.
+        culture (Culture): Culture of the artifacts.
+        tags (list): Tags of the artifacts.
+
+    Returns:
+        list: The created artifacts.
+    """
+    artifacts = []
+    for index in range(count):
+        artifact = Artifact.objects.create(
+            description=f"Pieza {index}", id_shape=shape, id_culture=culture
+        )
+        artifact.id_tags.set(tags)
+        artifacts.append(artifact)
+    return artifacts
+
+
+@contextmanager
+def own_transaction(apply=True):
+    """
+    Runs writes as a transaction of their own, since a test case runs the whole test
+    in a single one, so they bump the versions of the catalog once, apart from the
+    writes before and after them.
+
+    Args:
+        apply (bool): Whether to run their on commit callbacks, which apply them to the
+            in-process indexes. False for the writes of another process.
+    """
+    connection.catalog_write = None
+    with TestCase.captureOnCommitCallbacks(execute=apply):
+        yield
+    connection.catalog_write = None
+
+
+class CatalogQueryCountTests(TestCase):
+    """
+    Checks that rendering a catalog page runs a fixed number of queries.
+    """
+
+    def setUp(self):
+        self.shape = Shape.objects.create(name="Vasija")
+        self.culture = Culture.objects.create(name="Diaguita")
+        self.tags = [Tag.objects.create(name=name) for name in ("Asa", "Rojo")]
+
+    def test_catalog_serializer_query_count(self):
+        create_artifacts(9, self.shape, self.culture, self.tags)
+        request = APIRequestFactory().get("/api/catalog/artifacts/")
+        with self.assertNumQueries(2):
+            data = CatalogSerializer(
+                catalog_artifacts().order_by("id"),
+                many=True,
+                context={"request": request},
+            ).data
+        self.assertEqual(len(data), 9)
+        self.assertEqual(
+            data[0]["attributes"]["tags"],
+            [{"id": tag.id, "value": tag.name} for tag in self.tags],
+        )
+
+    def test_catalog_page_query_count_does_not_depend_on_page_size(self):
+        # El índice se pone al día antes de cada página, que es lo que se mide
+        create_artifacts(1, self.shape, self.culture, self.tags)
+        get_catalog_index()
+        with CaptureQueriesContext(connection) as single:
+            response = self.client.get("/api/catalog/artifacts/", {"tags": "asa"})
+        self.assertEqual(len(response.json()["data"]), 1)
+
+        with own_transaction(apply=False):
+            create_artifacts(20, self.shape, self.culture, self.tags)
+        get_catalog_index()
+        with CaptureQueriesContext(connection) as full:
+            response = self.client.get("/api/catalog/artifacts/", {"tags": "asa"})
+        self.assertEqual(len(response.json()["data"]), 9)
+
+        self.assertEqual(len(single), len(full))
+
+
+class CatalogFacetTests(TestCase):
+    """
+    Checks the counts of the available filters of the catalog.
+    """
+
+    def setUp(self):
+        cache.clear()
+        catalog_responses.clear()
+        vasija, plato = [Shape.objects.create(name=name) for name in ("Vasija", "Plato")]
+        diaguita, inca = [Culture.objects.create(name=name) for name in ("Diaguita", "Inca")]
+        asa, rojo = [Tag.objects.create(name=name) for name in ("Asa", "Rojo")]
+        create_artifacts(3, vasija, diaguita, [asa, rojo])
+        create_artifacts(2, plato, diaguita, [rojo])
+        create_artifacts(1, plato, inca, [])
+        Artifact.objects.create(description="Sin atributos")
+
+    def get_filters(self, **params):
+        """
+        Returns the available filters of a catalog request.
+        """
+        response = self.client.get("/api/catalog/artifacts/", params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["filters"]
+
+    def test_counts_of_the_whole_catalog(self):
+        filters = self.get_filters()
+        self.assertEqual(
+            filters["counts"],
+            {
+                "cultures": {"Diaguita": 5, "Inca": 1},
+                "shapes": {"Vasija": 3, "Plato": 3},
+                "tags": {"Rojo": 5, "Asa": 3},
+            },
+        )
+        self.assertEqual(filters["cultures"], ["Diaguita", "Inca"])
+        self.assertEqual(filters["tags"], ["Rojo", "Asa"])
+
+    def test_counts_follow_the_filters(self):
+        expected = {
+            "cultures": {"Diaguita": 2, "Inca": 1},
+            "shapes": {"Plato": 3},
+            "tags": {"Rojo": 2},
+        }
+        # Desde el índice en memoria y desde la base de datos
+        self.assertEqual(self.get_filters(shape="plato")["counts"], expected)
+        cache.clear()
+        self.assertEqual(self.get_filters(shape="plato", cursor="")["counts"], expected)
+        self.assertEqual(
+            self.get_filters(culture="Diaguita", tags="Asa")["counts"],
+            {"cultures": {"Diaguita": 3}, "shapes": {"Vasija": 3}, "tags": {"Asa": 3, "Rojo": 3}},
+        )
+        self.assertEqual(
+            self.get_filters(culture="Maya")["counts"],
+            {"cultures": {}, "shapes": {}, "tags": {}},
+        )
+
+    def test_facets_are_counted_by_grouped_queries(self):
+        queryset = CatalogEntry.objects.filter(shape_name__iexact="plato")
+        with CaptureQueriesContext(connection) as queries:
+            facets = compute_facets(queryset)
+        self.assertEqual(len(queries), 3)
+        self.assertTrue(all("GROUP BY" in query["sql"] for query in queries))
+        self.assertEqual(facets["counts"]["tags"], {"Rojo": 2})
+
+    def test_pages_share_the_facets_until_the_catalog_changes(self):
+        with mock.patch("piezas.views.compute_facets", wraps=compute_facets) as compute:
+            response = self.client.get(
+                "/api/catalog/artifacts/", {"cursor": "", "page_size": 2, "culture": "diaguita"}
+            ).json()
+            self.client.get(response["next"])
+            self.get_filters(page_size=2, culture=" Diaguita ", cursor="")
+            self.assertEqual(compute.call_count, 1)
+
+            with own_transaction():
+                Artifact.objects.create(
+                    description="Nueva", id_culture=Culture.objects.get(name="Diaguita")
+                )
+            filters = self.get_filters(page_size=2, culture="diaguita", cursor="")
+            self.assertEqual(compute.call_count, 2)
+        self.assertEqual(filters["counts"]["cultures"], {"Diaguita": 6})
+
+    def test_facets_are_cached_under_the_version_they_were_counted_at(self):
+        catalog_index.version = None
+        match = CatalogBitmapIndex.match
+
+        def match_then_write(index, **filters):
+            # Otro proceso escribe después de que se consulta el índice
+            ids = match(index, **filters)
+            CatalogEntry.objects.filter(culture_name="Inca").update(culture_name="Diaguita")
+            bump_catalog_version()
+            return ids
+
+        with mock.patch.object(CatalogBitmapIndex, "match", match_then_write):
+            stale = self.get_filters(shape="plato")
+        self.assertEqual(stale["counts"]["cultures"], {"Diaguita": 2, "Inca": 1})
+        self.assertEqual(self.get_filters(shape="plato")["counts"]["cultures"], {"Diaguita": 3})
+
+    def test_index_page_reads_the_catalog_state_once(self):
+        self.get_filters()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_filters(culture="inca")
+        state_queries = [query for query in queries if "piezas_catalogstate" in query["sql"]]
+        self.assertEqual(len(state_queries), 1)
+
+
+class ArtifactDetailQueryCountTests(TestCase):
+    """
+    Checks that rendering an artifact detail runs a fixed number of queries.
+    """
+
+    def setUp(self):
+        self.shape = Shape.objects.create(name="Vasija")
+        self.culture = Culture.objects.create(name="Diaguita")
+        self.tags = [Tag.objects.create(name=name) for name in ("Asa", "Rojo", "Borde")]
+        (self.artifact,) = create_artifacts(1, self.shape, self.culture, self.tags)
+        self.artifact.id_thumbnail = Thumbnail.objects.create(path="thumbnails/pieza.jpg")
+        self.artifact.id_model = Model.objects.create(
+            texture="materials/pieza.jpg", object="objects/pieza.obj", material="materials/pieza.mtl"
+        )
+        self.artifact.save()
+
+    def add_images(self, count):
+        """
+        Adds images to the artifact.
+        """
+        start = self.artifact.images.count()
+        for index in range(start, start + count):
+            Image.objects.create(id_artifact=self.artifact, path=f"images/pieza_{index}.jpg")
+
+    def test_artifact_serializer_query_count(self):
+        self.add_images(3)
+        request = APIRequestFactory().get(f"/api/catalog/artifact/{self.artifact.id}/")
+        with self.assertNumQueries(3):
+            artifact = ArtifactSerializer.setup_eager_loading(Artifact.objects.all()).get(
+                id=self.artifact.id
+            )
+            data = ArtifactSerializer(artifact, context={"request": request}).data
+        self.assertEqual(len(data["images"]), 3)
+        self.assertEqual(
+            data["attributes"]["tags"],
+            [{"id": tag.id, "value": tag.name} for tag in self.tags],
+        )
+        self.assertTrue(data["model"]["object"].endswith("objects/pieza.obj"))
+
+    def test_artifact_detail_query_count_does_not_depend_on_images(self):
+        url = f"/api/catalog/artifact/{self.artifact.id}/"
+        self.add_images(1)
+        self.client.get(url)
+        artifact_details.clear()
+        with CaptureQueriesContext(connection) as single:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()["images"]), 1)
+
+        self.add_images(10)
+        self.client.get(url)
+        artifact_details.clear()
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()["images"]), 11)
+
+        self.assertEqual(len(single), len(many))
+
+
+class ArtifactBatchTests(TestCase):
+    """
+    Checks the batch artifact detail endpoint.
+    """
+
+    url = "/api/catalog/artifacts/batch"
+
+    def setUp(self):
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        tags = [Tag.objects.create(name=name) for name in ("Asa", "Rojo")]
+        self.artifacts = create_artifacts(6, shape, culture, tags)
+
+    def test_details_follow_request_order_and_report_missing_ids(self):
+        ids = [self.artifacts[3].id, 999999, self.artifacts[0].id, self.artifacts[3].id]
+        response = self.client.get(self.url, {"ids": ",".join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            [item["id"] for item in data["data"]],
+            [self.artifacts[3].id, self.artifacts[0].id],
+        )
+        self.assertEqual(data["missing"], [999999])
+
+    def test_post_body_matches_get(self):
+        ids = [artifact.id for artifact in reversed(self.artifacts)]
+        get = self.client.get(self.url, {"ids": ",".join(map(str, ids))}).json()
+        post = self.client.post(self.url, {"ids": ids}, content_type="application/json").json()
+        self.assertEqual(get, post)
+
+    def test_query_count_does_not_depend_on_number_of_ids(self):
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(self.url, {"ids": str(self.artifacts[0].id)})
+        ids = ",".join(str(artifact.id) for artifact in self.artifacts)
+        with CaptureQueriesContext(connection) as full:
+            response = self.client.get(self.url, {"ids": ids})
+        self.assertEqual(len(response.json()["data"]), len(self.artifacts))
+        self.assertEqual(len(single), len(full))
+
+    def test_invalid_ids_are_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"ids": "1,a"}).status_code, 400)
+        too_many = ",".join(map(str, range(ArtifactBatchAPIView.max_ids + 1)))
+        self.assertEqual(self.client.get(self.url, {"ids": too_many}).status_code, 400)
+
+
+class ArtifactDetailCacheTests(TestCase):
+    """
+    Checks that artifact details are cached and invalidated per artifact.
+    """
+
+    def setUp(self):
+        artifact_details.clear()
+        artifact_versions.clear()
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        self.tag = Tag.objects.create(name="Asa")
+        self.first, self.second = create_artifacts(2, shape, culture, [self.tag])
+
+    def get_detail(self, artifact):
+        """
+        Returns the detail of an artifact through the endpoint.
+        """
+        response = self.client.get(f"/api/catalog/artifact/{artifact.id}/")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_hot_artifact_is_served_from_cache(self):
+        self.get_detail(self.first)
+        hits = artifact_details.hits
+        with CaptureQueriesContext(connection) as queries:
+            self.get_detail(self.first)
+        self.assertEqual(artifact_details.hits, hits + 1)
+        # Solo se lee el estado del catálogo
+        self.assertEqual(len(queries), 1)
+
+    def test_image_change_only_invalidates_its_artifact(self):
+        self.assertEqual(self.get_detail(self.first)["images"], [])
+        self.get_detail(self.second)
+        with own_transaction():
+            Image.objects.create(id_artifact=self.first, path="images/nueva.jpg")
+
+        misses = artifact_details.misses
+        self.assertEqual(len(self.get_detail(self.first)["images"]), 1)
+        self.assertEqual(artifact_details.misses, misses + 1)
+        self.get_detail(self.second)
+        self.assertEqual(artifact_details.misses, misses + 1)
+
+    def test_related_and_artifact_changes_invalidate_details(self):
+        self.get_detail(self.first)
+        with own_transaction():
+            self.tag.name = "Asa doble"
+            self.tag.save()
+        self.assertEqual(
+            self.get_detail(self.first)["attributes"]["tags"][0]["value"], "Asa doble"
+        )
+        with own_transaction():
+            self.first.description = "Pieza editada"
+            self.first.save()
+        self.assertEqual(
+            self.get_detail(self.first)["attributes"]["description"], "Pieza editada"
+        )
+        artifact_id = self.first.id
+        with own_transaction():
+            self.first.delete()
+        response = self.client.get(f"/api/catalog/artifact/{artifact_id}/")
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(MEDIA_BASE_URL="", ALLOWED_HOSTS=["testserver", "otro.example"])
+class CatalogResponseCacheTests(TestCase):
+    """
+    Checks that catalog responses are cached per catalog version and host.
+    """
+
+    def setUp(self):
+        catalog_responses.clear()
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        self.artifacts = create_artifacts(3, shape, culture, [])
+        thumbnail = Thumbnail.objects.create(path="thumbnails/pieza.jpg")
+        self.artifacts[0].id_thumbnail = thumbnail
+        self.artifacts[0].save()
+
+    def get_catalog(self, **extra):
+        """
+        Returns the first catalog page through the endpoint.
+        """
+        response = self.client.get("/api/catalog/artifacts/", {"page_size": 5}, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_repeated_request_is_served_from_cache(self):
+        first = self.get_catalog()
+        hits = catalog_responses.hits
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_catalog(), first)
+        self.assertEqual(catalog_responses.hits, hits + 1)
+        # Solo se lee el estado del catálogo
+        self.assertEqual(len(queries), 1)
+
+    def test_version_bump_invalidates_responses(self):
+        self.get_catalog()
+        # Una escritura de otro proceso solo cambia la versión
+        CatalogEntry.objects.filter(artifact_id=self.artifacts[1].id).update(
+            description="Pieza editada"
+        )
+        bump_catalog_version()
+        misses = catalog_responses.misses
+        data = self.get_catalog()
+        self.assertEqual(catalog_responses.misses, misses + 1)
+        self.assertIn(
+            "Pieza editada", [item["attributes"]["description"] for item in data["data"]]
+        )
+
+    def test_hosts_do_not_share_responses(self):
+        thumbnail = self.get_catalog()["data"][0]["thumbnail"]
+        other_thumbnail = self.get_catalog(HTTP_HOST="otro.example")["data"][0]["thumbnail"]
+        self.assertTrue(thumbnail.startswith("http://testserver/"), thumbnail)
+        self.assertTrue(other_thumbnail.startswith("http://otro.example/"), other_thumbnail)
+
+        # Los enlaces de las páginas con cursor también son del host de la consulta
+        params = {"cursor": "", "page_size": 2}
+        response = self.client.get("/api/catalog/artifacts/", params).json()
+        other_response = self.client.get(
+            "/api/catalog/artifacts/", params, HTTP_HOST="otro.example"
+        ).json()
+        self.assertTrue(response["next"].startswith("http://testserver/"))
+        self.assertTrue(other_response["next"].startswith("http://otro.example/"))
+
+
+class ConditionalRequestTests(TestCase):
+    """
+    Checks the ETag and Last-Modified conditional responses of the read endpoints.
+    """
+
+    def setUp(self):
+        catalog_responses.clear()
+        artifact_details.clear()
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        self.tag = Tag.objects.create(name="Asa")
+        (self.artifact,) = create_artifacts(1, shape, culture, [self.tag])
+        Institution.objects.create(name="Museo")
+        self.urls = [
+            "/api/catalog/artifacts/",
+            f"/api/catalog/artifact/{self.artifact.id}/",
+            "/api/catalog/metadata/",
+            "/api/catalog/institutions/",
+        ]
+
+    def test_repeated_requests_are_not_modified(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etag = response["ETag"]
+            self.assertFalse(etag.startswith("W/"), url)
+
+            # Solo se lee el estado del catálogo, sin serializar nada
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b"", url)
+
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(response.status_code, 304, url)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH='"otra"')
+            self.assertEqual(response.status_code, 200, url)
+
+    def test_writes_change_the_validators(self):
+        validators = {url: self.client.get(url) for url in self.urls}
+        for write in (
+            lambda: Tag.objects.create(name="Rojo"),
+            lambda: Institution.objects.create(name="Biblioteca"),
+            lambda: Image.objects.create(id_artifact=self.artifact, path="images/nueva.jpg"),
+        ):
+            with own_transaction():
+                write()
+            for url, previous in validators.items():
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=previous["ETag"])
+                self.assertEqual(response.status_code, 200, url)
+                self.assertNotEqual(response["ETag"], previous["ETag"], url)
+                validators[url] = response
+
+    def test_older_modification_date_gets_the_response(self):
+        response = self.client.get(self.urls[0])
+        last_modified = parse_http_date(response["Last-Modified"])
+        response = self.client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=http_date(last_modified - 3600)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]), 1)
+
+
+class CatalogWriteTests(TestCase):
+    """
+    Checks that the writes of a transaction bump the versions of the catalog once.
+    """
+
+    def setUp(self):
+        self.shape = Shape.objects.create(name="Vasija")
+        self.culture = Culture.objects.create(name="Diaguita")
+        self.tags = [Tag.objects.create(name=name) for name in ("Asa", "Rojo")]
+        self.artifact, self.other = create_artifacts(2, self.shape, self.culture, self.tags[:1])
+        self.images = [
+            Image.objects.create(id_artifact=self.other, path=f"images/foto{index}.jpg")
+            for index in range(3)
+        ]
+
+    def state_writes(self, queries):
+        """
+        Returns the updates of the catalog state row among some captured queries.
+        """
+        return [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("UPDATE") and '"piezas_catalogstate"' in query["sql"]
+        ]
+
+    def test_receivers_of_a_transaction_bump_the_versions_once(self):
+        catalog_index.version = None
+        get_catalog_index()
+        state = CatalogState.objects.get()
+        with own_transaction(), CaptureQueriesContext(connection) as queries:
+            self.artifact.description = "Pieza editada"
+            self.artifact.save()
+            self.artifact.id_tags.set(self.tags)
+            self.images[0].id_artifact = self.artifact
+            self.images[0].save()
+            Image.objects.create(id_artifact=self.artifact, path="images/nueva.jpg")
+        # Una vez la versión del catálogo y una la de los descriptores
+        self.assertEqual(len(self.state_writes(queries)), 2)
+        written = CatalogState.objects.get()
+        self.assertEqual(written.version, state.version + 1)
+        self.assertEqual(written.descriptor_version, state.descriptor_version + 1)
+        self.assertEqual(
+            CatalogChange.objects.get(version=written.version).artifact_ids, [self.artifact.id]
+        )
+        # El índice del proceso se pone al día con lo confirmado
+        self.assertEqual(catalog_index.version, written.version)
+        self.assertEqual(catalog_index.match(tag_groups=[["Rojo"]]).tolist(), [self.artifact.id])
+
+    def test_rolled_back_writes_do_not_keep_their_version(self):
+        version = get_catalog_version()
+        with own_transaction():
+            try:
+                with transaction.atomic():
+                    Tag.objects.create(name="Negro")
+                    raise ValueError
+            except ValueError:
+                pass
+            Tag.objects.create(name="Verde")
+        self.assertEqual(get_catalog_version(), version + 1)
+        self.assertTrue(CatalogChange.objects.filter(version=version + 1).exists())
+
+    def test_editing_an_artifact_relinks_its_images_at_once(self):
+        user = CustomUser.objects.create(
+            username="funcionario", rut="111111111", email="funcionario@example.com"
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        version = get_catalog_version()
+        other_version = CatalogEntry.objects.get(artifact_id=self.other.id).version
+        with own_transaction(), CaptureQueriesContext(connection) as queries:
+            response = client.put(
+                f"/api/catalog/artifact/{self.artifact.id}/update",
+                {
+                    "description": "Pieza editada",
+                    "id_shape": self.shape.id,
+                    "id_culture": self.culture.id,
+                    "id_tags": [tag.id for tag in self.tags],
+                    "images": ["foto0.jpg", "foto1.jpg"],
+                },
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, 200)
+        image_writes = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("UPDATE") and '"piezas_image"' in query["sql"]
+        ]
+        self.assertEqual(len(image_writes), 2)
+        self.assertEqual(len(self.state_writes(queries)), 2)
+        self.assertEqual(get_catalog_version(), version + 1)
+        self.assertEqual(
+            sorted(Image.objects.filter(id_artifact=self.artifact).values_list("path", flat=True)),
+            ["images/foto0.jpg", "images/foto1.jpg"],
+        )
+        # La pieza que tenía las imágenes también cambia de versión
+        self.assertGreater(
+            CatalogEntry.objects.get(artifact_id=self.other.id).version, other_version
+        )
+
+
+class RenditionTests(TestCase):
+    """
+    Checks that resized copies of the uploaded photos are created and exposed.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, RENDITION_WIDTHS=[160, 320, 640, 1280]
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, model, name, width, height, **fields):
+        """
+        Saves a photo of the given size through a model.
+        """
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        image[:, : width // 2] = 255
+        _, data = cv2.imencode(".jpg", image)
+        photo = model(path=ContentFile(data.tobytes(), name=name), **fields)
+        photo.save()
+        return photo
+
+    def test_renditions_are_created_next_to_the_original(self):
+        thumbnail = self.upload(Thumbnail, "pieza.jpg", 1000, 500)
+        sizes = sorted((copy["width"], copy["format"]) for copy in thumbnail.renditions)
+        self.assertEqual(
+            sizes, [(width, kind) for width in (160, 320, 640) for kind in ("jpeg", "webp")]
+        )
+        directory = os.path.dirname(thumbnail.path.name)
+        for rendition in thumbnail.renditions:
+            self.assertEqual(os.path.dirname(rendition["name"]), directory)
+            copy = cv2.imread(thumbnail.path.storage.path(rendition["name"]))
+            self.assertEqual(copy.shape[1], rendition["width"])
+            self.assertEqual(copy.shape[0], rendition["width"] // 2)
+
+    def test_small_photos_have_no_renditions(self):
+        image = self.upload(Image, "pequena.jpg", 120, 80)
+        self.assertEqual(image.renditions, [])
+
+    def test_photo_write_is_a_single_save(self):
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        (artifact,) = create_artifacts(1, shape, culture, [])
+        version = get_catalog_version()
+        with own_transaction(), CaptureQueriesContext(connection) as queries:
+            image = self.upload(Image, "foto.jpg", 800, 600, id_artifact=artifact)
+        writes = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith(("INSERT", "UPDATE")) and '"piezas_image"' in query["sql"]
+        ]
+        self.assertEqual(len(writes), 1)
+        # Los receptores de señales se ejecutan una vez por escritura
+        self.assertEqual(get_catalog_version(), version + 1)
+        self.assertTrue(image.descriptor_bytes)
+        self.assertTrue(image.renditions)
+
+    def test_renditions_are_only_created_for_new_files(self):
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        (artifact,) = create_artifacts(1, shape, culture, [])
+        image = self.upload(Image, "foto.jpg", 800, 600, id_artifact=artifact)
+        with mock.patch("piezas.models.create_renditions") as create:
+            # Como al editar una pieza: se desvincula y se vuelve a vincular
+            image.id_artifact = None
+            image.save()
+            loaded = Image.objects.get(id=image.id)
+            loaded.id_artifact = artifact
+            loaded.save()
+            Image.objects.get(id=image.id).save(update_fields=["id_artifact"])
+        create.assert_not_called()
+
+        renditions = loaded.renditions
+        _, data = cv2.imencode(".jpg", np.zeros((300, 400, 3), dtype=np.uint8))
+        loaded.path = ContentFile(data.tobytes(), name="otra.jpg")
+        loaded.save()
+        self.assertEqual([copy["width"] for copy in loaded.renditions], [160, 160, 320, 320])
+        for rendition in renditions:
+            self.assertFalse(loaded.path.storage.exists(rendition["name"]))
+
+    def test_renditions_are_deleted_with_the_photo(self):
+        thumbnail = self.upload(Thumbnail, "pieza.jpg", 1000, 500)
+        storage = thumbnail.path.storage
+        self.assertTrue(all(storage.exists(copy["name"]) for copy in thumbnail.renditions))
+        with own_transaction():
+            thumbnail.delete()
+        self.assertFalse(any(storage.exists(copy["name"]) for copy in thumbnail.renditions))
+
+    def test_serializers_expose_srcsets(self):
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        (artifact,) = create_artifacts(1, shape, culture, [])
+        artifact.id_thumbnail = self.upload(Thumbnail, "pieza.jpg", 400, 300)
+        artifact.save()
+        self.upload(Image, "foto.jpg", 800, 600, id_artifact=artifact)
+
+        catalog = self.client.get("/api/catalog/artifacts/").json()
+        srcset = catalog["data"][0]["thumbnail_srcset"]
+        self.assertRegex(
+            srcset["webp"],
+            r"^http://testserver/media/thumbnails/pieza\S*\.160w\.webp 160w, \S+ 320w$",
+        )
+        self.assertIn("jpeg", srcset)
+
+        detail = self.client.get(f"/api/catalog/artifact/{artifact.id}/").json()
+        self.assertEqual(detail["thumbnail_srcset"], srcset)
+        self.assertEqual(len(detail["images_srcset"]), 1)
+        self.assertIn("640w", detail["images_srcset"][0]["jpeg"])
+
+
+class DescriptorTests(TestCase):
+    """
+    Checks that the vectorized descriptor matches the original zone by zone one.
+    """
+
+    def setUp(self):
+        self.index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.index_dir)
+        settings_override = override_settings(DESCRIPTOR_INDEX_DIR=self.index_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_matches_original_implementation(self):
+        rng = np.random.default_rng(0)
+        for height, width in [(1, 1), (3, 300), (7, 13), (480, 640), (1001, 999)]:
+            image = cv2.equalizeHist(rng.integers(0, 256, (height, width), dtype=np.uint8))
+            for zones, bins in [(4, 8), (8, 16)]:
+                expected = np.array(zone_histograms_loop(image, zones, zones, bins))
+                result = zone_histograms(image, zones, zones, bins, dtype=np.float64)
+                # Bit a bit, incluidas las zonas vacías (NaN) de las imágenes pequeñas
+                self.assertEqual(result.tobytes(), expected.tobytes())
+                self.assertEqual(
+                    zone_histograms(image, zones, zones, bins).tobytes(),
+                    expected.astype(np.float32).tobytes(),
+                )
+
+    def test_saved_descriptor(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        image = np.random.default_rng(0).integers(0, 256, (120, 160, 3), dtype=np.uint8)
+        _, data = cv2.imencode(".png", image)
+        with self.settings(MEDIA_ROOT=media_root):
+            thumbnail = Thumbnail.objects.create(path=ContentFile(data.tobytes(), name="pieza.png"))
+            gray = cv2.equalizeHist(cv2.imread(thumbnail.path.path, cv2.IMREAD_GRAYSCALE))
+        thumbnail.refresh_from_db()
+        self.assertIsNone(thumbnail.descriptor)
+        self.assertEqual(len(thumbnail.descriptor_bytes), 128 * 4)
+        self.assertEqual(
+            bytes(thumbnail.descriptor_bytes),
+            np.array(zone_histograms_loop(gray), dtype=np.float32).tobytes(),
+        )
+
+    def store_descriptor(self, model, photo, descriptor):
+        """
+        Stores a descriptor without the signals, as a photo without file would not get it.
+        """
+        model.objects.filter(id=photo.id).update(descriptor_bytes=pack_descriptor(descriptor))
+
+    def loaded_descriptors(self):
+        """
+        Returns the descriptors of the bulk loading grouped by artifact.
+        """
+        descriptors, ids = BulkLoadingAPIView().get_existing_descriptors()
+        self.assertEqual(descriptors.dtype, np.float32)
+        self.assertEqual(len(descriptors), len(ids))
+        loaded = {}
+        for artifact_id, descriptor in zip(ids.tolist(), descriptors):
+            loaded.setdefault(artifact_id, []).append(descriptor.tobytes())
+        return {key: sorted(value) for key, value in loaded.items()}
+
+    def test_descriptor_index_is_maintained_by_writes(self):
+        # El índice es del proceso: se descarta lo que dejaron otras pruebas
+        descriptor_index.version = None
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        first, second = create_artifacts(2, shape, culture, [])
+        rng = np.random.default_rng(0)
+        thumbnail_descriptor, image_descriptor, new_descriptor = rng.random((3, 128), dtype=np.float32)
+        thumbnail = Thumbnail.objects.create(path="thumbnails/pieza.jpg")
+        self.store_descriptor(Thumbnail, thumbnail, thumbnail_descriptor)
+        first.id_thumbnail = thumbnail
+        first.save()
+        image = Image.objects.create(id_artifact=second, path="images/pieza.jpg")
+        self.store_descriptor(Image, image, image_descriptor)
+
+        # Versión del catálogo y una sola consulta para todos los descriptores
+        with self.assertNumQueries(2):
+            loaded = self.loaded_descriptors()
+        self.assertEqual(
+            loaded,
+            {first.id: [thumbnail_descriptor.tobytes()], second.id: [image_descriptor.tobytes()]},
+        )
+        with self.assertNumQueries(1):
+            self.loaded_descriptors()
+
+        # Las escrituras de este proceso solo recargan las piezas que tocan
+        with own_transaction():
+            new_image = Image.objects.create(id_artifact=first, path="images/nueva.jpg")
+            self.store_descriptor(Image, new_image, new_descriptor)
+            image.delete()
+        with self.assertNumQueries(2):
+            loaded = self.loaded_descriptors()
+        self.assertEqual(
+            loaded, {first.id: sorted([thumbnail_descriptor.tobytes(), new_descriptor.tobytes()])}
+        )
+
+        # Las escrituras que no cambian descriptores no recargan el índice
+        second.description = "Otra descripción"
+        second.save()
+        bump_catalog_version()
+        with self.assertNumQueries(1):
+            self.loaded_descriptors()
+
+        # Una escritura de otro proceso, que solo cambia la versión, reconstruye el índice
+        self.store_descriptor(Thumbnail, thumbnail, image_descriptor)
+        bump_descriptor_version()
+        loaded = self.loaded_descriptors()
+        self.assertEqual(
+            loaded, {first.id: sorted([image_descriptor.tobytes(), new_descriptor.tobytes()])}
+        )
+
+    def test_descriptor_index_is_shared_through_files(self):
+        descriptor_index.version = None
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        (artifact,) = create_artifacts(1, shape, culture, [])
+        first_descriptor, second_descriptor = np.random.default_rng(0).random((2, 128), dtype=np.float32)
+        image = Image.objects.create(id_artifact=artifact, path="images/pieza.jpg")
+        self.store_descriptor(Image, image, first_descriptor)
+        call_command("buildDescriptorIndex")
+
+        # Un proceso nuevo mapea los archivos sin consultar los descriptores
+        with self.assertNumQueries(1):
+            descriptors, ids = BulkLoadingAPIView().get_existing_descriptors()
+        self.assertIsInstance(descriptors, np.memmap)
+        self.assertFalse(descriptors.flags.writeable)
+        self.assertEqual(descriptors.tobytes(), first_descriptor.tobytes())
+        self.assertEqual(ids.tolist(), [artifact.id])
+
+        # Las escrituras que no cambian descriptores no dejan obsoletos los archivos
+        artifact.description = "Otra descripción"
+        artifact.save()
+        bump_catalog_version()
+        descriptor_index.version = None
+        with self.assertNumQueries(1):
+            descriptors, _ = BulkLoadingAPIView().get_existing_descriptors()
+        self.assertIsInstance(descriptors, np.memmap)
+
+        # Con una versión nueva los archivos quedan obsoletos: se reconstruye desde la
+        # base de datos y se reemplazan, borrando los de la versión anterior
+        self.store_descriptor(Image, image, second_descriptor)
+        bump_descriptor_version()
+        with self.assertNumQueries(2):
+            descriptors, _ = BulkLoadingAPIView().get_existing_descriptors()
+        self.assertEqual(descriptors.tobytes(), second_descriptor.tobytes())
+        self.assertEqual(len(os.listdir(self.index_dir)), 3)
+        descriptor_index.version = None
+        with self.assertNumQueries(1):
+            descriptors, _ = BulkLoadingAPIView().get_existing_descriptors()
+        self.assertIsInstance(descriptors, np.memmap)
+        self.assertEqual(descriptors.tobytes(), second_descriptor.tobytes())
+
+        # Un puntero dañado no impide cargar el índice
+        with open(os.path.join(self.index_dir, "index.json"), "w") as file:
+            file.write("{")
+        descriptor_index.version = None
+        descriptors, _ = BulkLoadingAPIView().get_existing_descriptors()
+        self.assertEqual(descriptors.tobytes(), second_descriptor.tobytes())
+
+    def test_legacy_descriptors_are_converted(self):
+        thumbnail = Thumbnail.objects.create(path="thumbnails/pieza.jpg")
+        legacy = np.random.default_rng(0).random(128)
+        Thumbnail.objects.filter(id=thumbnail.id).update(descriptor=json.dumps(legacy.tolist()))
+
+        call_command("convertDescriptors")
+        thumbnail.refresh_from_db()
+        self.assertIsNone(thumbnail.descriptor)
+        self.assertEqual(
+            bytes(thumbnail.descriptor_bytes), legacy.astype(np.float32).tobytes()
+        )
+
+
+CUBE_OBJ = """mtllib pieza.mtl
+v 0 0 0
+v 2 0 0
+v 2 1 0
+v 0 1 0
+v 0 0 4
+v 2 0 4
+v 2 1 4
+v 0 1 4
+vt 0 0
+vt 1 0
+vt 1 1
+vt 0 1
+vn 0 0 -1
+vn 0 0 1
+vn 0 -1 0
+vn 0 1 0
+vn -1 0 0
+vn 1 0 0
+f 1/1/1 4/4/1 3/3/1 2/2/1
+f 5/1/2 6/2/2 7/3/2 8/4/2
+f 1/1/3 2/2/3 6/3/3 5/4/3
+f 4/1/4 8/4/4 7/3/4 3/2/4
+f 1/1/5 5/2/5 8/3/5 4/4/5
+f -7/1/6 -6/2/6 -2/3/6 -3/4/6
+"""
+
+
+def read_glb(data):
+    """
+    Splits a GLB file into its JSON document and its binary buffer.
+    """
+    magic, version, length = struct.unpack_from("<III", data)
+    assert (magic, version, length) == (GLB_MAGIC, 2, len(data))
+    json_length, _ = struct.unpack_from("<II", data, 12)
+    document = json.loads(data[20 : 20 + json_length])
+    return document, data[20 + json_length + 8 :]
+
+
+def read_accessor(document, binary, index, dtype, width):
+    """
+    Reads the elements of a GLB accessor as a (count, width) array.
+    """
+    accessor = document["accessors"][index]
+    view = document["bufferViews"][accessor["bufferView"]]
+    stride = view.get("byteStride", np.dtype(dtype).itemsize * width) // np.dtype(dtype).itemsize
+    array = np.frombuffer(
+        binary, dtype=dtype, count=view["byteLength"] // np.dtype(dtype).itemsize,
+        offset=view["byteOffset"],
+    )
+    return array.reshape(-1, stride)[: accessor["count"], :width]
+
+
+class MediaUrlTests(TestCase):
+    """
+    Checks that the URLs of the uploaded files are built from the media base URL.
+    """
+
+    def setUp(self):
+        artifact_details.clear()
+        artifact_versions.clear()
+        catalog_responses.clear()
+
+    def test_configured_base_url_prefixes_the_names(self):
+        request = APIRequestFactory().get("/", HTTP_HOST="otro.example")
+        with override_settings(MEDIA_BASE_URL="https://cdn.example/media"):
+            self.assertEqual(media_base_url(request), "https://cdn.example/media/")
+            self.assertEqual(
+                media_url(request, "thumbnails/pieza uno.jpg"),
+                "https://cdn.example/media/thumbnails/pieza%20uno.jpg",
+            )
+            self.assertEqual(
+                media_url(None, "/images/foto.jpg"), "https://cdn.example/media/images/foto.jpg"
+            )
+            self.assertIsNone(media_url(request, ""))
+
+    @override_settings(MEDIA_BASE_URL="", ALLOWED_HOSTS=["otro.example"])
+    def test_empty_base_url_uses_the_request_host(self):
+        request = APIRequestFactory().get("/", HTTP_HOST="otro.example")
+        self.assertEqual(
+            media_url(request, "images/foto.jpg"), "http://otro.example/media/images/foto.jpg"
+        )
+        self.assertEqual(media_url(None, "images/foto.jpg"), "/media/images/foto.jpg")
+
+    def test_setting_changes_clear_the_cached_base_url(self):
+        with override_settings(MEDIA_BASE_URL="https://uno.example/"):
+            self.assertEqual(media_base_url(), "https://uno.example/")
+            with override_settings(MEDIA_BASE_URL="https://dos.example/"):
+                self.assertEqual(media_base_url(), "https://dos.example/")
+            self.assertEqual(media_base_url(), "https://uno.example/")
+            with override_settings(MEDIA_BASE_URL=""):
+                self.assertEqual(media_base_url(), "/media/")
+
+    @override_settings(MEDIA_BASE_URL="", ALLOWED_HOSTS=["otro.example"])
+    def test_request_base_url_is_built_once(self):
+        request = APIRequestFactory().get("/", HTTP_HOST="otro.example")
+        with mock.patch.object(
+            request, "build_absolute_uri", wraps=request.build_absolute_uri
+        ) as build:
+            urls = [media_url(request, f"images/foto{index}.jpg") for index in range(3)]
+        build.assert_called_once()
+        self.assertEqual(request._media_base_url, "http://otro.example/media/")
+        self.assertEqual(urls[2], "http://otro.example/media/images/foto2.jpg")
+
+    @override_settings(MEDIA_BASE_URL="https://cdn.example/")
+    def test_serializers_use_the_base_url(self):
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        (artifact,) = create_artifacts(1, shape, culture, [])
+        renditions = [
+            {"name": "thumbnails/pieza.160w.webp", "width": 160, "format": "webp"},
+            {"name": "thumbnails/pieza.160w.jpg", "width": 160, "format": "jpeg"},
+        ]
+        thumbnail = Thumbnail.objects.create(path="thumbnails/pieza.jpg")
+        Thumbnail.objects.filter(id=thumbnail.id).update(renditions=renditions)
+        image = Image.objects.create(id_artifact=artifact, path="images/foto.jpg")
+        Image.objects.filter(id=image.id).update(
+            renditions=[{"name": "images/foto.160w.webp", "width": 160, "format": "webp"}]
+        )
+        artifact.id_thumbnail = Thumbnail.objects.get(id=thumbnail.id)
+        artifact.id_model = Model.objects.create(
+            object="objects/pieza.obj",
+            material="materials/pieza.mtl",
+            texture="materials/pieza.jpg",
+        )
+        artifact.save()
+
+        detail = self.client.get(f"/api/catalog/artifact/{artifact.id}/").json()
+        self.assertEqual(detail["thumbnail"], "https://cdn.example/thumbnails/pieza.jpg")
+        self.assertEqual(detail["images"], ["https://cdn.example/images/foto.jpg"])
+        self.assertEqual(detail["model"]["object"], "https://cdn.example/objects/pieza.obj")
+        self.assertEqual(detail["model"]["material"], "https://cdn.example/materials/pieza.mtl")
+        self.assertEqual(detail["model"]["texture"], "https://cdn.example/materials/pieza.jpg")
+        self.assertEqual(
+            detail["thumbnail_srcset"],
+            {
+                "webp": "https://cdn.example/thumbnails/pieza.160w.webp 160w",
+                "jpeg": "https://cdn.example/thumbnails/pieza.160w.jpg 160w",
+            },
+        )
+        self.assertEqual(
+            detail["images_srcset"], [{"webp": "https://cdn.example/images/foto.160w.webp 160w"}]
+        )
+
+        item = self.client.get("/api/catalog/artifacts/").json()["data"][0]
+        self.assertEqual(item["thumbnail"], "https://cdn.example/thumbnails/pieza.jpg")
+        self.assertEqual(item["thumbnail_srcset"], detail["thumbnail_srcset"])
+
+
+class MeshTests(TestCase):
+    """
+    Checks that the 3D models are converted to quantized binary meshes.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_obj_is_converted_to_indexed_triangles(self):
+        mesh = read_obj(io.BytesIO(CUBE_OBJ.encode()))
+        # Seis caras con cuatro esquinas distintas cada una, divididas en dos triángulos
+        self.assertEqual(mesh.positions.shape, (24, 3))
+        self.assertEqual(mesh.indices.shape, (12, 3))
+        self.assertEqual(mesh.uvs.shape, (24, 2))
+        self.assertEqual(mesh.normals.shape, (24, 3))
+
+    def test_model_mesh_dequantizes_to_the_obj(self):
+        model = Model.objects.create(
+            texture=ContentFile(b"textura", name="pieza.jpg"),
+            object=ContentFile(CUBE_OBJ.encode(), name="pieza.obj"),
+            material=ContentFile(b"newmtl pieza\nKd 0.5 0.5 0.5\n", name="pieza.mtl"),
+        )
+        self.assertEqual(
+            os.path.splitext(model.mesh.name)[0], os.path.splitext(model.object.name)[0]
+        )
+        with model.mesh.open("rb") as file:
+            document, binary = read_glb(file.read())
+
+        node = document["nodes"][0]
+        self.assertEqual(node["translation"], [0, 0, 0])
+        primitive = document["meshes"][0]["primitives"][0]
+        positions = read_accessor(document, binary, primitive["attributes"]["POSITION"], np.uint16, 3)
+        positions = positions * np.array(node["scale"]) + np.array(node["translation"])
+        indices = read_accessor(document, binary, primitive["indices"], np.uint16, 1)
+        triangles = positions[indices.reshape(-1, 3)]
+        expected = read_obj(io.BytesIO(CUBE_OBJ.encode()))
+        np.testing.assert_allclose(triangles, expected.positions[expected.indices], atol=1e-4)
+
+        texture = document["images"][0]["uri"]
+        self.assertEqual(
+            os.path.normpath(os.path.join(os.path.dirname(model.mesh.name), texture)),
+            os.path.normpath(model.texture.name),
+        )
+
+    def test_serializer_advertises_mesh(self):
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        (artifact,) = create_artifacts(1, shape, culture, [])
+        artifact.id_model = Model.objects.create(
+            texture=ContentFile(b"textura", name="pieza.jpg"),
+            object=ContentFile(CUBE_OBJ.encode(), name="pieza.obj"),
+            material=ContentFile(b"newmtl pieza\n", name="pieza.mtl"),
+        )
+        artifact.save()
+
+        detail = self.client.get(f"/api/catalog/artifact/{artifact.id}/").json()
+        self.assertRegex(detail["model"]["mesh"], r"^http://testserver/media/objects/pieza\S*\.glb$")
+        # Los niveles de detalle se crean fuera de la petición
+        self.assertEqual(detail["model"]["lods"], [])
+        with own_transaction():
+            call_command("createMeshes", workers=1)
+        detail = self.client.get(f"/api/catalog/artifact/{artifact.id}/").json()
+        self.assertEqual(detail["model"]["lods"], [{"url": detail["model"]["mesh"], "triangles": 12}])
+
+    def test_saves_without_a_new_object_do_not_convert_it(self):
+        model = Model.objects.create(
+            texture=ContentFile(b"textura", name="pieza.jpg"),
+            object=ContentFile(CUBE_OBJ.encode(), name="pieza.obj"),
+            material=ContentFile(b"newmtl pieza\n", name="pieza.mtl"),
+        )
+        mesh = model.mesh.name
+        with mock.patch("piezas.models.create_mesh") as create:
+            model.save()
+            Model.objects.get(id=model.id).save()
+            # Como createTextures y createMeshes
+            model.save(update_fields=["textures"])
+            loaded = Model.objects.get(id=model.id)
+            loaded.mesh = ""
+            loaded.save(update_fields=["mesh", "lods"])
+        create.assert_not_called()
+
+        model.object = ContentFile(CUBE_OBJ.encode(), name="otra.obj")
+        model.save()
+        self.assertNotEqual(model.mesh.name, mesh)
+        self.assertFalse(model.mesh.storage.exists(mesh))
+
+    def test_model_has_coarser_levels_of_detail(self):
+        # Esfera de 64 x 32 cuadriláteros con coordenadas de textura
+        rows, columns = 32, 64
+        theta, phi = np.meshgrid(
+            np.linspace(0, np.pi, rows + 1), np.linspace(0, 2 * np.pi, columns + 1), indexing="ij"
+        )
+        points = np.stack(
+            [np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi), np.cos(theta)], axis=-1
+        ).reshape(-1, 3)
+        uvs = np.stack([phi / (2 * np.pi), 1 - theta / np.pi], axis=-1).reshape(-1, 2)
+        lines = [f"v {x} {y} {z}" for x, y, z in points]
+        lines += [f"vt {u} {v}" for u, v in uvs]
+        for row in range(rows):
+            for column in range(columns):
+                a = row * (columns + 1) + column + 1
+                b, c, d = a + 1, a + columns + 2, a + columns + 1
+                lines.append(f"f {a}/{a} {b}/{b} {c}/{c} {d}/{d}")
+
+        with self.settings(MODEL_LOD_RATIOS=[0.25, 0.05], MODEL_LOD_MIN_TRIANGLES=50):
+            model = Model.objects.create(
+                texture=ContentFile(b"textura", name="esfera.jpg"),
+                object=ContentFile("\n".join(lines).encode(), name="esfera.obj"),
+                material=ContentFile(b"newmtl esfera\n", name="esfera.mtl"),
+            )
+            self.assertTrue(model.mesh)
+            self.assertEqual(model.lods, [])
+            call_command("createMeshes", workers=1)
+        model.refresh_from_db()
+        full = read_obj(io.BytesIO("\n".join(lines).encode()))
+        triangles = [lod["triangles"] for lod in model.lods]
+        self.assertEqual(len(triangles), 3)
+        self.assertEqual(triangles[-1], len(full.indices))
+        self.assertEqual(model.lods[-1]["name"], model.mesh.name)
+        self.assertLessEqual(triangles[1], len(full.indices) * 0.25)
+        self.assertLessEqual(triangles[0], len(full.indices) * 0.05)
+        self.assertLess(triangles[0], triangles[1])
+
+        for lod in model.lods[:-1]:
+            with model.mesh.storage.open(lod["name"], "rb") as file:
+                document, binary = read_glb(file.read())
+            primitive = document["meshes"][0]["primitives"][0]
+            self.assertEqual(document["accessors"][primitive["indices"]]["count"], lod["triangles"] * 3)
+            self.assertIn("TEXCOORD_0", primitive["attributes"])
+            # Los vértices simplificados siguen sobre la esfera
+            node = document["nodes"][0]
+            positions = read_accessor(document, binary, primitive["attributes"]["POSITION"], np.uint16, 3)
+            positions = positions * np.array(node["scale"]) + np.array(node["translation"])
+            radii = np.linalg.norm(positions, axis=1)
+            self.assertTrue(((radii > 0.8) & (radii < 1.01)).all())
+
+    def test_invalid_obj_keeps_no_mesh(self):
+        model = Model.objects.create(
+            texture=ContentFile(b"textura", name="pieza.jpg"),
+            object=ContentFile(b"v 0 0 0\n", name="pieza.obj"),
+            material=ContentFile(b"", name="pieza.mtl"),
+        )
+        self.assertFalse(model.mesh)
+
+
+class TextureTests(TestCase):
+    """
+    Checks that downscaled variants of the 3D model textures are created and exposed.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, TEXTURE_SIZES=[1024, 2048])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_model(self, width, height):
+        """
+        Saves a model whose texture has the given size.
+        """
+        _, data = cv2.imencode(".jpg", np.full((height, width, 3), 128, dtype=np.uint8))
+        return Model.objects.create(
+            texture=ContentFile(data.tobytes(), name="pieza.jpg"),
+            object=ContentFile(CUBE_OBJ.encode(), name="pieza.obj"),
+            material=ContentFile(
+                b"newmtl pieza\nKd 1 1 1\nmap_Kd -s 1 1 1 pieza.jpg\n", name="pieza.mtl"
+            ),
+        )
+
+    def test_variants_reference_their_texture(self):
+        model = self.create_model(3000, 1500)
+        self.assertEqual([variant["size"] for variant in model.textures], [1024, 2048])
+        storage = model.texture.storage
+        for variant in model.textures:
+            texture = cv2.imread(storage.path(variant["texture"]))
+            self.assertEqual(texture.shape[:2], (variant["size"] // 2, variant["size"]))
+            with storage.open(variant["material"], "rb") as file:
+                material = file.read().decode()
+            self.assertIn("Kd 1 1 1", material)
+            (line,) = [line for line in material.splitlines() if line.startswith("map_Kd")]
+            self.assertTrue(line.startswith("map_Kd -s 1 1 1 "))
+            self.assertEqual(
+                os.path.normpath(
+                    os.path.join(os.path.dirname(variant["material"]), line.split()[-1])
+                ),
+                os.path.normpath(variant["texture"]),
+            )
+
+    def test_small_textures_have_no_variants(self):
+        self.assertEqual(self.create_model(800, 800).textures, [])
+
+    def test_serializer_exposes_variants(self):
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        (artifact,) = create_artifacts(1, shape, culture, [])
+        artifact.id_model = self.create_model(1500, 1500)
+        artifact.save()
+
+        detail = self.client.get(f"/api/catalog/artifact/{artifact.id}/").json()
+        (variant,) = detail["model"]["textures"]
+        self.assertEqual(variant["size"], 1024)
+        self.assertRegex(variant["texture"], r"^http://testserver/media/materials/pieza\S*\.1024px\.jpg$")
+        self.assertRegex(variant["material"], r"^http://testserver/media/materials/pieza\S*\.1024px\.mtl$")
+
+
+class PrefixTrieTests(SimpleTestCase):
+    """
+    Checks the prefix trie of the autocomplete index.
+    """
+
+    def test_shorter_words_come_first(self):
+        trie = PrefixTrie()
+        for word in ("vasijas", "vaso", "vasija", "plato"):
+            trie.add(word, ("keyword", None, word))
+        found = trie.search("vas", 10)
+        self.assertEqual([item[2] for item in found], ["vaso", "vasija", "vasijas"])
+        self.assertEqual([item[2] for item in trie.search("vas", 2)], ["vaso", "vasija"])
+        self.assertEqual(trie.search("taza", 10), [])
+
+    def test_removed_words_are_pruned(self):
+        trie = PrefixTrie()
+        trie.add("asa", ("tag", 1, "Asa"))
+        trie.add("asas", ("tag", 2, "Asas"))
+        trie.remove("asas", ("tag", 2, "Asas"))
+        self.assertEqual(trie.search("as", 10), [("tag", 1, "Asa")])
+        trie.remove("asa", ("tag", 3, "Otra"))
+        trie.remove("asa", ("tag", 1, "Asa"))
+        self.assertEqual(trie.root, {})
+
+
+class AutocompleteTests(TestCase):
+    """
+    Checks the suggestions of the autocomplete endpoint.
+    """
+
+    def setUp(self):
+        # El índice es del proceso: se descarta lo que dejaron otras pruebas
+        autocomplete_index.version = None
+        autocomplete_index.checked_at = None
+        self.shape = Shape.objects.create(name="Vasija zoomorfa")
+        self.culture = Culture.objects.create(name="Ánimas")
+        self.tag = Tag.objects.create(name="Anfora")
+        Institution.objects.create(name="Museo de Arte Precolombino")
+        Artifact.objects.create(
+            description="Ánfora de la zona con 2 asas", id_shape=self.shape, id_culture=self.culture
+        )
+
+    def suggest(self, text, **params):
+        """
+        Returns the (type, value) pairs suggested for a text.
+        """
+        response = self.client.get("/api/catalog/autocomplete/", {"q": text, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item["type"], item["value"]) for item in response.json()["data"]]
+
+    def test_accents_and_case_are_folded(self):
+        # Las palabras más cortas primero, y luego en orden alfabético
+        self.assertEqual(
+            self.suggest("AN"),
+            [("tag", "Anfora"), ("keyword", "ánfora"), ("culture", "Ánimas")],
+        )
+        self.assertEqual(self.suggest("ánim"), [("culture", "Ánimas")])
+
+    def test_every_word_of_a_label_is_a_prefix(self):
+        self.assertEqual(self.suggest("zoo"), [("shape", "Vasija zoomorfa")])
+        self.assertEqual(self.suggest("vasija  zoo"), [("shape", "Vasija zoomorfa")])
+        self.assertEqual(self.suggest("precol"), [("institution", "Museo de Arte Precolombino")])
+        # Las palabras vacías, cortas y numéricas de las descripciones no se sugieren
+        self.assertEqual(self.suggest("la"), [])
+        self.assertEqual(self.suggest("2"), [])
+        self.assertEqual(self.suggest("zon"), [("keyword", "zona")])
+
+    def test_types_and_limit_select_the_suggestions(self):
+        self.assertEqual(
+            self.suggest("an", types="tag,keyword"), [("tag", "Anfora"), ("keyword", "ánfora")]
+        )
+        self.assertEqual(self.suggest("an", limit=1), [("tag", "Anfora")])
+        self.assertEqual(len(self.suggest("a", limit=1000)), 5)
+        with mock.patch.object(AutocompleteAPIView, "max_limit", 2):
+            self.assertEqual(len(self.suggest("a", limit=1000)), 2)
+        self.assertEqual(self.suggest(" "), [])
+
+    def test_invalid_parameters_are_rejected(self):
+        url = "/api/catalog/autocomplete/"
+        self.assertEqual(self.client.get(url, {"q": "an", "types": "tag,pieza"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"q": "an", "limit": "diez"}).status_code, 400)
+
+    def test_writes_update_the_index_without_rebuilding_it(self):
+        self.suggest("an")
+        with mock.patch.object(AutocompleteIndex, "rebuild") as rebuild:
+            with own_transaction():
+                self.tag.name = "Anforita"
+                self.tag.save()
+            with own_transaction():
+                self.culture.delete()
+            with own_transaction():
+                Tag.objects.create(name="Antropomorfo")
+            with own_transaction():
+                Artifact.objects.create(description="Anillo de cobre")
+            with own_transaction():
+                Artifact.objects.filter(description__startswith="Ánfora").delete()
+            # Entre comprobaciones de la versión las sugerencias no consultan la base
+            with self.assertNumQueries(0):
+                suggestions = self.suggest("an")
+            rebuild.assert_not_called()
+        self.assertEqual(
+            suggestions,
+            [("keyword", "anillo"), ("tag", "Anforita"), ("tag", "Antropomorfo")],
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "The catalog indexes are checked on PostgreSQL")
+class CatalogIndexTests(TestCase):
+    """
+    Checks with EXPLAIN that every filter of the catalog can be served by an index.
+
+    Sequential scans are disabled, since on tables this small the planner would
+    prefer them anyway; a filter without a usable index still falls back to one.
+    """
+
+    def setUp(self):
+        self.shape = Shape.objects.create(name="Vasija")
+        self.culture = Culture.objects.create(name="Diaguita")
+        self.tags = [Tag.objects.create(name=name) for name in ("Asa", "Rojo")]
+        create_artifacts(3, self.shape, self.culture, self.tags)
+
+    def explain(self, queryset):
+        """
+        Returns the plan of a queryset as text.
+        """
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + sql, params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, *index_names):
+        """
+        Asserts that the plan of a queryset uses one of the given indexes.
+        """
+        plan = self.explain(queryset)
+        self.assertNotIn("Seq Scan", plan)
+        self.assertTrue(
+            any(name in plan for name in index_names),
+            f"None of {index_names} is used by:\n{plan}",
+        )
+
+    def catalog_queryset(self, **params):
+        """
+        Returns the queryset CatalogAPIView filters with for the given parameters.
+        """
+        view = CatalogAPIView()
+        view.request = Request(APIRequestFactory().get("/api/catalog/artifacts/", params))
+        return view.get_queryset()
+
+    def test_culture_filter_uses_index(self):
+        self.assertUsesIndex(
+            self.catalog_queryset(culture="diaguita"), "piezas_catalog_culture_upper"
+        )
+
+    def test_shape_filter_uses_index(self):
+        self.assertUsesIndex(
+            self.catalog_queryset(shape="vasija"), "piezas_catalog_shape_upper"
+        )
+
+    def test_tags_filter_uses_index(self):
+        self.assertUsesIndex(
+            self.catalog_queryset(tags="asa,rojo"), "piezas_catalogentry_tag_ids_gin"
+        )
+
+    def test_combined_filters_use_index(self):
+        self.assertUsesIndex(
+            self.catalog_queryset(culture="diaguita", shape="vasija", tags="asa|rojo"),
+            "piezas_catalog_culture_upper",
+            "piezas_catalog_shape_upper",
+            "piezas_catalogentry_tag_ids_gin",
+        )
+
+    def test_sort_keys_use_index(self):
+        for key, column in CATALOG_ORDERINGS.items():
+            for ordering in (key, "-" + key):
+                queryset = self.catalog_queryset(ordering=ordering)
+                plan = self.explain(queryset[:9])
+                self.assertNotIn("Sort", plan, ordering)
+                self.assertNotIn("Seq Scan", plan, ordering)
+
+    def test_tag_name_lookup_uses_index(self):
+        self.assertUsesIndex(
+            Tag.objects.filter(name__iexact="asa"), "piezas_tag_name_upper"
+        )
+        self.assertUsesIndex(
+            Shape.objects.filter(name__iexact="vasija"), "piezas_shape_name_upper"
+        )
+        self.assertUsesIndex(
+            Culture.objects.filter(name__iexact="diaguita"), "piezas_culture_name_upper"
+        )
+
+    def test_artifact_relations_use_composite_indexes(self):
+        self.assertUsesIndex(
+            Artifact.objects.filter(id_culture=self.culture).order_by("id"),
+            "piezas_artifact_culture_id",
+        )
+        self.assertUsesIndex(
+            Artifact.objects.filter(id_shape=self.shape).order_by("id"),
+            "piezas_artifact_shape_id",
+        )
+        through = Artifact.id_tags.through
+        self.assertUsesIndex(
+            through.objects.filter(tag_id=self.tags[0].id).order_by("artifact_id"),
+            "piezas_artifact_tags_tag_artifact",
+        )
+
+
+class CatalogOrderingTests(TestCase):
+    """
+    Checks the sort keys of the catalog with both paginations.
+    """
+
+    def setUp(self):
+        shapes = [Shape.objects.create(name=name) for name in ("Vasija", "Plato")]
+        cultures = [Culture.objects.create(name=name) for name in ("Diaguita", "Inca")]
+        tags = [Tag.objects.create(name="Asa")]
+        for index in range(12):
+            artifact = Artifact.objects.create(
+                description=f"Pieza {index % 5}",
+                id_shape=shapes[index % 2],
+                id_culture=cultures[index % 2] if index % 3 else None,
+            )
+            artifact.id_tags.set(tags)
+
+    def expected_ids(self, key, descending):
+        """
+        Returns the artifact ids in the order of a sort key, computed in Python.
+        """
+        column = CATALOG_ORDERINGS[key]
+        entries = list(CatalogEntry.objects.all())
+        # Las entradas sin valor van al final en orden ascendente
+        entries.sort(key=lambda entry: entry.artifact_id, reverse=descending)
+        entries.sort(
+            key=lambda entry: (getattr(entry, column) is None, getattr(entry, column) or ""),
+            reverse=descending,
+        )
+        return [entry.artifact_id for entry in entries]
+
+    def walk(self, ordering):
+        """
+        Follows the next links of the cursor pagination and then the previous ones.
+        """
+        response = self.client.get(
+            "/api/catalog/artifacts/", {"cursor": "", "ordering": ordering, "page_size": 5}
+        ).json()
+        pages = [[item["id"] for item in response["data"]]]
+        while response["next"]:
+            response = self.client.get(response["next"]).json()
+            pages.append([item["id"] for item in response["data"]])
+        backwards = [pages[-1]]
+        while response["previous"]:
+            response = self.client.get(response["previous"]).json()
+            backwards.append([item["id"] for item in response["data"]])
+        return pages, backwards
+
+    def test_cursor_pagination_follows_every_sort_key(self):
+        for key in CATALOG_ORDERINGS:
+            for descending in (False, True):
+                ordering = ("-" if descending else "") + key
+                expected = self.expected_ids(key, descending)
+                pages, backwards = self.walk(ordering)
+                self.assertEqual(sum(pages, []), expected, ordering)
+                self.assertEqual(backwards, list(reversed(pages)), ordering)
+
+    def test_numbered_pages_follow_sort_key(self):
+        for ordering in ("culture", "-shape", "-id"):
+            key = ordering.lstrip("-")
+            response = self.client.get(
+                "/api/catalog/artifacts/", {"ordering": ordering, "page_size": 20}
+            ).json()
+            self.assertEqual(
+                [item["id"] for item in response["data"]],
+                self.expected_ids(key, ordering.startswith("-")),
+            )
+
+    def test_unknown_sort_key_is_rejected(self):
+        response = self.client.get("/api/catalog/artifacts/", {"ordering": "price"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_of_another_sort_key_is_rejected(self):
+        response = self.client.get(
+            "/api/catalog/artifacts/", {"cursor": "", "ordering": "culture", "page_size": 5}
+        ).json()
+        next_link = response["next"].replace("ordering=culture", "ordering=shape")
+        self.assertEqual(self.client.get(next_link).status_code, 404)
+
+
+class CatalogSearchTests(TestCase):
+    """
+    Checks the text search of the catalog.
+    """
+
+    def setUp(self):
+        catalog_responses.clear()
+        culture = Culture.objects.create(name="Diaguita")
+        self.artifacts = {}
+        for index, description in enumerate(
+            [
+                "Vasija con asa roja",
+                "Plato de cerámica",
+                "Figura de una vasija pequeña",
+                "Vasijas decoradas",
+                "Fragmento de plato",
+            ]
+        ):
+            self.artifacts[description] = Artifact.objects.create(
+                description=description, id_culture=culture if index % 2 else None
+            )
+        # Piezas de más para que haya ids de dos dígitos
+        for index in range(6):
+            Artifact.objects.create(description=f"Pieza {index}")
+
+    def search(self, text, **params):
+        """
+        Returns the ids of the artifacts found by a catalog search.
+        """
+        response = self.client.get(
+            "/api/catalog/artifacts/", {"query": text, "page_size": 50, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.json()["data"]]
+
+    def ids(self, *descriptions):
+        """
+        Returns the ids of the artifacts with the given descriptions.
+        """
+        return [self.artifacts[description].id for description in descriptions]
+
+    def test_numeric_query_is_an_exact_id_lookup(self):
+        artifact = self.artifacts["Plato de cerámica"]
+        self.assertEqual(self.search(str(artifact.id)), [artifact.id])
+        self.assertEqual(self.search(f" {artifact.id} "), [artifact.id])
+        # Otro id que contiene los mismos dígitos no coincide
+        self.assertNotIn(artifact.id, self.search(f"{artifact.id}1"))
+        self.assertEqual(self.search("9" * 30), [])
+
+    def test_query_is_combined_with_filters(self):
+        found = self.search("plato", culture="diaguita")
+        self.assertEqual(found, self.ids("Plato de cerámica"))
+        self.assertEqual(self.search("PLATO", culture="Inca"), [])
+
+    def test_ordering_overrides_the_ranking(self):
+        found = self.search("vasija", ordering="-id")
+        self.assertEqual(sorted(found, reverse=True), found)
+        self.assertTrue(set(self.ids("Vasija con asa roja", "Vasijas decoradas")) <= set(found))
+
+    def test_blank_query_does_not_filter(self):
+        self.assertEqual(len(self.search("  ")), Artifact.objects.count())
+
+
+@skipUnless(connection.vendor == "postgresql", "The full text search needs PostgreSQL")
+class CatalogSearchRankingTests(CatalogSearchTests):
+    """
+    Checks the ranking and the typo tolerance of the PostgreSQL text search.
+    """
+
+    def test_words_are_matched_by_their_stem(self):
+        found = self.search("vasijas")
+        self.assertEqual(
+            set(found),
+            set(self.ids("Vasija con asa roja", "Figura de una vasija pequeña", "Vasijas decoradas")),
+        )
+
+    def test_results_are_ranked(self):
+        entries = search_catalog(CatalogEntry.objects.all(), "vasija roja")
+        ranks = [entry.rank for entry in entries]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+        self.assertEqual(entries[0].artifact_id, self.artifacts["Vasija con asa roja"].id)
+        self.assertEqual(self.search("vasija roja")[0], self.artifacts["Vasija con asa roja"].id)
+
+    def test_typos_fall_back_to_trigrams(self):
+        if not has_trigram_extension():
+            self.skipTest("The pg_trgm extension is not installed")
+        self.assertIn(self.artifacts["Fragmento de plato"].id, self.search("fragmnto"))
+
+
+class CatalogCursorPaginationTests(TestCase):
+    """
+    Checks the keyset pagination of the catalog and the numbered pages kept for
+    older clients.
+    """
+
+    def setUp(self):
+        catalog_responses.clear()
+        shape = Shape.objects.create(name="Vasija")
+        self.cultures = [Culture.objects.create(name=name) for name in ("Diaguita", "Inca")]
+        # Todas las piezas comparten la descripción, y las cuatro primeras la cultura
+        self.artifacts = []
+        for index in range(7):
+            self.artifacts.append(
+                Artifact.objects.create(
+                    description="Pieza", id_shape=shape, id_culture=self.cultures[index // 4]
+                )
+            )
+        self.ids = [artifact.id for artifact in self.artifacts]
+
+    def get_page(self, url="/api/catalog/artifacts/", params=None):
+        """
+        Returns a catalog page and the ids of its artifacts.
+        """
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data, [item["id"] for item in data["data"]]
+
+    def test_pages_follow_the_ids_forward_and_backward(self):
+        data, ids = self.get_page(params={"cursor": "", "page_size": 3})
+        self.assertIsNone(data["previous"])
+        self.assertNotIn("total", data)
+        pages = [ids]
+        while data["next"]:
+            data, ids = self.get_page(data["next"])
+            pages.append(ids)
+        self.assertEqual(pages, [self.ids[0:3], self.ids[3:6], self.ids[6:]])
+
+        data, ids = self.get_page(data["previous"])
+        self.assertEqual(ids, self.ids[3:6])
+        data, ids = self.get_page(data["previous"])
+        self.assertEqual(ids, self.ids[0:3])
+        self.assertIsNone(data["previous"])
+
+    def test_ties_on_the_sort_key_are_broken_by_id(self):
+        for ordering, expected in (
+            ("description", self.ids),
+            ("-description", self.ids[::-1]),
+            ("culture", self.ids),
+            ("-culture", self.ids[4:][::-1] + self.ids[:4][::-1]),
+        ):
+            data, ids = self.get_page(params={"cursor": "", "page_size": 2, "ordering": ordering})
+            pages = [ids]
+            while data["next"]:
+                data, ids = self.get_page(data["next"])
+                pages.append(ids)
+            self.assertEqual(sum(pages, []), expected, ordering)
+            self.assertTrue(all(len(page) == 2 for page in pages[:-1]), ordering)
+
+            # Hacia atrás se recorren las mismas páginas
+            backwards = [pages[-1]]
+            while data["previous"]:
+                data, ids = self.get_page(data["previous"])
+                backwards.append(ids)
+            self.assertEqual(backwards, pages[::-1], ordering)
+
+    def test_pages_do_not_shift_when_the_catalog_changes(self):
+        data, ids = self.get_page(params={"cursor": "", "page_size": 3})
+        # Borrar una pieza ya vista o agregar una nueva no corre las páginas siguientes
+        self.artifacts[0].delete()
+        new = Artifact.objects.create(description="Pieza", id_culture=self.cultures[0])
+        data, ids = self.get_page(data["next"])
+        self.assertEqual(ids, self.ids[3:6])
+        data, ids = self.get_page(data["next"])
+        self.assertEqual(ids, [self.ids[6], new.id])
+
+    def test_query_count_does_not_depend_on_the_depth(self):
+        data, _ = self.get_page(params={"cursor": "", "page_size": 2})
+        with CaptureQueriesContext(connection) as first:
+            self.get_page(params={"cursor": "", "page_size": 2, "ordering": "id"})
+        deep = self.get_page(self.get_page(data["next"])[0]["next"])[0]["next"]
+        with CaptureQueriesContext(connection) as last:
+            self.get_page(deep)
+        self.assertEqual(len(last), len(first))
+        self.assertTrue(all("OFFSET" not in query["sql"] for query in last))
+
+    def test_total_is_only_computed_when_requested(self):
+        data, _ = self.get_page(params={"cursor": "", "count": "exact"})
+        self.assertEqual(data["total"], 7)
+        data, _ = self.get_page(params={"cursor": "", "count": "estimate", "culture": "inca"})
+        self.assertEqual(data["total"], 3)
+
+    def test_numbered_pages_keep_their_format(self):
+        data, ids = self.get_page(params={"page": 2, "page_size": 3})
+        self.assertEqual(ids, self.ids[3:6])
+        self.assertEqual(
+            {key: data[key] for key in ("current_page", "total", "per_page", "total_pages")},
+            {"current_page": 2, "total": 7, "per_page": 3, "total_pages": 3},
+        )
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ("no-es-un-cursor", "cD1bMSwy"):
+            response = self.client.get("/api/catalog/artifacts/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class CatalogFieldsTests(TestCase):
+    """
+    Checks the page size and the sparse fieldsets of the catalog.
+    """
+
+    def setUp(self):
+        catalog_responses.clear()
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        tags = [Tag.objects.create(name="Asa")]
+        create_artifacts(12, shape, culture, tags)
+
+    def get_catalog(self, **params):
+        """
+        Returns the response of a catalog request.
+        """
+        return self.client.get("/api/catalog/artifacts/", params)
+
+    def test_page_size_is_chosen_by_the_client_up_to_a_cap(self):
+        self.assertEqual(len(self.get_catalog().json()["data"]), 9)
+        self.assertEqual(len(self.get_catalog(page_size=3).json()["data"]), 3)
+        self.assertEqual(len(self.get_catalog(page_size=3, cursor="").json()["data"]), 3)
+        # Los valores inválidos usan el tamaño por omisión
+        for page_size in ("0", "-2", "muchos"):
+            self.assertEqual(len(self.get_catalog(page_size=page_size).json()["data"]), 9)
+        with mock.patch.object(
+            CustomPageNumberPagination, "max_page_size", 5
+        ), mock.patch.object(CatalogCursorPagination, "max_page_size", 5):
+            data = self.get_catalog(page_size=1000).json()
+            self.assertEqual((len(data["data"]), data["per_page"]), (5, 5))
+            self.assertEqual(len(self.get_catalog(page_size=1000, cursor="").json()["data"]), 5)
+
+    def test_fields_select_the_output(self):
+        item = self.get_catalog(fields="id,thumbnail").json()["data"][0]
+        self.assertEqual(set(item), {"id", "thumbnail", "thumbnail_srcset"})
+        item = self.get_catalog(fields="tags, culture", cursor="").json()["data"][0]
+        self.assertEqual(set(item), {"id", "attributes"})
+        self.assertEqual(set(item["attributes"]), {"tags", "culture"})
+        item = self.get_catalog(fields="attributes").json()["data"][0]
+        self.assertEqual(set(item["attributes"]), {"shape", "tags", "culture", "description"})
+        self.assertEqual(set(self.get_catalog(fields="id").json()["data"][0]), {"id"})
+        every_field = self.get_catalog(fields="id,thumbnail,attributes").json()["data"][0]
+        self.assertEqual(every_field, self.get_catalog().json()["data"][0])
+
+    def test_fields_only_load_their_columns(self):
+        for params in ({"fields": "id"}, {"fields": "id", "cursor": "", "ordering": "culture"}):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.get_catalog(**params).status_code, 200)
+            entries = [
+                query["sql"] for query in queries if 'FROM "piezas_catalogentry"' in query["sql"]
+            ]
+            self.assertTrue(entries, params)
+            # Columnas de la consulta de la página
+            page_query = entries[-1].split(" FROM ")[0]
+            self.assertNotIn("tag_names", page_query, params)
+            self.assertNotIn('"description"', page_query, params)
+
+    def test_unknown_fields_are_rejected(self):
+        for fields in ("id,precio", "attributes,thumbnails"):
+            response = self.get_catalog(fields=fields)
+            self.assertEqual(response.status_code, 400, fields)
+            self.assertIn("fields", response.json())
+
+
+class CatalogBitmapIndexTests(TestCase):
+    """
+    Checks that the bitmap index filters and counts like the catalog queries.
+    """
+
+    def setUp(self):
+        # El índice es del proceso: se descarta lo que dejaron otras pruebas
+        catalog_index.version = None
+        self.shapes = [Shape.objects.create(name=name) for name in ("Vasija", "Plato")]
+        self.cultures = [Culture.objects.create(name=name) for name in ("Diaguita", "Inca")]
+        self.tags = [Tag.objects.create(name=name) for name in ("Asa", "Rojo", "Negro")]
+        self.artifacts = []
+        for index in range(12):
+            artifact = Artifact.objects.create(
+                description=f"Pieza {index}",
+                id_shape=self.shapes[index % 2],
+                id_culture=self.cultures[index % 3 % 2] if index % 4 else None,
+            )
+            artifact.id_tags.set(self.tags[tag] for tag in range(3) if index >> tag & 1)
+            self.artifacts.append(artifact)
+
+    def database_ids(self, culture=None, shape=None, tags=None):
+        """
+        Returns the ids of the entries matching a filter combination, queried.
+        """
+        queryset = CatalogEntry.objects.order_by("artifact_id")
+        if culture is not None:
+            queryset = queryset.filter(culture_name__iexact=culture.strip())
+        if shape is not None:
+            queryset = queryset.filter(shape_name__iexact=shape.strip())
+        if tags is not None:
+            queryset = filter_by_tags(queryset, parse_tag_groups(tags))
+        return list(queryset.values_list("artifact_id", flat=True)), queryset
+
+    def assertMatchesDatabase(self, index):
+        combinations = [
+            {},
+            {"culture": "Diaguita"},
+            {"culture": " inca "},
+            {"shape": "PLATO"},
+            {"culture": "Diaguita", "shape": "Vasija"},
+            {"tags": "Asa"},
+            {"tags": "asa|Rojo"},
+            {"tags": "Asa,Rojo"},
+            {"tags": "Asa|Negro,Rojo"},
+            {"culture": "Inca", "tags": "Rojo|Negro"},
+            {"culture": "Diaguita", "shape": "Plato", "tags": "Asa,Negro"},
+            {"culture": "Maya"},
+            {"tags": "Verde"},
+            {"tags": "Verde|Asa"},
+        ]
+        for params in combinations:
+            expected, queryset = self.database_ids(**params)
+            tags = params.get("tags", None)
+            ids = index.match(
+                culture=params.get("culture", None),
+                shape=params.get("shape", None),
+                tag_groups=parse_tag_groups(tags) if tags is not None else None,
+            )
+            self.assertEqual(ids.tolist(), expected, params)
+            self.assertEqual(index.facets(ids), compute_facets(queryset), params)
+
+    def test_filters_combine_like_the_database(self):
+        # Las etiquetas de un grupo se combinan con OR, y los grupos y campos con AND
+        index = CatalogBitmapIndex()
+        index.rebuild(get_catalog_version())
+        self.assertMatchesDatabase(index)
+        self.assertEqual(
+            index.match(tag_groups=[["Asa", "Rojo"], ["Negro"]]).tolist(),
+            [
+                artifact.id
+                for position, artifact in enumerate(self.artifacts)
+                if position & 3 and position & 4
+            ],
+        )
+
+    def test_facets_are_sorted_like_the_database(self):
+        # Los nombres que solo difieren en mayúsculas se cuentan juntos, y los empates
+        # se ordenan por nombre
+        self.artifacts[0].id_tags.add(Tag.objects.create(name="asa"))
+        self.artifacts[2].id_tags.add(Tag.objects.create(name="Azul"))
+        index = CatalogBitmapIndex()
+        index.rebuild(get_catalog_version())
+        _, queryset = self.database_ids()
+        facets = index.facets(index.match())
+        self.assertEqual(facets, compute_facets(queryset))
+        self.assertEqual(facets["tags"], ["Asa", "Rojo", "Negro", "Azul"])
+        self.assertEqual(facets["counts"]["tags"]["Asa"], 7)
+        self.assertEqual(facets["shapes"], ["Plato", "Vasija"])
+        self.assertEqual(index.match(tag_groups=[["ASA"]]).tolist(), [
+            artifact.id for position, artifact in enumerate(self.artifacts)
+            if position == 0 or position & 1
+        ])
+        self.assertMatchesDatabase(index)
+
+    def test_writes_update_the_index_like_the_database(self):
+        index = get_catalog_index()
+        # Las escrituras de este proceso se aplican sin reconstruir el índice
+        with mock.patch.object(CatalogBitmapIndex, "rebuild") as rebuild:
+            with own_transaction():
+                self.artifacts[1].id_culture = self.cultures[1]
+                self.artifacts[1].save()
+            with own_transaction():
+                self.artifacts[2].id_tags.set([self.tags[2]])
+            with own_transaction():
+                self.artifacts[3].delete()
+            with own_transaction():
+                create_artifacts(2, self.shapes[0], self.cultures[1], self.tags[1:])
+            with own_transaction():
+                self.tags[0].name = "Asa Doble"
+                self.tags[0].save()
+            self.assertIs(get_catalog_index(), index)
+            rebuild.assert_not_called()
+        self.assertEqual(index.version, get_catalog_version())
+        self.assertMatchesDatabase(index)
+        self.assertEqual(
+            index.match(tag_groups=[["asa doble"]]).tolist(),
+            self.database_ids(tags="Asa Doble")[0],
+        )
+
+    def test_writes_of_other_processes_are_read_from_the_change_log(self):
+        index = get_catalog_index()
+        # Sin ejecutar los callbacks de on_commit, las escrituras son de otro proceso
+        with own_transaction(apply=False):
+            self.artifacts[1].id_culture = self.cultures[1]
+            self.artifacts[1].save()
+        with own_transaction(apply=False):
+            self.artifacts[2].id_tags.set([self.tags[2]])
+            self.artifacts[3].delete()
+        with own_transaction(apply=False):
+            Image.objects.create(id_artifact=self.artifacts[4], path="images/nueva.jpg")
+        self.assertNotEqual(index.version, get_catalog_version())
+        with mock.patch.object(CatalogBitmapIndex, "rebuild") as rebuild:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertIs(get_catalog_index(), index)
+            rebuild.assert_not_called()
+        # La versión, el registro de cambios y las entradas de las piezas cambiadas
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(index.version, get_catalog_version())
+        self.assertMatchesDatabase(index)
+
+    def test_changes_missing_from_the_log_rebuild_the_index(self):
+        index = get_catalog_index()
+        CatalogEntry.objects.filter(culture_name="Inca").update(culture_name="Diaguita")
+        # Una reconstrucción del catálogo no registra las piezas cambiadas
+        bump_catalog_version()
+        with mock.patch.object(
+            CatalogBitmapIndex, "rebuild", wraps=index.rebuild
+        ) as rebuild:
+            get_catalog_index()
+        rebuild.assert_called_once()
+        self.assertMatchesDatabase(index)
+
+    def test_restored_versions_rebuild_the_index(self):
+        index = get_catalog_index()
+        # Una restauración repite la versión del índice con otra historia
+        restored_at = index.updated_at - datetime.timedelta(days=1)
+        CatalogState.objects.update(updated_at=restored_at)
+        CatalogChange.objects.filter(version=index.version).update(updated_at=restored_at)
+        CatalogEntry.objects.filter(culture_name="Inca").update(culture_name="Diaguita")
+        self.artifacts[1].save()
+        with mock.patch.object(
+            CatalogBitmapIndex, "rebuild", wraps=index.rebuild
+        ) as rebuild:
+            get_catalog_index()
+        rebuild.assert_called_once()
+        self.assertMatchesDatabase(index)
+
+    @override_settings(CATALOG_CHANGE_LOG_SIZE=3)
+    def test_change_log_keeps_the_last_versions(self):
+        with mock.patch("piezas.versions.CHANGE_LOG_PRUNE_INTERVAL", 1):
+            for _ in range(5):
+                version = bump_catalog_version(()).version
+        self.assertEqual(
+            sorted(CatalogChange.objects.values_list("version", flat=True)),
+            [version - 2, version - 1, version],
+        )
+
+    def test_endpoint_pages_match_the_database(self):
+        for params in ({"tags": "Asa|Negro,Rojo"}, {"culture": "inca", "ordering": "-id"}):
+            response = self.client.get("/api/catalog/artifacts/", {**params, "page_size": 50})
+            # Con cursor la página se consulta a la base de datos
+            cursor_response = self.client.get(
+                "/api/catalog/artifacts/", {**params, "page_size": 50, "cursor": ""}
+            )
+            self.assertEqual(
+                [item["id"] for item in response.json()["data"]],
+                [item["id"] for item in cursor_response.json()["data"]],
+                params,
+            )
+
+
+@override_settings(MEDIA_BASE_URL="https://media.example/")
+class CatalogExportTests(TestCase):
+    """
+    Checks the streamed export of the whole catalog.
+    """
+
+    url = "/api/catalog/artifacts/export"
+
+    def setUp(self):
+        shape = Shape.objects.create(name="Vasija")
+        culture = Culture.objects.create(name="Diaguita")
+        tags = [Tag.objects.create(name=name) for name in ("Asa", "Rojo")]
+        self.artifacts = create_artifacts(5, shape, culture, tags)
+        first, second, hidden, fourth, _ = self.artifacts
+        thumbnail = Thumbnail.objects.create(path="thumbnails/pieza.jpg")
+        first.id_thumbnail = thumbnail
+        first.id_model = Model.objects.create(
+            object="objects/pieza.obj",
+            material="materials/pieza.mtl",
+            texture="materials/pieza.jpg",
+        )
+        first.save()
+        # Las imágenes se crean intercaladas, para que su orden no sea el de las piezas
+        self.images = {artifact.id: [] for artifact in self.artifacts}
+        for index, artifact in enumerate([fourth, first, hidden, first, fourth, first]):
+            image = Image.objects.create(id_artifact=artifact, path=f"images/foto{index}.jpg")
+            self.images[artifact.id].append(image)
+        Image.objects.create(path="images/suelta.jpg")
+        # Una pieza sin entrada en el catálogo no se exporta, ni sus imágenes
+        CatalogEntry.objects.filter(artifact_id=hidden.id).delete()
+        self.exported = [first, second, fourth, self.artifacts[4]]
+
+        rng = np.random.default_rng(0)
+        self.thumbnail_descriptor, self.image_descriptor = rng.random(
+            (2, DESCRIPTOR_SIZE), dtype=np.float32
+        )
+        Thumbnail.objects.filter(id=thumbnail.id).update(
+            descriptor_bytes=pack_descriptor(self.thumbnail_descriptor)
+        )
+        first_images = self.images[first.id]
+        Image.objects.filter(id=first_images[0].id).update(
+            descriptor_bytes=pack_descriptor(self.image_descriptor)
+        )
+        # Los descriptores de versiones anteriores se guardaban como texto JSON
+        Image.objects.filter(id=first_images[1].id).update(
+            descriptor_bytes=None, descriptor=json.dumps([0.5] * DESCRIPTOR_SIZE)
+        )
+        Image.objects.filter(id=first_images[2].id).update(
+            descriptor_bytes=None, descriptor="[0.5, "
+        )
+
+    def image_urls(self, artifact):
+        """
+        Returns the expected URLs of the images of an artifact, in export order.
+        """
+        return [f"https://media.example/{image.path.name}" for image in self.images[artifact.id]]
+
+    def get_export(self, **params):
+        """
+        Requests the export and returns the response and its streamed content.
+        """
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b"".join(response.streaming_content).decode("utf-8")
+
+    def test_ndjson_lists_every_artifact_with_its_images(self):
+        response, content = self.get_export()
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [artifact.id for artifact in self.exported])
+        for row, artifact in zip(rows, self.exported):
+            self.assertEqual(row["images"], self.image_urls(artifact), artifact.id)
+            self.assertNotIn("descriptors", row)
+        self.assertEqual(rows[0]["thumbnail"], "https://media.example/thumbnails/pieza.jpg")
+        self.assertEqual(rows[0]["model"]["object"], "https://media.example/objects/pieza.obj")
+        self.assertEqual([tag["value"] for tag in rows[1]["attributes"]["tags"]], ["Asa", "Rojo"])
+        self.assertIsNone(rows[1]["thumbnail"])
+        self.assertIsNone(rows[1]["model"])
+
+    def test_csv_has_one_row_per_artifact(self):
+        response, content = self.get_export(output="csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        header, *rows = csv.reader(io.StringIO(content))
+        self.assertEqual(header, CSV_COLUMNS[:-2])
+        self.assertEqual([int(row[0]) for row in rows], [artifact.id for artifact in self.exported])
+        for row, artifact in zip(rows, self.exported):
+            self.assertEqual(row[header.index("images")], "|".join(self.image_urls(artifact)))
+        self.assertEqual(rows[1][header.index("tags")], "Asa|Rojo")
+        self.assertEqual(rows[1][header.index("thumbnail")], "")
+
+        _, content = self.get_export(output="csv", descriptors="true")
+        header, *rows = csv.reader(io.StringIO(content))
+        self.assertEqual(header, CSV_COLUMNS)
+        self.assertEqual(len(rows), len(self.exported))
+        self.assertEqual(json.loads(rows[1][header.index("image_descriptors")]), [])
+        self.assertIsNone(json.loads(rows[1][header.index("thumbnail_descriptor")]))
+
+    def test_descriptors_are_decoded(self):
+        for flag in ("true", "1"):
+            _, content = self.get_export(descriptors=flag)
+            rows = [json.loads(line) for line in content.splitlines()]
+            descriptors = rows[0]["descriptors"]
+            self.assertEqual(descriptors["thumbnail"], self.thumbnail_descriptor.tolist(), flag)
+            self.assertEqual(
+                descriptors["images"],
+                [self.image_descriptor.tolist(), [0.5] * DESCRIPTOR_SIZE, None],
+                flag,
+            )
+            # La pieza sin miniatura ni imágenes
+            self.assertEqual(rows[1]["descriptors"], {"thumbnail": None, "images": []}, flag)
+
+    def test_images_are_merged_across_chunks(self):
+        request = APIRequestFactory().get(self.url)
+        rows = list(export_rows(request, descriptors=True, chunk_size=1))
+        self.assertEqual(rows, list(export_rows(request, descriptors=True)))
+        self.assertEqual([row["id"] for row in rows], [artifact.id for artifact in self.exported])
+        self.assertEqual(rows[2]["images"], self.image_urls(self.exported[2]))
+
+    def test_invalid_outputs_are_rejected(self):
+        for output in ("xml", "", "NDJSON"):
+            response = self.client.get(self.url, {"output": output})
+            self.assertEqual(response.status_code, 400, output)
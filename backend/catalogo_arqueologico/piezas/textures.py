@@ -0,0 +1,138 @@
+"""
+This module generates the downscaled variants of the textures of the 3D models.
+
+Photogrammetry textures are often 4K to 8K JPEGs, the largest download of a detail
+page. When a model is saved, its texture is resized so its longest side is every
+size of TEXTURE_SIZES smaller than its own, and each variant gets a copy of the MTL
+file whose diffuse map references it, so the viewer loads a tier by picking its
+MTL. Variants are stored next to the originals ('materials/pieza.jpg' gives
+'materials/pieza.1024px.jpg' and 'materials/pieza.1024px.mtl') and listed in the
+'textures' field of the model.
+
+Functions:
+- rewrite_material: Points the diffuse maps of an MTL file to another texture.
+- create_textures: Creates the texture variants of a model and returns their description.
+- delete_textures: Deletes the files of a list of texture variants.
+"""
+
+import logging
+import os
+import cv2
+from django.conf import settings
+from django.core.files.base import ContentFile
+from .meshes import relative_uri
+
+logger = logging.getLogger(__name__)
+
+
+def variant_name(name, size):
+    """
+    Returns the storage name of a variant of a texture or material file.
+
+    Args:
+        name (str): The storage name of the original file.
+        size (int): The longest side of the texture of the variant.
+
+    Returns:
+        str: The storage name of the variant.
+    """
+    root, extension = os.path.splitext(name)
+    return f"{root}.{size}px{extension}"
+
+
+def rewrite_material(data, texture_uri):
+    """
+    Points the diffuse maps (map_Kd) of an MTL file to another texture.
+
+    Options of the statements are kept; only the file name, its last token, is
+    replaced.
+
+    Args:
+        data (bytes): The MTL file.
+        texture_uri (str): URI of the texture, relative to the MTL file.
+
+    Returns:
+        bytes: The rewritten MTL file.
+    """
+    lines = []
+    for line in data.decode("utf-8", "ignore").splitlines():
+        tokens = line.split()
+        if len(tokens) >= 2 and tokens[0] == "map_Kd":
+            line = " ".join(tokens[:-1] + [texture_uri])
+        lines.append(line)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _save(storage, name, data):
+    """
+    Saves a file, replacing the one with the same name.
+    """
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(data))
+
+
+def create_textures(model):
+    """
+    Creates the downscaled texture variants of a model.
+
+    Sizes that are not smaller than the longest side of the texture are skipped, so
+    small textures get no variants and are served as they are.
+
+    Args:
+        model (Model): The model, with its texture and material saved.
+
+    Returns:
+        list: The variants, ordered from the smallest, each with the longest side of
+            its texture and the storage names of its texture and material.
+    """
+    image = cv2.imread(model.texture.path)
+    if image is None:
+        logger.warning(f"Could not read {model.texture.name}")
+        return []
+    with model.material.open("rb") as file:
+        material = file.read()
+
+    storage = model.texture.storage
+    height, width = image.shape[:2]
+    textures = []
+    for size in sorted(set(settings.TEXTURE_SIZES)):
+        scale = size / max(height, width)
+        if scale >= 1:
+            break
+        resized = cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+        encoded, data = cv2.imencode(
+            ".jpg",
+            resized,
+            [cv2.IMWRITE_JPEG_QUALITY, settings.TEXTURE_QUALITY, cv2.IMWRITE_JPEG_PROGRESSIVE, 1],
+        )
+        if not encoded:
+            logger.warning(f"Could not encode the {size}px texture of {model.texture.name}")
+            continue
+        texture_root = os.path.splitext(model.texture.name)[0]
+        texture = _save(storage, variant_name(texture_root + ".jpg", size), data.tobytes())
+        material_name = variant_name(model.material.name, size)
+        material_name = _save(
+            model.material.storage,
+            material_name,
+            rewrite_material(material, relative_uri(texture, material_name)),
+        )
+        textures.append({"size": size, "texture": texture, "material": material_name})
+    return textures
+
+
+def delete_textures(model, textures):
+    """
+    Deletes the files of a list of texture variants.
+
+    Args:
+        model (Model): The model the variants belong to.
+        textures (list): The variants, as returned by create_textures.
+    """
+    for variant in textures or []:
+        model.texture.storage.delete(variant["texture"])
+        model.material.storage.delete(variant["material"])
@@ -33,6 +33,10 @@ urlpatterns = [
     path('account/',include('django.contrib.auth.urls')), 
     path("docs/", include_docs_urls(title="Metadata API")),
     path("artifacts/", views.CatalogAPIView.as_view()),
+    path("artifacts/cache/stats", views.CatalogCacheStatsAPIView.as_view()),
+    path("artifacts/export", views.CatalogExportAPIView.as_view()),
+    path("artifacts/batch", views.ArtifactBatchAPIView.as_view()),
+    path("autocomplete/", views.AutocompleteAPIView.as_view()),
     path("artifact/upload", views.ArtifactCreateUpdateAPIView.as_view()),
     path("artifact/bulkloading", views.BulkLoadingAPIView.as_view()),
     path("artifact/<int:pk>/", views.ArtifactDetailAPIView.as_view()),
@@ -0,0 +1,157 @@
+"""
+This module holds the versions of the catalog and of the photo descriptors.
+
+The versions live in the single CatalogState row. The catalog version is bumped by
+every write that changes what the public read endpoints return, so the caches of
+piezas.catalog_cache and the bitmap and autocomplete indexes of piezas.indexes are
+keyed on it. The descriptor version is only bumped by the writes that change the
+photo descriptors of some artifact, and keys the descriptor index. The artifacts
+whose catalog entries changed in each catalog version are logged (see
+CatalogChange), so the other processes catch up with them.
+
+Functions:
+- get_catalog_state: Returns the row holding the versions of the catalog.
+- get_catalog_version: Returns the current version of the catalog.
+- bump_catalog_version: Increments the version of the catalog.
+- record_catalog_change: Records the artifacts whose entries changed in a catalog version.
+- get_catalog_changes: Returns the artifacts whose entries changed between two versions.
+- bump_descriptor_version: Increments the version of the photo descriptors.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import CatalogChange, CatalogState
+
+CATALOG_STATE_ID = 1
+# Cada cuántas versiones se borran las más viejas del registro de cambios
+CHANGE_LOG_PRUNE_INTERVAL = 100
+
+
+def get_catalog_state():
+    """
+    Returns the row holding the versions of the catalog, creating it if needed.
+
+    Returns:
+        CatalogState: The state of the catalog.
+    """
+    state, _ = CatalogState.objects.get_or_create(id=CATALOG_STATE_ID)
+    return state
+
+
+def get_catalog_version():
+    """
+    Returns the current version of the catalog.
+
+    Returns:
+        int: The version of the catalog.
+    """
+    return get_catalog_state().version
+
+
+def bump_catalog_version(artifact_ids=None):
+    """
+    Increments the version of the catalog, invalidating everything cached for the
+    previous version.
+
+    The catalog state row is locked until the end of the transaction, so concurrent
+    writers get consecutive versions. The artifacts whose catalog entries changed
+    are recorded in the change log (see CatalogChange) in the same transaction.
+
+    Args:
+        artifact_ids (iterable): Ids of the artifacts whose catalog entries changed,
+            empty if none did. None if the change is not known, so the other
+            processes rebuild their bitmap index.
+
+    Returns:
+        CatalogState: The state of the catalog after the change.
+    """
+    with transaction.atomic():
+        state, _ = CatalogState.objects.select_for_update().get_or_create(
+            id=CATALOG_STATE_ID
+        )
+        state.version = F("version") + 1
+        state.save(update_fields=["version", "updated_at"])
+        state.refresh_from_db(fields=["version"])
+        record_catalog_change(state, artifact_ids)
+        # Se borran las versiones viejas del registro de a muchas a la vez
+        if state.version % CHANGE_LOG_PRUNE_INTERVAL == 0:
+            CatalogChange.objects.filter(
+                version__lte=state.version - settings.CATALOG_CHANGE_LOG_SIZE
+            ).delete()
+    return state
+
+
+def record_catalog_change(state, artifact_ids):
+    """
+    Records the artifacts whose catalog entries changed in a catalog version in the
+    change log, replacing what was recorded for it.
+
+    Args:
+        state (CatalogState): The state of the catalog at that version.
+        artifact_ids (iterable): Ids of the artifacts whose catalog entries changed,
+            None if the change is not known.
+    """
+    CatalogChange.objects.update_or_create(
+        version=state.version,
+        defaults={
+            "updated_at": state.updated_at,
+            "artifact_ids": sorted(artifact_ids) if artifact_ids is not None else None,
+        },
+    )
+
+
+def get_catalog_changes(previous_version, previous_updated_at, version):
+    """
+    Returns the artifacts whose catalog entries changed between two versions.
+
+    The change log must hold the previous version with the same date, so the
+    versions of a database restored to an earlier state, which repeat, are not
+    taken for the ones they replaced.
+
+    Args:
+        previous_version (int): The catalog version the changes start from.
+        previous_updated_at (datetime): The date of the previous version.
+        version (int): The catalog version the changes end at.
+
+    Returns:
+        set: The ids of the changed artifacts, None if the change log does not
+            describe every version in between.
+    """
+    if version <= previous_version or previous_updated_at is None:
+        return None
+    changes = list(
+        CatalogChange.objects.filter(
+            version__gte=previous_version, version__lte=version
+        ).order_by("version").values_list("updated_at", "artifact_ids")
+    )
+    if len(changes) != version - previous_version + 1:
+        return None
+    if changes[0][0] != previous_updated_at:
+        return None
+    if any(artifact_ids is None for _, artifact_ids in changes[1:]):
+        return None
+    return set().union(*(artifact_ids for _, artifact_ids in changes[1:]))
+
+
+def bump_descriptor_version():
+    """
+    Increments the version of the photo descriptors, so the other processes reload
+    their descriptor index.
+
+    As bump_catalog_version, the catalog state row is locked until the end of the
+    transaction, so concurrent writers get consecutive versions.
+
+    Returns:
+        int: The new version of the photo descriptors.
+    """
+    with transaction.atomic():
+        state, _ = CatalogState.objects.select_for_update().get_or_create(
+            id=CATALOG_STATE_ID
+        )
+        state.descriptor_version = F("descriptor_version") + 1
+        state.descriptors_updated_at = timezone.now()
+        state.save(update_fields=["descriptor_version", "descriptors_updated_at"])
+        state.refresh_from_db(fields=["descriptor_version"])
+    return state.descriptor_version
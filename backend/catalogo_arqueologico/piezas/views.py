@@ -4,9 +4,14 @@ and Artifact Downloads in the application.
 
 Classes:
 - ArtifactDetailAPIView: Provides a detail view for a single artifact. 
+- ArtifactBatchAPIView: Provides the details of several artifacts in one request.
 - MetadataListAPIView: Provides a list view for metadata related to artifacts. 
 - CustomPageNumberPagination: Provides paginated responses for API views.
+- CatalogCursorPagination: Provides keyset (cursor) paginated responses for the catalog.
 - CatalogAPIView: Provides a list view for artifacts in the catalog.
+- CatalogCacheStatsAPIView: Provides the counters of the catalog response cache.
+- CatalogExportAPIView: Streams the whole catalog as NDJSON or CSV.
+- AutocompleteAPIView: Provides suggestions for the search box and the filter pickers.
 - ArtifactCreateUpdateAPIView: Provides functionality for creating and updating artifacts.
 - InstitutionAPIView: Provides a list view for institutions.
 """
@@ -17,9 +22,7 @@ import pandas as pd
 import time
 import threading
 import numpy as np
-import cv2
 from scipy.spatial import distance
-from ast import literal_eval
 import json
 import re
 import shutil
@@ -27,20 +30,24 @@ from io import BytesIO
 import logging
 import os
 from rest_framework import permissions, generics, status
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.db import transaction
 from rest_framework.views import APIView
 from django.db.models import Q
 from django.core.files import File
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.conf import settings
 from django.core.mail import send_mail
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from .serializers import (
     ArtifactSerializer,
     CatalogSerializer,
+    CatalogEntrySerializer,
     UpdateArtifactSerializer,
     InstitutionSerializer,
     ShapeSerializer,
@@ -48,7 +55,6 @@ from .serializers import (
     CultureSerializer,
     BulkDownloadingRequestSerializer,
     BulkDownloadingRequestRequestSerializer,
-    DescriptorArtifactSerializer
 )
 from .models import (
     Artifact,
@@ -62,7 +68,34 @@ from .models import (
     Thumbnail,
     BulkDownloadingRequest,
     Request,
+    CatalogEntry,
 )
+from .descriptors import compute_descriptor
+from .autocomplete import KINDS as AUTOCOMPLETE_KINDS
+from .catalog import (
+    catalog_order_by,
+    catalog_seek,
+    compute_facets,
+    estimate_count,
+    filter_by_tags,
+    parse_catalog_ordering,
+    parse_tag_groups,
+    touch_artifacts,
+    touch_descriptors,
+)
+from .catalog_cache import (
+    artifact_details,
+    catalog_etag,
+    catalog_last_modified,
+    catalog_response_key,
+    catalog_responses,
+    catalog_state_for_request,
+    get_artifact_detail,
+    get_facets,
+)
+from .indexes import get_autocomplete_index, get_catalog_index, get_descriptor_index
+from .export import export_csv, export_ndjson
+from .search import search_catalog
 from .permissions import IsFuncionarioPermission, IsAdminPermission
 from .authentication import TokenAuthentication
 from django.contrib.auth.forms import PasswordResetForm
@@ -72,26 +105,161 @@ from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 logger = logging.getLogger(__name__)
 from django.utils.encoding import force_bytes
 from django.contrib.auth import get_user_model
+
+# Respuestas condicionales (ETag / Last-Modified) según la versión del catálogo
+catalog_condition = condition(
+    etag_func=catalog_etag, last_modified_func=catalog_last_modified
+)
+
+
+@method_decorator(catalog_condition, name="get")
 class ArtifactDetailAPIView(generics.RetrieveAPIView):
     """
     A view that provides detail for a single artifact.
 
-    It extends Django REST Framework's RetrieveAPIView.
+    It extends Django REST Framework's RetrieveAPIView. Details are cached in
+    process per artifact version (see piezas.catalog_cache.get_artifact_detail).
 
     Attributes:
         queryset: Specifies the queryset that this view will use to retrieve
-            the Artifact object. It retrieves all Artifact objects.
+            the Artifact object. It retrieves all Artifact objects with every
+            relation the serializer reads, so a detail runs a fixed number of
+            queries (see ArtifactSerializer.setup_eager_loading).
         serializer_class: Specifies the serializer class that should be used
             for serializing the Artifact object.
         permission_classes: Defines the list of permissions that apply to
             this view. It is set to allow any user to access this view.
     """
 
-    queryset = Artifact.objects.all()
+    queryset = ArtifactSerializer.setup_eager_loading(Artifact.objects.all())
     serializer_class = ArtifactSerializer
     permission_classes = [permissions.AllowAny]
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieves the detail of the artifact, from the cache when it is up to date.
+
+        Args:
+            request: The HTTP request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments.
+
+        Returns:
+            Response: Django REST Framework's Response object containing the
+                serialized artifact.
+
+        Raises:
+            Http404: If the artifact does not exist.
+        """
+        data = get_artifact_detail(
+            request,
+            kwargs[self.lookup_field],
+            lambda: self.get_serializer(self.get_object()).data,
+        )
+        return Response(data)
+
+
+@method_decorator(catalog_condition, name="get")
+class ArtifactBatchAPIView(APIView):
+    """
+    A view that provides the details of several artifacts in one request, for the
+    screens that select many artifacts at once.
+
+    The ids are given as a comma separated 'ids' query parameter on GET, or as an
+    'ids' list in the body of a POST when they do not fit in a URL. Every detail
+    has the format of ArtifactDetailAPIView, and all of them are loaded in a fixed
+    number of queries (see ArtifactSerializer.setup_eager_loading).
+
+    Attributes:
+        permission_classes: Defines the list of permissions that apply to
+            this view. It is set to allow any user to access this view.
+        max_ids: Specifies the maximum number of ids per request.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    max_ids = settings.ARTIFACT_BATCH_MAX_IDS
+
+    def parse_ids(self, ids):
+        """
+        Parses the requested ids, keeping the first occurrence of repeated ones.
+
+        Args:
+            ids: The ids, as a comma separated string or a list.
+
+        Returns:
+            list: The ids as integers, in request order.
 
+        Raises:
+            ValidationError: If an id is not an integer or there are too many ids.
+        """
+        if ids is None:
+            raise ValidationError({"ids": "Debe indicar los ids de las piezas"})
+        if isinstance(ids, str):
+            ids = [artifact_id for artifact_id in ids.split(",") if artifact_id.strip()]
+        if not isinstance(ids, list):
+            raise ValidationError({"ids": "Los ids deben ser una lista"})
+        try:
+            ids = list(dict.fromkeys(int(artifact_id) for artifact_id in ids))
+        except (TypeError, ValueError):
+            raise ValidationError({"ids": "Los ids deben ser números enteros"})
+        if len(ids) > self.max_ids:
+            raise ValidationError({"ids": f"Se pueden pedir hasta {self.max_ids} piezas"})
+        return ids
+
+    def get_details(self, request, ids):
+        """
+        Retrieves the details of the requested artifacts.
+
+        Args:
+            request: The HTTP request object.
+            ids (list): The ids of the artifacts, in request order.
+
+        Returns:
+            Response: Django REST Framework's Response object containing the
+                details in request order and the ids that do not exist.
+        """
+        artifacts = ArtifactSerializer.setup_eager_loading(
+            Artifact.objects.all()
+        ).in_bulk(ids)
+        found = [artifacts[artifact_id] for artifact_id in ids if artifact_id in artifacts]
+        missing = [artifact_id for artifact_id in ids if artifact_id not in artifacts]
+        serializer = ArtifactSerializer(found, many=True, context={"request": request})
+        return Response(
+            {"data": serializer.data, "missing": missing}, status=status.HTTP_200_OK
+        )
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles GET requests.
+
+        Args:
+            request: The HTTP request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments.
+
+        Returns:
+            Response: The details of the artifacts of the 'ids' query parameter.
+        """
+        ids = self.parse_ids(request.query_params.get("ids", None))
+        return self.get_details(request, ids)
+
+    def post(self, request, *args, **kwargs):
+        """
+        Handles POST requests.
+
+        Args:
+            request: The HTTP request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments.
+
+        Returns:
+            Response: The details of the artifacts of the 'ids' list of the body.
+        """
+        ids = self.parse_ids(request.data.get("ids", None))
+        return self.get_details(request, ids)
+
+
+@method_decorator(catalog_condition, name="get")
 class MetadataListAPIView(generics.ListAPIView):
     """
     A view that provides a list of metadata related to artifacts.
@@ -152,10 +320,16 @@ class CustomPageNumberPagination(PageNumberPagination):
     It extends Django REST Framework's PageNumberPagination.
 
     Attributes:
-        page_size: Specifies the number of items to display per page.
+        page_size: Specifies the default number of items to display per page.
+        page_size_query_param: Specifies the query parameter that selects the
+            number of items per page.
+        max_page_size: Specifies the maximum number of items per page a client
+            can request.
     """
 
     page_size = 9
+    page_size_query_param = "page_size"
+    max_page_size = settings.CATALOG_MAX_PAGE_SIZE
 
     def get_paginated_response(self, data):
         """
@@ -171,40 +345,253 @@ class CustomPageNumberPagination(PageNumberPagination):
             {
                 "current_page": int(self.request.query_params.get("page", 1)),
                 "total": self.page.paginator.count,
-                "per_page": self.page_size,
-                "total_pages": math.ceil(self.page.paginator.count / self.page_size),
+                "per_page": self.page.paginator.per_page,
+                "total_pages": math.ceil(
+                    self.page.paginator.count / self.page.paginator.per_page
+                ),
                 "data": data,
             }
         )
 
 
+class CatalogCursorPagination(CursorPagination):
+    """
+    A keyset pagination class for the catalog.
+
+    It extends Django REST Framework's CursorPagination. Each page seeks past the
+    position of the last artifact of the previous one through an opaque cursor,
+    so its cost does not grow with the depth of the page and no COUNT(*) is needed.
+
+    The position is the sort key of the view (see CatalogAPIView.get_ordering)
+    with the value and the artifact id of the entry, which together are unique,
+    so pages of entries sharing a value need no offset.
+
+    The total is only included when requested with the 'count' query parameter:
+    'estimate' uses the database planner estimate and 'exact' counts the rows.
+
+    Attributes:
+        page_size: Specifies the default number of items to display per page.
+        page_size_query_param: Specifies the query parameter that selects the
+            number of items per page.
+        max_page_size: Specifies the maximum number of items per page a client
+            can request.
+        ordering: Specifies the default sort key, column and direction.
+    """
+
+    page_size = 9
+    page_size_query_param = "page_size"
+    max_page_size = settings.CATALOG_MAX_PAGE_SIZE
+    ordering = ("id", "artifact_id", False)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginates the queryset, computing the total if it was requested.
+
+        Args:
+            queryset: The queryset to paginate.
+            request: The HTTP request object.
+            view: The view that is paginating.
+
+        Returns:
+            list: The items of the requested page.
+        """
+        count = request.query_params.get("count", None)
+        self.total = None
+        if count == "estimate":
+            self.total = estimate_count(queryset)
+        elif count == "exact":
+            self.total = queryset.count()
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        _, column, descending = self.ordering
+
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor is not None else False
+        current_position = self.cursor.position if self.cursor is not None else None
+
+        queryset = queryset.order_by(*catalog_order_by(column, descending != reverse))
+        if current_position is not None:
+            value, artifact_id = self.decode_position(current_position)
+            queryset = queryset.filter(
+                catalog_seek(column, descending != reverse, value, artifact_id)
+            )
+
+        # Se pide una entrada extra para saber si hay una página siguiente
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Retrieves the sort order of the catalog.
+
+        Args:
+            request: The HTTP request object.
+            queryset: The queryset to paginate.
+            view: The view that is paginating.
+
+        Returns:
+            tuple: The sort key, the column to sort by and whether the order is
+                descending.
+        """
+        if view is None:
+            return self.ordering
+        return view.get_ordering()
+
+    def _get_position_from_instance(self, instance, ordering):
+        """
+        Computes the position of a catalog entry in a sort order.
+
+        Args:
+            instance: The catalog entry.
+            ordering: The sort order, as returned by get_ordering.
+
+        Returns:
+            str: The sort key, the value and the artifact id of the entry, as JSON.
+        """
+        key, column, _ = ordering
+        value = getattr(instance, column)
+        if value is not None and column != "artifact_id":
+            value = str(value)
+        return json.dumps([key, value, instance.artifact_id])
+
+    def decode_position(self, position):
+        """
+        Decodes the position of a cursor.
+
+        Args:
+            position (str): The position, as computed by _get_position_from_instance.
+
+        Returns:
+            tuple: The value and the artifact id of the position.
+
+        Raises:
+            NotFound: If the position is malformed or belongs to another sort key.
+        """
+        try:
+            key, value, artifact_id = json.loads(position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if key != self.ordering[0] or not isinstance(artifact_id, int):
+            raise NotFound(self.invalid_cursor_message)
+        return value, artifact_id
+
+    def get_paginated_response(self, data):
+        """
+        Retrieves paginated response data.
+
+        Args:
+            data: The data to be paginated.
+
+        Returns:
+            Response: Django REST Framework's Response object containing paginated data.
+        """
+        response = {
+            "per_page": self.page_size,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "data": data,
+        }
+        if self.total is not None:
+            response["total"] = self.total
+        return Response(response)
+
+
+@method_decorator(catalog_condition, name="get")
 class CatalogAPIView(generics.ListAPIView):
     """
     A view that provides a list of artifacts in the catalog.
 
-    It extends Django REST Framework's ListAPIView.
+    It extends Django REST Framework's ListAPIView. It reads only from the
+    denormalized catalog entries, so a page does not query the related tables.
+
+    Pages are numbered by default. When the 'cursor' query parameter is present
+    (empty for the first page) the catalog is paginated with CatalogCursorPagination
+    instead, for infinite scrolling.
+
+    Tags are given as comma separated groups combined with AND, and names inside
+    a group are separated by '|' and combined with OR. Numbered pages without a
+    text search are answered by the in-process bitmap index, which computes the
+    matching artifact ids and facets without querying the database; only the
+    entries of the requested page are then loaded.
+
+    The 'page_size' query parameter selects the number of artifacts per page, up
+    to CATALOG_MAX_PAGE_SIZE, and the 'fields' query parameter restricts each
+    artifact to a comma separated list of fields (see CatalogEntrySerializer),
+    loading only the columns they need.
+
+    The 'ordering' query parameter sorts the catalog by one of the keys of
+    piezas.catalog.CATALOG_ORDERINGS ('id', 'culture', 'shape', 'description' or
+    'updated'), prefixed with '-' for descending order. Every key is served by an
+    index and works with both paginations. An explicit ordering also replaces the
+    relevance order of a text search.
+
+    Responses carry an ETag and a Last-Modified date derived from the catalog
+    version, and conditional requests for an unchanged catalog get a 304. The
+    response data is also cached in process per catalog version and normalized
+    filters (see piezas.catalog_cache.catalog_response_key).
 
     Attributes:
         serializer_class: Specifies the serializer class that should be used
-            for serializing the Artifact objects.
+            for serializing the catalog entries.
         pagination_class: Specifies the pagination class that should be used
             for paginating the response data.
         permission_classes: Defines the list of permissions that apply to
             this view. It is set to allow any user to access this view.
     """
 
-    serializer_class = CatalogSerializer
+    serializer_class = CatalogEntrySerializer
     pagination_class = CustomPageNumberPagination
     permission_classes = [permissions.AllowAny]
 
+    @property
+    def paginator(self):
+        """
+        Retrieves the paginator for the request.
+
+        Returns:
+            The cursor paginator if the request has a 'cursor' parameter, the
+            page number paginator otherwise.
+        """
+        if not hasattr(self, "_paginator"):
+            if "cursor" in self.request.query_params:
+                self._paginator = CatalogCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
         """
         Retrieves the queryset for the view.
 
         Returns:
-            queryset: The queryset containing all artifacts in the catalog.
+            queryset: The queryset containing the catalog entries of all artifacts.
         """
-        queryset = Artifact.objects.all().order_by("id")
+        _, column, descending = self.get_ordering()
+        queryset = CatalogEntry.objects.all().order_by(
+            *catalog_order_by(column, descending)
+        )
 
         # Filtros a partir de parámetros de consulta (query parameters)
         description = self.request.query_params.get("query", None)
@@ -214,35 +601,168 @@ class CatalogAPIView(generics.ListAPIView):
 
         q_objects = Q()
 
-        # Case insensitive search
-        if description is not None:
-            q_objects &= Q(description__icontains=description) | Q(id__icontains=description)
         if culture is not None:
-            q_objects &= Q(id_culture__name__iexact=culture)
+            q_objects &= Q(culture_name__iexact=culture.strip())
         if shape is not None:
-            q_objects &= Q(id_shape__name__iexact=shape)
-        if tags is not None:
-            for tag in tags.split(","):
-                q_objects &= Q(id_tags__name__iexact=tag.strip())
+            q_objects &= Q(shape_name__iexact=shape.strip())
 
         # Filtramos el queryset con los q_objects
         filtered_queryset = queryset.filter(q_objects)
+        # Búsqueda de texto completo, o por id si la consulta es numérica
+        if description is not None:
+            filtered_queryset = search_catalog(filtered_queryset, description)
+            if "ordering" in self.request.query_params:
+                filtered_queryset = filtered_queryset.order_by(
+                    *catalog_order_by(column, descending)
+                )
+        if tags is not None:
+            filtered_queryset = filter_by_tags(filtered_queryset, parse_tag_groups(tags))
         return filtered_queryset
 
     def get_available_filters(self, filtered_queryset):
         """
-        Obtiene las culturas, formas y etiquetas disponibles en el queryset filtrado.
+        Obtiene las culturas, formas y etiquetas disponibles en el queryset filtrado,
+        junto con la cantidad de piezas de cada una.
         """
-        available_cultures = Artifact.objects.filter(id__in=filtered_queryset).values_list('id_culture__name', flat=True).distinct()
-        available_shapes = Artifact.objects.filter(id__in=filtered_queryset).values_list('id_shape__name', flat=True).distinct()
-        available_tags = Artifact.objects.filter(id__in=filtered_queryset).values_list('id_tags__name', flat=True).distinct()
+        # La versión se leyó al comenzar la consulta, antes que las entradas
+        version = catalog_state_for_request(self.request).version
+        return get_facets(
+            self.request.query_params, version, lambda: compute_facets(filtered_queryset)
+        )
 
-        available_filters = {
-            "cultures": list(available_cultures),
-            "shapes": list(available_shapes),
-            "tags": list(available_tags),
-        }
-        return available_filters
+    def get_ordering(self):
+        """
+        Retrieves the sort order requested with the 'ordering' query parameter.
+
+        Returns:
+            tuple: The sort key, the column to sort by and whether the order is
+                descending.
+
+        Raises:
+            ValidationError: If the sort key is unknown.
+        """
+        ordering = self.request.query_params.get("ordering", None)
+        parsed = parse_catalog_ordering(ordering)
+        if parsed is None:
+            raise ValidationError({"ordering": f"Orden desconocido: {ordering}"})
+        return parsed
+
+    def get_requested_fields(self):
+        """
+        Retrieves the fields of the artifacts requested with the 'fields' query
+        parameter. The name 'attributes' selects every attribute.
+
+        Returns:
+            set: The names of the requested fields, None if every field is requested.
+
+        Raises:
+            ValidationError: If a requested field does not exist.
+        """
+        fields = self.request.query_params.get("fields", None)
+        if fields is None:
+            return None
+        requested = set()
+        for field in fields.split(","):
+            field = field.strip()
+            if field == "attributes":
+                requested.update(CatalogEntrySerializer.ATTRIBUTES)
+            elif field in CatalogEntrySerializer.FIELDS:
+                requested.add(field)
+            elif field:
+                raise ValidationError({"fields": f"Campo desconocido: {field}"})
+        return requested
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Retrieves the serializer for the catalog entries, restricted to the
+        requested fields.
+
+        Returns:
+            CatalogEntrySerializer: The serializer.
+        """
+        kwargs.setdefault("fields", self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def uses_bitmap_index(self):
+        """
+        Checks whether the request can be answered by the bitmap index.
+
+        Returns:
+            bool: True for numbered pages sorted by id without a text search, False
+                otherwise.
+        """
+        query_params = self.request.query_params
+        _, column, _ = self.get_ordering()
+        return (
+            "query" not in query_params
+            and "cursor" not in query_params
+            and column == "artifact_id"
+        )
+
+    def get_from_bitmap_index(self):
+        """
+        Computes the response data with the bitmap index.
+
+        The index computes the ordered ids of the matching artifacts and their
+        facets, and only the catalog entries of the requested page are loaded.
+
+        Returns:
+            dict: The paginated data for the artifacts and the available filters.
+        """
+        query_params = self.request.query_params
+        tags = query_params.get("tags", None)
+        index = get_catalog_index(catalog_state_for_request(self.request))
+        # Las facetas se guardan con la versión de los ids con que se cuentan
+        with index.lock:
+            version = index.version
+            ids = index.match(
+                culture=query_params.get("culture", None),
+                shape=query_params.get("shape", None),
+                tag_groups=parse_tag_groups(tags) if tags is not None else None,
+            )
+            available_filters = get_facets(query_params, version, lambda: index.facets(ids))
+
+        _, _, descending = self.get_ordering()
+        if descending:
+            ids = ids[::-1]
+        # Se pagina el arreglo sin copiarlo, y solo los ids de la página pasan a int
+        page_ids = [int(artifact_id) for artifact_id in self.paginate_queryset(ids)]
+        columns = CatalogEntrySerializer.columns(self.get_requested_fields())
+        entries = CatalogEntry.objects.only(*columns).in_bulk(page_ids)
+        # Mantiene el orden de los ids, descartando entradas borradas entre medio
+        page = [entries[artifact_id] for artifact_id in page_ids if artifact_id in entries]
+        serializer = self.get_serializer(page, many=True)
+        page_data = self.get_paginated_response(serializer.data).data
+        return {**page_data, "filters": available_filters}
+
+    def get_from_database(self):
+        """
+        Computes the response data querying the catalog entries.
+
+        Returns:
+            dict: The paginated data for the artifacts and the available filters.
+        """
+        # Obtiene el queryset filtrado
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        # Obtiene los filtros únicos (culturas, formas, etiquetas)
+        available_filters = self.get_available_filters(queryset)
+
+        # Carga solo las columnas de los campos pedidos, y la del orden para el cursor
+        _, column, _ = self.get_ordering()
+        columns = CatalogEntrySerializer.columns(self.get_requested_fields())
+        queryset = queryset.only(*columns, column)
+
+        # Paginación si es necesario
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            page_data = self.get_paginated_response(serializer.data).data
+            return {**page_data, "filters": available_filters}
+
+        # Respuesta sin paginación
+        serializer = self.get_serializer(queryset, many=True)
+        return {"data": serializer.data, "filters": available_filters}
 
     def get_serializer_context(self):
         """
@@ -269,23 +789,162 @@ class CatalogAPIView(generics.ListAPIView):
             Response: Django REST Framework's Response object containing paginated
                 data for the artifacts.
         """
-        # Obtiene el queryset filtrado
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Obtiene los filtros únicos (culturas, formas, etiquetas)
-        available_filters = self.get_available_filters(queryset)
+        key = catalog_response_key(request)
+        data = catalog_responses.get(key)
+        if data is None:
+            if self.uses_bitmap_index():
+                data = self.get_from_bitmap_index()
+            else:
+                data = self.get_from_database()
+            catalog_responses.set(key, data)
+        return Response(data, status=status.HTTP_200_OK)
 
-        # Paginación si es necesario
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            page_data = self.get_paginated_response(serializer.data).data
-            return Response({**page_data, "filters": available_filters})
 
+class CatalogCacheStatsAPIView(APIView):
+    """
+    A view that provides the counters of the catalog response cache and the
+    artifact detail cache of the process that answers the request, for monitoring.
 
-        # Respuesta sin paginación
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({"data": serializer.data, "filters": available_filters}, status=status.HTTP_200_OK)
+    Attributes:
+        authentication_classes: Defines the list of authentication classes that
+            apply to this view. It is set to TokenAuthentication.
+        permission_classes: Defines the list of permissions that apply to
+            this view. It is set to allow only authenticated users with the
+            role of 'Administrador' to access this view.
+    """
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated & IsAdminPermission]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles GET requests.
+
+        Args:
+            request: The HTTP request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments.
+
+        Returns:
+            Response: Django REST Framework's Response object containing the size,
+                hits, misses, evictions and hit ratio of the catalog response cache,
+                and those of the artifact detail cache under 'details'.
+        """
+        return Response(
+            {"data": catalog_responses.stats(), "details": artifact_details.stats()},
+            status=status.HTTP_200_OK,
+        )
+
+
+@method_decorator(catalog_condition, name="get")
+class CatalogExportAPIView(APIView):
+    """
+    A view that streams every artifact of the catalog in a single response, for
+    partners that harvest the whole catalog.
+
+    The 'output' query parameter selects the format: 'ndjson' (default) writes one
+    JSON object per line and 'csv' one row per artifact. With 'descriptors=true' (or
+    '1') the descriptors of the thumbnail and the images are included.
+
+    Attributes:
+        permission_classes: Defines the list of permissions that apply to
+            this view. It is set to allow any user to access this view.
+    """
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles GET requests.
+
+        Args:
+            request: The HTTP request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments.
+
+        Returns:
+            StreamingHttpResponse: The export, produced while it is sent.
+        """
+        output = request.query_params.get("output", "ndjson")
+        descriptors = request.query_params.get("descriptors", "false").lower() in ("true", "1")
+        if output == "ndjson":
+            content = export_ndjson(request, descriptors)
+            content_type = "application/x-ndjson; charset=utf-8"
+        elif output == "csv":
+            content = export_csv(request, descriptors)
+            content_type = "text/csv; charset=utf-8"
+        else:
+            return Response(
+                {"detail": "Formato de exportación no válido, use ndjson o csv"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response["Content-Disposition"] = f"attachment; filename=catalogo.{output}"
+        return response
+
+
+class AutocompleteAPIView(APIView):
+    """
+    A view that suggests tags, cultures, shapes, institutions and description
+    keywords starting with the text typed by the user, ignoring accents and case.
+
+    Suggestions are served from the in-process autocomplete index, without
+    querying the database on every keystroke.
+
+    Attributes:
+        permission_classes: Defines the list of permissions that apply to
+            this view. It is set to allow any user to access this view.
+        default_limit: Specifies the number of suggestions returned by default.
+        max_limit: Specifies the maximum number of suggestions a client can request.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handles GET requests.
+
+        The 'q' query parameter holds the typed text, 'types' an optional comma
+        separated list of kinds (tag, culture, shape, institution, keyword) and
+        'limit' the number of suggestions.
+
+        Args:
+            request: The HTTP request object.
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments.
+
+        Returns:
+            Response: Django REST Framework's Response object containing the
+                suggestions, each with its type, id and value.
+        """
+        text = request.query_params.get("q", "")
+        types = request.query_params.get("types", None)
+        kinds = None
+        if types is not None:
+            kinds = {kind.strip() for kind in types.split(",") if kind.strip()}
+            unknown = kinds.difference(AUTOCOMPLETE_KINDS)
+            if unknown:
+                return Response(
+                    {"detail": f"Tipos desconocidos: {', '.join(sorted(unknown))}"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            return Response(
+                {"detail": "El límite debe ser un número entero"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, self.max_limit))
+
+        suggestions = get_autocomplete_index().suggest(text, limit, kinds)
+        data = [
+            {"type": kind, "id": term_id, "value": label}
+            for kind, term_id, label in suggestions
+        ]
+        return Response({"data": data}, status=status.HTTP_200_OK)
 
 
 class ArtifactCreateUpdateAPIView(generics.GenericAPIView):
@@ -411,20 +1070,24 @@ class ArtifactCreateUpdateAPIView(generics.GenericAPIView):
 
         serializer.is_valid(raise_exception=True)
 
-        # Save the instance first
-        instance = serializer.save()
+        # Una sola transacción, para que las escrituras incrementen la versión del
+        # catálogo una vez
+        with transaction.atomic():
+            # Save the instance first
+            instance = serializer.save()
 
-        logger.info(f"Handle file uploads for artifact {instance.id}")
-        # Handle file uploads
-        try:
-            self.handle_file_uploads(instance, request.FILES, request.data)
-        except Exception as e:
-            logger.error(f"Error al subir archivos: {e}")
-            return Response(
-                {"detail": f"Error al subir archivos"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        # Save again to ensure all related objects are properly linked
-        instance.save()
+            logger.info(f"Handle file uploads for artifact {instance.id}")
+            # Handle file uploads
+            try:
+                with transaction.atomic():
+                    self.handle_file_uploads(instance, request.FILES, request.data)
+            except Exception as e:
+                logger.error(f"Error al subir archivos: {e}")
+                return Response(
+                    {"detail": f"Error al subir archivos"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            # Save again to ensure all related objects are properly linked
+            instance.save()
 
         return Response(
             {"data": serializer.data},
@@ -530,25 +1193,25 @@ class ArtifactCreateUpdateAPIView(generics.GenericAPIView):
         # Get the images that are already uploaded and should be kept, and the new images to be uploaded
         # Old images are unlinked. This way we can set an empty list of images if we want to remove all images
 
-        # First we get the images linked to the artifact
-        old_images = Image.objects.filter(id_artifact=instance)
-        # We update them so they are not linked to the artifact anymore
-        for image in old_images:
-            image.id_artifact = None
-            image.save()
-            logger.info(f"Image unlinked: {image.path}")
-
-        # Now we recover the images that should be kept
-        keep_images = data.getlist(
-            "images", []
-        )  # images are paths from photos already uploaded
-        for image_name in keep_images:
-            # Update instances
-            image_path = os.path.join(settings.IMAGES_URL, image_name)
-            image = Image.objects.get(path=image_path)
-            image.id_artifact = instance
-            image.save()
-            logger.info(f"Image updated: {image.path}")
+        # The images that should be kept are paths from photos already uploaded
+        keep_paths = {
+            os.path.join(settings.IMAGES_URL, image_name)
+            for image_name in data.getlist("images", [])
+        }
+        keep_images = Image.objects.filter(path__in=keep_paths)
+        if keep_images.count() != len(keep_paths):
+            raise Image.DoesNotExist("Some of the images to keep do not exist")
+        # The images linked to the artifact that are not kept are unlinked, and the kept
+        # ones are linked, in one update each instead of one save per image
+        unlinked = Image.objects.filter(id_artifact=instance).exclude(path__in=keep_paths)
+        linked = keep_images.exclude(id_artifact=instance)
+        previous_ids = set(linked.values_list("id_artifact", flat=True)) - {None}
+        changed = unlinked.update(id_artifact=None) + linked.update(id_artifact=instance)
+        logger.info(f"Images relinked: {changed}")
+        if changed:
+            # Los update no disparan las señales de las imágenes
+            touch_artifacts(previous_ids | {instance.id})
+            touch_descriptors(previous_ids | {instance.id})
 
         new_images = files.getlist(
             "new_images", []
@@ -609,158 +1272,160 @@ class BulkLoadingAPIView(generics.GenericAPIView):
         self.temp_dir = settings.MEDIA_ROOT+"temp/"+temp
         for match in matches:
             try:
-                print(match)
-                new_artifact = match["new_artifact"]
-                match_artifact = match["match_artifact"]
-                print(new_artifact)
-                print(match_artifact)
-                status_match = new_artifact["status"]
-                if status_match == "replace":
-                    print("Reemplazar")
-                    #reemplazar la pieza conid match_artifact con la info de new_artifact
-                    #buscar la pieza a reemplazar
-                    artifact = Artifact.objects.get(id=match_artifact)
-                    #buscar etiquetas
-                    tags_instances = []
-                    for tag in new_artifact["tags"]:
-                        tag_instance = Tag.objects.get(name=tag)
-                        tags_instances.append(tag_instance)
-
-                    #buscar la cultura
-                    culture_instance = Culture.objects.get(name=new_artifact["culture"])
-
-                    #buscar la forma
-                    shape_instance = Shape.objects.get(name=new_artifact["shape"])
-
-                    #descripción
-                    description = new_artifact["description"]
-
-                    #buscar algun archivo de thumbnail
-                    thumbnail = new_artifact["file_thumbnail"]
-                    thumbnail_path = os.path.normpath(self.temp_dir + thumbnail)
-                    with open(thumbnail_path, "rb") as f:
-                        thumbnail_file = File(f, name=thumbnail)
-                        thumbnail_instance = Thumbnail.objects.create(path=thumbnail_file)
-
-                    #buscar los archivos de modelo
-                    models = new_artifact["files_model"]
-                    texture_file = [file for file in models if file.endswith(".jpg")]
-                    object_file = [file for file in models if file.endswith(".obj")]
-                    material_file = [file for file in models if file.endswith(".mtl")]
-                    if texture_file != [] and object_file != [] and material_file != []:
-                        texture_path = os.path.normpath(self.temp_dir + texture_file[0])
-                        object_path = os.path.normpath(self.temp_dir + object_file[0])
-                        material_path = os.path.normpath(self.temp_dir + material_file[0])
-                        with open(texture_path, "rb") as f:
-                            texture_file = File(f, name=texture_file[0])
-                            with open(object_path, "rb") as f:
-                                object_file = File(f, name=object_file[0])
-                                with open(material_path, "rb") as f:
-                                    material_file = File(f, name=material_file[0])
-                                    model, created = Model.objects.get_or_create(
-                                        texture=texture_file,
-                                        object=object_file,
-                                        material=material_file,
-                                    )
-                        if created:
-                            logger.info(f"Model created: {model.texture}, {model.object}, {model.material}")
+                # Cada pieza en una transacción, que incrementa la versión del catálogo una vez
+                with transaction.atomic():
+                    print(match)
+                    new_artifact = match["new_artifact"]
+                    match_artifact = match["match_artifact"]
+                    print(new_artifact)
+                    print(match_artifact)
+                    status_match = new_artifact["status"]
+                    if status_match == "replace":
+                        print("Reemplazar")
+                        #reemplazar la pieza conid match_artifact con la info de new_artifact
+                        #buscar la pieza a reemplazar
+                        artifact = Artifact.objects.get(id=match_artifact)
+                        #buscar etiquetas
+                        tags_instances = []
+                        for tag in new_artifact["tags"]:
+                            tag_instance = Tag.objects.get(name=tag)
+                            tags_instances.append(tag_instance)
+
+                        #buscar la cultura
+                        culture_instance = Culture.objects.get(name=new_artifact["culture"])
+
+                        #buscar la forma
+                        shape_instance = Shape.objects.get(name=new_artifact["shape"])
+
+                        #descripción
+                        description = new_artifact["description"]
+
+                        #buscar algun archivo de thumbnail
+                        thumbnail = new_artifact["file_thumbnail"]
+                        thumbnail_path = os.path.normpath(self.temp_dir + thumbnail)
+                        with open(thumbnail_path, "rb") as f:
+                            thumbnail_file = File(f, name=thumbnail)
+                            thumbnail_instance = Thumbnail.objects.create(path=thumbnail_file)
+
+                        #buscar los archivos de modelo
+                        models = new_artifact["files_model"]
+                        texture_file = [file for file in models if file.endswith(".jpg")]
+                        object_file = [file for file in models if file.endswith(".obj")]
+                        material_file = [file for file in models if file.endswith(".mtl")]
+                        if texture_file != [] and object_file != [] and material_file != []:
+                            texture_path = os.path.normpath(self.temp_dir + texture_file[0])
+                            object_path = os.path.normpath(self.temp_dir + object_file[0])
+                            material_path = os.path.normpath(self.temp_dir + material_file[0])
+                            with open(texture_path, "rb") as f:
+                                texture_file = File(f, name=texture_file[0])
+                                with open(object_path, "rb") as f:
+                                    object_file = File(f, name=object_file[0])
+                                    with open(material_path, "rb") as f:
+                                        material_file = File(f, name=material_file[0])
+                                        model, created = Model.objects.get_or_create(
+                                            texture=texture_file,
+                                            object=object_file,
+                                            material=material_file,
+                                        )
+                            if created:
+                                logger.info(f"Model created: {model.texture}, {model.object}, {model.material}")
+                            else:
+                                logger.info(f"Model updated: {model.texture}, {model.object}, {model.material}")
                         else:
-                            logger.info(f"Model updated: {model.texture}, {model.object}, {model.material}")
-                    else:
-                        model = None
-                    # crear la pieza
-                    artifact.description = description
-                    artifact.id_thumbnail = thumbnail_instance
-                    artifact.id_model = model
-                    artifact.id_shape = shape_instance
-                    artifact.id_culture = culture_instance
-                    artifact.save()
-                    # borramos las etiquetas anteriores
-                    artifact.id_tags.clear()
-                    for tag_instance in tags_instances:
-                        artifact.id_tags.add(tag_instance)
-
-                    # borramos las imagenes anteriores
-                    images = Image.objects.filter(id_artifact=artifact)
-                    for image in images:
-                        image.delete()
-                    #imagenes
-                    images = new_artifact["files_images"]
-                    images_instances = []
-                    for image in images:
-                        image_path = os.path.normpath(self.temp_dir + image)
-                        with open(image_path, "rb") as f:
-                            image_file = File(f, name=image)
-                            image_instance = Image.objects.create(path=image_file, id_artifact=artifact)
-                            images_instances.append(image_instance)
+                            model = None
+                        # crear la pieza
+                        artifact.description = description
+                        artifact.id_thumbnail = thumbnail_instance
+                        artifact.id_model = model
+                        artifact.id_shape = shape_instance
+                        artifact.id_culture = culture_instance
+                        artifact.save()
+                        # borramos las etiquetas anteriores
+                        artifact.id_tags.clear()
+                        for tag_instance in tags_instances:
+                            artifact.id_tags.add(tag_instance)
+
+                        # borramos las imagenes anteriores
+                        images = Image.objects.filter(id_artifact=artifact)
+                        for image in images:
+                            image.delete()
+                        #imagenes
+                        images = new_artifact["files_images"]
+                        images_instances = []
+                        for image in images:
+                            image_path = os.path.normpath(self.temp_dir + image)
+                            with open(image_path, "rb") as f:
+                                image_file = File(f, name=image)
+                                image_instance = Image.objects.create(path=image_file, id_artifact=artifact)
+                                images_instances.append(image_instance)
                             
                 
-                elif status_match == "keep":
-                    print("Mantener")
-                elif status_match == "new":
-                    print("Nuevo")
-                    #crear la pieza con la info de new_artifact
-                    #buscar etiquetas
-                    tags_instances = []
-                    for tag in new_artifact["tags"]:
-                        tag_instance = Tag.objects.get(name=tag)
-                        tags_instances.append(tag_instance)
-
-                    #buscar la cultura
-                    culture_instance = Culture.objects.get(name=new_artifact["culture"])
-
-                    #buscar la forma
-                    shape_instance = Shape.objects.get(name=new_artifact["shape"])
-
-                    #descripción
-                    description = new_artifact["description"]
-
-                    #buscar algun archivo de thumbnail
-                    thumbnail = new_artifact["file_thumbnail"]
-                    thumbnail_path = os.path.normpath(self.temp_dir + thumbnail)
-                    with open(thumbnail_path, "rb") as f:
-                        thumbnail_file = File(f, name=thumbnail)
-                        thumbnail_instance = Thumbnail.objects.create(path=thumbnail_file)
-
-                    #buscar los archivos de modelo
-                    models = new_artifact["files_model"]
-                    texture_file = [file for file in models if file.endswith(".jpg")]
-                    object_file = [file for file in models if file.endswith(".obj")]
-                    material_file = [file for file in models if file.endswith(".mtl")]
-                    if texture_file != [] and object_file != [] and material_file != []:
-                        texture_path = os.path.normpath(self.temp_dir + texture_file[0])
-                        object_path = os.path.normpath(self.temp_dir + object_file[0])
-                        material_path = os.path.normpath(self.temp_dir + material_file[0])
-                        with open(texture_path, "rb") as f:
-                            texture_file = File(f, name=texture_file[0])
-                            with open(object_path, "rb") as f:
-                                object_file = File(f, name=object_file[0])
-                                with open(material_path, "rb") as f:
-                                    material_file = File(f, name=material_file[0])
-                                    model, created = Model.objects.get_or_create(
-                                        texture=texture_file,
-                                        object=object_file,
-                                        material=material_file,
-                                    )
-                        if created:
-                            logger.info(f"Model created: {model.texture}, {model.object}, {model.material}")
+                    elif status_match == "keep":
+                        print("Mantener")
+                    elif status_match == "new":
+                        print("Nuevo")
+                        #crear la pieza con la info de new_artifact
+                        #buscar etiquetas
+                        tags_instances = []
+                        for tag in new_artifact["tags"]:
+                            tag_instance = Tag.objects.get(name=tag)
+                            tags_instances.append(tag_instance)
+
+                        #buscar la cultura
+                        culture_instance = Culture.objects.get(name=new_artifact["culture"])
+
+                        #buscar la forma
+                        shape_instance = Shape.objects.get(name=new_artifact["shape"])
+
+                        #descripción
+                        description = new_artifact["description"]
+
+                        #buscar algun archivo de thumbnail
+                        thumbnail = new_artifact["file_thumbnail"]
+                        thumbnail_path = os.path.normpath(self.temp_dir + thumbnail)
+                        with open(thumbnail_path, "rb") as f:
+                            thumbnail_file = File(f, name=thumbnail)
+                            thumbnail_instance = Thumbnail.objects.create(path=thumbnail_file)
+
+                        #buscar los archivos de modelo
+                        models = new_artifact["files_model"]
+                        texture_file = [file for file in models if file.endswith(".jpg")]
+                        object_file = [file for file in models if file.endswith(".obj")]
+                        material_file = [file for file in models if file.endswith(".mtl")]
+                        if texture_file != [] and object_file != [] and material_file != []:
+                            texture_path = os.path.normpath(self.temp_dir + texture_file[0])
+                            object_path = os.path.normpath(self.temp_dir + object_file[0])
+                            material_path = os.path.normpath(self.temp_dir + material_file[0])
+                            with open(texture_path, "rb") as f:
+                                texture_file = File(f, name=texture_file[0])
+                                with open(object_path, "rb") as f:
+                                    object_file = File(f, name=object_file[0])
+                                    with open(material_path, "rb") as f:
+                                        material_file = File(f, name=material_file[0])
+                                        model, created = Model.objects.get_or_create(
+                                            texture=texture_file,
+                                            object=object_file,
+                                            material=material_file,
+                                        )
+                            if created:
+                                logger.info(f"Model created: {model.texture}, {model.object}, {model.material}")
+                            else:
+                                logger.info(f"Model updated: {model.texture}, {model.object}, {model.material}")
                         else:
-                            logger.info(f"Model updated: {model.texture}, {model.object}, {model.material}")
-                    else:
-                        model = None
-                    # crear la pieza
-                    artifact = Artifact.objects.create(description=description, id_thumbnail=thumbnail_instance, id_model=model, id_shape=shape_instance, id_culture=culture_instance)
-                    for tag_instance in tags_instances:
-                        artifact.id_tags.add(tag_instance)
-                    #imagenes
-                    images = new_artifact["files_images"]
-                    images_instances = []
-                    for image in images:
-                        image_path = os.path.normpath(self.temp_dir + image)
-                        with open(image_path, "rb") as f:
-                            image_file = File(f, name=image)
-                            image_instance = Image.objects.create(path=image_file, id_artifact=artifact)
-                            images_instances.append(image_instance)
+                            model = None
+                        # crear la pieza
+                        artifact = Artifact.objects.create(description=description, id_thumbnail=thumbnail_instance, id_model=model, id_shape=shape_instance, id_culture=culture_instance)
+                        for tag_instance in tags_instances:
+                            artifact.id_tags.add(tag_instance)
+                        #imagenes
+                        images = new_artifact["files_images"]
+                        images_instances = []
+                        for image in images:
+                            image_path = os.path.normpath(self.temp_dir + image)
+                            with open(image_path, "rb") as f:
+                                image_file = File(f, name=image)
+                                image_instance = Image.objects.create(path=image_file, id_artifact=artifact)
+                                images_instances.append(image_instance)
 
             except Exception as e:
                 self.delete_files(self.temp_dir)
@@ -866,13 +1531,15 @@ class BulkLoadingAPIView(generics.GenericAPIView):
         for data in data_with_files:
             desc = [data["thumbnail_desc"]]
             desc.extend(data["images_desc"])
-            matriz = distance.cdist(descriptores, desc, 'cityblock')
-            min_dist = np.min(matriz)
-            min_row, min_col = np.unravel_index(np.argmin(matriz), matriz.shape)
-            print(f"Minimo: {min_dist}, en la fila {min_row} y columna {min_col}, correspondiente a la pieza {ids[min_row]} con el artefacto {data['id']}")
-            if min_dist < 0.1:
-                posible_matches.append({"new_artifact": data, "match_artifact": ids[min_row],})
-                continue
+            # Sin piezas con descriptores no hay con qué comparar
+            if len(ids) > 0:
+                matriz = distance.cdist(descriptores, desc, 'cityblock')
+                min_dist = np.min(matriz)
+                min_row, min_col = np.unravel_index(np.argmin(matriz), matriz.shape)
+                logger.debug(f"Minimo: {min_dist}, en la fila {min_row} y columna {min_col}, correspondiente a la pieza {ids[min_row]} con el artefacto {data['id']}")
+                if min_dist < 0.1:
+                    posible_matches.append({"new_artifact": data, "match_artifact": int(ids[min_row]),})
+                    continue
             try:
                 count += 1
                 #buscar etiquetas
@@ -1117,67 +1784,30 @@ class BulkLoadingAPIView(generics.GenericAPIView):
 
     def get_existing_descriptors(self):
         """
-        Retrieve existing descriptors from the database using DescriptorArtifactSerializer.
+        Retrieve the descriptors of the thumbnails and images of every artifact.
+
+        The descriptors come from the in-process descriptor index, which is only
+        loaded from the database on first use and after writes of other processes,
+        see piezas.descriptor_index.
 
         Returns:
-            tuple: A tuple containing two lists: one for descriptors and one for IDs.
+            tuple: A matrix with one descriptor per row and the aligned array of the
+                IDs of the artifacts they belong to.
         """
-        artifacts = Artifact.objects.all()  # Obtén todos los artefactos
-        serializer = DescriptorArtifactSerializer(artifacts, many=True)  # Serializa los artefactos
-
-        # Aquí accedemos a los datos como una lista de diccionarios devueltos por to_representation
-        descriptors = []
-        ids = []
-        
-        for item in serializer.data:
-            print(item["ids"])
-            descriptors_str = item["descriptors"]
-            for descriptor_str in descriptors_str:
-                if isinstance(descriptor_str, str):
-                    try:
-                        descriptors_list = literal_eval(descriptor_str)
-                    except (ValueError, SyntaxError):
-                        descriptors_list = []
-                else:
-                    descriptors_list = descriptor_str
-
-                descriptor_array = np.array(descriptors_list)
-                descriptors.append(descriptor_array)
-            ids.extend(item["ids"])
-            print(f"Descriptor: {len(descriptors)}, IDs: {len(ids)}")
-        return descriptors, ids
+        return get_descriptor_index().snapshot()
 
     def get_descriptor(self, path: str):
         """
         Get the descriptor of a file.
         """
         try:
-            num_zonas_x = 4
-            num_zonas_y = 4
-            num_bins_por_zona = 8
-            image = cv2.imread(os.path.normpath(self.temp_dir + path), cv2.IMREAD_GRAYSCALE)
-            img_eq = cv2.equalizeHist(image)
-            descriptor = []
-            for j in range(num_zonas_y):
-                desde_y = int(img_eq.shape[0] / num_zonas_y * j)
-                hasta_y = int(img_eq.shape[0] / num_zonas_y * (j + 1))
-                for i in range(num_zonas_x):
-                    desde_x = int(img_eq.shape[1] / num_zonas_x * i)
-                    hasta_x = int(img_eq.shape[1] / num_zonas_x * (i + 1))
-                    # recortar zona de la img
-                    zona = img_eq[desde_y:hasta_y, desde_x:hasta_x]
-                    # histograma de los pixeles de la zona
-                    histograma, limites = np.histogram(zona, bins=num_bins_por_zona, range=(0, 255))
-                    # normalizar histograma (bins suman 1)
-                    histograma = histograma / np.sum(histograma)
-                    # agregar descriptor de la zona al descriptor global
-                    descriptor.extend(histograma)
-            return np.array(descriptor)
+            return compute_descriptor(os.path.normpath(self.temp_dir + path))
         except Exception as e:
             logger.error(f"Error al obtener descriptor: {e}")
             return []
         
 
+@method_decorator(catalog_condition, name="get")
 class InstitutionAPIView(generics.ListCreateAPIView):
     """
     A view that provides a list of institutions.
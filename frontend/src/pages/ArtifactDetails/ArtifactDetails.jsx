@@ -18,6 +18,27 @@ import { useSnackBars } from "../../hooks/useSnackbars";
 import Carousel from "./components/Carousel";
 import { useSelection } from "../../selectionContext";
 
+/**
+ * Picks the material of the texture variant that suits the device: the smallest one
+ * covering the screen in physical pixels, or the smallest one on devices with little
+ * memory. Falls back to the original material when no variant is large enough.
+ * @param {object} model - The model of the artifact, as returned by the API.
+ * @returns {string} URL of the material file to load.
+ */
+const pickMaterial = (model) => {
+  const textures = model.textures || [];
+  if (textures.length === 0) {
+    return model.material;
+  }
+  if (navigator.deviceMemory && navigator.deviceMemory <= 2) {
+    return textures[0].material;
+  }
+  const screenSize =
+    Math.max(window.screen.width, window.screen.height) * (window.devicePixelRatio || 1);
+  const variant = textures.find((texture) => texture.size >= screenSize);
+  return variant ? variant.material : model.material;
+};
+
 /**
  * The ArtifactDetails component displays detailed information about a specific artifact,
  * including its model, images, attributes, and provides options for download and editing.
@@ -47,6 +68,7 @@ const ArtifactDetails = () => {
       object: "",
       material: "",
       texture: "",
+      textures: [],
     },
     images: [],
   });
@@ -193,7 +215,7 @@ const ArtifactDetails = () => {
               // Renders 3D model visualization if object and material paths are available
               <ModelVisualization
                 objPath={artifact.model.object}
-                mtlPath={artifact.model.material}
+                mtlPath={pickMaterial(artifact.model)}
               />
               )}
               </>
@@ -24,7 +24,7 @@ import { styled } from "@mui/material/styles";
  */
 const ArtifactCard = ({ artifact, isSelectionMode,onSelectArtifact,selected}) => {
   const navigate = useNavigate();
-  const { id, attributes, thumbnail: previewPath } = artifact;
+  const { id, attributes, thumbnail: previewPath, thumbnail_srcset: previewSrcset } = artifact;
   const { shape, tags, culture, description } = attributes;
 
   // Joining tags into a comma-separated string
@@ -60,14 +60,23 @@ const ArtifactCard = ({ artifact, isSelectionMode,onSelectArtifact,selected}) =>
 
       {/* Displaying preview image or default image if previewPath is not available */}
       {previewPath ? (
-        <CustomCardMedia
-          component="img"
-          height="140"
-          image={previewPath}
-          alt={id}
-          onClick={handleRedirect}
-          style={{ objectFit: "contain", backgroundColor: "black" }}
-        />
+        // Resized copies of the thumbnail, so the grid does not download the original:
+        // WebP where the browser supports it, JPEG otherwise
+        <picture style={{ display: "block" }}>
+          {previewSrcset?.webp && (
+            <source type="image/webp" srcSet={previewSrcset.webp} sizes={PREVIEW_SIZES} />
+          )}
+          <CustomCardMedia
+            component="img"
+            height="140"
+            image={previewPath}
+            srcSet={previewSrcset?.jpeg}
+            sizes={PREVIEW_SIZES}
+            alt={id}
+            onClick={handleRedirect}
+            style={{ objectFit: "contain", backgroundColor: "black" }}
+          />
+        </picture>
       ) : (
         <CustomCardMedia
           component="img"
@@ -124,6 +133,9 @@ const ArtifactCard = ({ artifact, isSelectionMode,onSelectArtifact,selected}) =>
   );
 };
 
+// Width of the preview in the grid, used to pick a resized copy of the thumbnail
+const PREVIEW_SIZES = "(max-width: 600px) 100vw, 33vw";
+
 // Styled components for customizing UI elements
 
 // Custom styled CardMedia for image preview